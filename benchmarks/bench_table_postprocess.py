@@ -0,0 +1,80 @@
+# benchmarks/bench_table_postprocess.py  –  per-cell vs vectorized table clean-up
+# -------------------------------------------------------------------------------------------------
+# Synthetic pdfplumber-style tables (repeated values, footnote superscripts, wrapped rows) are
+# cleaned with the old row loop + df.apply(_postprocess) path and with _table_to_df; the results
+# are checked for equality and the timings printed. Every timed run starts with an empty
+# _clean_cell memo, so the vectorized path is not credited with the previous run's work; the
+# warm-memo time (cells already seen in earlier tables) is printed separately.
+#
+#     python -m benchmarks.bench_table_postprocess --rows 2000 --cols 8 --repeat 5
+from __future__ import annotations
+import argparse
+import copy
+import pathlib
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))   # also as `python benchmarks/…py`
+
+from utils.extract_pdf_tables import _clean_cell, _postprocess, _table_to_df
+
+_VALUES = ["", None, "Patient 1", "µmol/L", "α-galactosidase  A", "120¹", "normal ²", "Lévy–Jensen",
+           "c.1448T>C\n(p.Leu483Pro)", "  3.2 ", "n.d.", "+", "−", "heterozygous", "12 y"]
+
+def _reference(raw_table):
+    """extract_pdf_tables._table_to_df as it was before vectorization."""
+    rows = [r for r in raw_table if any(c and c.strip() for c in r)]
+    if not rows:
+        return None
+    merged_rows = []
+    for r in rows:
+        if merged_rows and all(c in ("", None) for c in r[1:]):
+            merged_rows[-1][0] += " " + (r[0] or "")
+        else:
+            merged_rows.append(r)
+    df = pd.DataFrame(merged_rows).apply(_postprocess)
+    if len(df) > 1 and df.iloc[0].isna().sum() < len(df.columns) / 2:
+        df.columns = df.iloc[0]
+        df = df.drop(index=df.index[0]).reset_index(drop=True)
+    return df
+
+def synthetic_table(rows: int, cols: int, seed: int = 0):
+    rnd = random.Random(seed)
+    table = [[f"Col {j}" for j in range(cols)]]
+    for _ in range(rows):
+        if rnd.random() < 0.1:                                   # wrapped first-column text
+            table.append([rnd.choice(["continued", "(cont.)", "line"])] + [""] * (cols - 1))
+        else:
+            table.append([rnd.choice(_VALUES[2:])] + [rnd.choice(_VALUES) for _ in range(cols - 1)])
+    return table
+
+def _best(fn, table, repeat: int, *, cold: bool = True) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = copy.deepcopy(table)                                 # the reference mutates its input
+        if cold:
+            _clean_cell.cache_clear()
+        t0 = time.perf_counter()
+        fn(t)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=2000)
+    ap.add_argument("--cols", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=5)
+    a = ap.parse_args()
+    table = synthetic_table(a.rows, a.cols)
+    old, new = _reference(copy.deepcopy(table)), _table_to_df(copy.deepcopy(table))
+    assert old.equals(new) and list(old.columns) == list(new.columns), "outputs differ"
+    t_old, t_new = _best(_reference, table, a.repeat), _best(_table_to_df, table, a.repeat)
+    t_warm = _best(_table_to_df, table, a.repeat, cold=False)
+    print(f"{a.rows}×{a.cols} cells   per-cell: {t_old*1e3:8.1f} ms   vectorized: {t_new*1e3:8.1f} ms"
+          f"   speed-up: {t_old / t_new:.1f}×   (warm memo: {t_warm*1e3:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_word_reports.py  –  python-docx object API vs the prebuilt report template
+# -------------------------------------------------------------------------------------------------
+# Renders the same synthetic record with the old per-cell row_to_landscape_doc and with
+# utils.landscape_word_doc.ReportTemplate (per-file and combined), checks that the tables read back
+# identically and prints the per-report time.
+#
+#     python -m benchmarks.bench_word_reports --fields 30 --reports 50
+from __future__ import annotations
+import argparse
+import pathlib
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from docx import Document
+from docx.enum.section import WD_ORIENT
+from docx.shared import Pt
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))   # also as `python benchmarks/…py`
+from utils.landscape_word_doc import ReportTemplate
+
+def _reference(df: pd.DataFrame, out_path) -> None:
+    """row_to_landscape_doc as it was before the template renderer."""
+    df_t = df.T.reset_index(names=["Field"])
+    doc = Document()
+    sec = doc.sections[-1]
+    sec.orientation = WD_ORIENT.LANDSCAPE
+    sec.page_width, sec.page_height = sec.page_height, sec.page_width
+    rows, cols = df_t.shape
+    table = doc.add_table(rows=rows, cols=cols)
+    table.style = "Table Grid"
+    for i, row in df_t.iterrows():
+        for j, val in enumerate(row):
+            table.rows[i].cells[j].text = str(val)
+    for cell in table._cells:
+        for p in cell.paragraphs:
+            for run in p.runs:
+                run.font.size = Pt(7.5)
+    doc.save(out_path)
+
+def synthetic_record(fields: int) -> dict:
+    return {f"Field {i}": ("Patient presented with α-gal A deficiency & <1% activity\n" * (1 + i % 4)).strip()
+            for i in range(fields)}
+
+def _cells(path) -> list:
+    return [[c.text for c in r.cells] for t in Document(str(path)).tables for r in t.rows]
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fields", type=int, default=30)
+    ap.add_argument("--reports", type=int, default=50)
+    a = ap.parse_args()
+    rec = synthetic_record(a.fields)
+    df = pd.DataFrame([rec])
+    with tempfile.TemporaryDirectory() as tmp:
+        out = pathlib.Path(tmp)
+        t0 = time.perf_counter()
+        for i in range(a.reports):
+            _reference(df, out / f"ref{i}.docx")
+        t_ref = (time.perf_counter() - t0) / a.reports
+
+        t0 = time.perf_counter()
+        tpl = ReportTemplate()
+        t_tpl = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        tpl.save_many((df, out / f"new{i}.docx") for i in range(a.reports))
+        t_new = (time.perf_counter() - t0) / a.reports
+
+        t0 = time.perf_counter()
+        tpl.save_combined([rec] * a.reports, out / "combined.docx")
+        t_comb = (time.perf_counter() - t0) / a.reports
+
+        assert _cells(out / "ref0.docx") == _cells(out / "new0.docx"), "rendered tables differ"
+        assert len(Document(str(out / "combined.docx")).tables) == a.reports
+    print(f"{a.fields} fields × {a.reports} reports")
+    print(f"  python-docx per cell : {t_ref * 1e3:8.2f} ms/report")
+    print(f"  template (one-time)  : {t_tpl * 1e3:8.2f} ms")
+    print(f"  template, per file   : {t_new * 1e3:8.2f} ms/report  ({t_ref / t_new:.0f}×)")
+    print(f"  template, combined   : {t_comb * 1e3:8.2f} ms/report")
+
+if __name__ == "__main__":
+    main()
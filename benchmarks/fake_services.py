@@ -0,0 +1,197 @@
+# benchmarks/fake_services.py  –  offline stand-ins for the OpenAI API and the ID resolvers
+# -------------------------------------------------------------------------------------------------
+# One threaded HTTP server on 127.0.0.1 answering the requests the pipeline makes:
+#   POST /v1/chat/completions      OpenAI-compatible; returns a schema-shaped JSON record derived
+#                                  deterministically from the document text (title = first heading)
+#   GET  /eutils                   PubMed esearch      → {"esearchresult": {"idlist": [...]}}
+#   GET  /wikidata                 wbsearchentities / wbgetentities (P492 OMIM, P1550 Orphanet)
+#   POST /sparql                   Wikidata SPARQL fallback
+#   GET  /ols                      EBI OLS search (Orphanet CURIEs)
+# Each route sleeps a configurable latency so concurrency effects stay visible. FakeServices()
+# starts the server and points OPENAI_BASE_URL / EUTILS_URL / WIKIDATA_API / WIKIDATA_SPARQL /
+# OLS_URL at it – start it before importing the pipeline modules, which read them at import.
+#
+#     with FakeServices(llm_latency=0.5) as fake:
+#         ...                          # run the pipeline
+#         print(fake.counts)           # requests per route
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+# (label, OMIM, Orphanet) – the diseases the fake model "finds"; the resolvers know all of them
+DISEASES = [
+    ("Fabry disease", "301500", "324"),
+    ("Phenylketonuria", "261600", "716"),
+    ("Gaucher disease", "230800", "355"),
+    ("Pompe disease", "232300", "365"),
+    ("Maple syrup urine disease", "248600", "511"),
+    ("Wilson disease", "277900", "905"),
+]
+_BY_LABEL = {d[0].casefold(): d for d in DISEASES}
+_HEADING = re.compile(r"^\s*#{1,6}\s+(.+?)\s*$", re.MULTILINE)
+
+def _digest(text: str) -> int:
+    return int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+
+def fake_record(md_text: str) -> Dict[str, str]:
+    """What the fake model answers for a document: stable per text, plausible per field."""
+    m = _HEADING.search(md_text)
+    title = m.group(1) if m else next((ln.strip() for ln in md_text.splitlines() if ln.strip()), "Untitled")
+    h = _digest(md_text)
+    disease = DISEASES[h % len(DISEASES)][0]
+    return {
+        "Case_description": " ".join(md_text.split()[:60]),
+        "Genetic_validation": "yes" if h & 1 else "no",
+        "Responsible_gene": ("GLA", "PAH", "GBA1", "GAA", "BCKDHA", "ATP7B")[h % 6],
+        "Underlying_disease": disease,
+        "OMIM": "", "OrphaNet": "",
+        "Reference_title": title[:200],
+        "PubMed_ID": "",
+        "Single-patient case report": "yes",
+    }
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"             # keep-alive, like the real services
+
+    def log_message(self, *args) -> None:     # quiet
+        pass
+
+    def _send(self, body: object, status: int = 200) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _route(self, method: str) -> None:
+        fake: FakeServices = self.server.fake          # type: ignore[attr-defined]
+        url = urlparse(self.path)
+        route = url.path.rstrip("/").rsplit("/", 1)[-1] if url.path.startswith("/v1") else url.path.strip("/")
+        fake.count(route)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        body = self._body() if method == "POST" else b""
+        if route == "completions":
+            time.sleep(fake.llm_latency)
+            return self._send(_chat_completion(json.loads(body or b"{}")))
+        time.sleep(fake.http_latency)
+        if route == "eutils":
+            title = re.sub(r"\[Title\]$", "", q.get("term", ""))
+            return self._send({"esearchresult": {"idlist": [str(10_000_000 + _digest(title) % 9_000_000)]}})
+        if route == "wikidata":
+            if q.get("action") == "wbsearchentities":
+                d = _BY_LABEL.get(q.get("search", "").strip().casefold())
+                return self._send({"search": [{"id": f"Q{d[1]}", "label": d[0]}] if d else []})
+            ents = {}
+            for qid in q.get("ids", "").split("|"):
+                d = next((d for d in DISEASES if f"Q{d[1]}" == qid), None)
+                claims = {} if d is None else {
+                    "P492": [{"mainsnak": {"datavalue": {"value": d[1]}}}],
+                    "P1550": [{"mainsnak": {"datavalue": {"value": d[2]}}}]}
+                ents[qid] = {"id": qid, "claims": claims}
+            return self._send({"entities": ents})
+        if route == "sparql":
+            return self._send({"results": {"bindings": []}})
+        if route == "ols":
+            d = _BY_LABEL.get(q.get("q", "").strip().casefold())
+            docs = [{"label": d[0], "obo_id": [f"Orphanet_{d[2]}"]}] if d else []
+            return self._send({"response": {"numFound": len(docs), "docs": docs}})
+        self._send({"error": f"no route {url.path}"}, 404)
+
+    def do_GET(self) -> None:
+        self._route("GET")
+
+    def do_POST(self) -> None:
+        self._route("POST")
+
+def _chat_completion(req: dict) -> dict:
+    texts = [part.get("text", "") for m in req.get("messages", [])
+             for part in (m.get("content") if isinstance(m.get("content"), list) else [{"text": m.get("content") or ""}])]
+    md = texts[-1] if texts else ""
+    content = json.dumps(fake_record(md))
+    prompt_tokens = sum(len(t) for t in texts) // 4
+    return {
+        "id": f"chatcmpl-fake-{_digest(md):x}", "object": "chat.completion", "created": int(time.time()),
+        "model": req.get("model", "fake"),
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                  "total_tokens": prompt_tokens + len(content) // 4},
+    }
+
+class FakeServices:
+    """Start/stop the stand-in server and export the endpoint variables while it runs."""
+
+    def __init__(self, *, llm_latency: float = 0.5, http_latency: float = 0.05, port: int = 0):
+        self.llm_latency, self.http_latency = llm_latency, http_latency
+        self.counts: Counter = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self                       # type: ignore[attr-defined]
+        self._thread: Optional[threading.Thread] = None
+        self._saved: Dict[str, Optional[str]] = {}
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def env(self) -> Dict[str, str]:
+        return {"OPENAI_BASE_URL": f"{self.url}/v1", "OPENAI_API_KEY": "sk-fake",
+                "EUTILS_URL": f"{self.url}/eutils", "WIKIDATA_API": f"{self.url}/wikidata",
+                "WIKIDATA_SPARQL": f"{self.url}/sparql", "OLS_URL": f"{self.url}/ols"}
+
+    def count(self, route: str) -> None:
+        with self._lock:
+            self.counts[route] += 1
+
+    def start(self) -> "FakeServices":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-services", daemon=True)
+        self._thread.start()
+        for k, v in self.env.items():
+            self._saved[k] = os.environ.get(k)
+            os.environ[k] = v
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        for k, v in self._saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+    def __enter__(self) -> "FakeServices":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Run the stand-in services in the foreground.")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--llm-latency", type=float, default=0.5)
+    ap.add_argument("--http-latency", type=float, default=0.05)
+    a = ap.parse_args()
+    fake = FakeServices(llm_latency=a.llm_latency, http_latency=a.http_latency, port=a.port).start()
+    print("\n".join(f"export {k}={v}" for k, v in fake.env.items()), flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
@@ -0,0 +1,100 @@
+# benchmarks/import_budget.py  –  cold-import time and heavy-dependency budget per module
+# -------------------------------------------------------------------------------------------------
+# Each module is imported in a fresh interpreter under `python -X importtime`; the cumulative time
+# of its own line is the import cost (best of --repeat runs, to ride out a cold disk cache), and
+# every module name in the trace counts as loaded. A module fails when it is over its budget or
+# pulls in one of its forbidden dependencies – e.g. the schema module must not load Docling, torch,
+# openai or pandas just to expose COLUMNS. Exits 1 on any violation, so CI can run it as a check.
+#
+#     python -m benchmarks.import_budget                 # all budgets below
+#     python -m benchmarks.import_budget --top 15 utils.pdf_to_json_row
+from __future__ import annotations
+import argparse
+import pathlib
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+HEAVY = ("docling", "docling_core", "torch", "openai", "httpx", "pandas", "numpy", "pdfplumber",
+         "fitz", "requests", "dotenv", "pyarrow", "docx", "tiktoken", "diskcache")
+
+@dataclass
+class Budget:
+    module: str
+    max_ms: float
+    forbidden: Tuple[str, ...] = HEAVY
+
+BUDGETS: List[Budget] = [
+    Budget("utils.pdf_to_json_row", 100),            # schema, prompt, parse_record
+    Budget("utils.fast_resolvers", 100),             # resolver-only callers
+    Budget("utils.resolver_cache", 100),
+    Budget("utils.llm_cache", 100),
+    Budget("utils.md_compact", 100),
+    Budget("utils.instrument", 100),
+    Budget("utils.text_layer", 100),                 # page checks; PyMuPDF loads on the first check
+    Budget("utils.docling_pipeline", 100),
+    Budget("utils.pdf_text", 150, ("docling", "docling_core", "torch", "openai", "pandas", "pdfplumber")),
+    Budget("utils.landscape_word_doc", 150, ("docling", "torch", "openai", "pandas")),
+    Budget("utils.batch", 150),                      # the parent process only schedules work
+]
+
+@dataclass
+class Result:
+    module: str
+    ms: float
+    loaded: Dict[str, Tuple[float, float]] = field(default_factory=dict)   # name → (self ms, cumulative ms)
+
+def measure(module: str, *, python: str = sys.executable, repeat: int = 3) -> Result:
+    """Best-of-`repeat` cumulative import time of `module` in a fresh interpreter."""
+    best = None
+    for _ in range(max(1, repeat)):
+        p = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"],
+                           capture_output=True, text=True, cwd=ROOT)
+        if p.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{p.stderr[-2000:]}")
+        loaded: Dict[str, Tuple[float, float]] = {}
+        for line in p.stderr.splitlines():
+            if not line.startswith("import time:") or "[us]" in line:
+                continue
+            self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+            loaded[name.strip()] = (int(self_us) / 1000, int(cum_us) / 1000)
+        ms = loaded.get(module, (0.0, 0.0))[1]
+        if best is None or ms < best.ms:
+            best = Result(module, ms, loaded)
+    return best
+
+def check(budget: Budget, result: Result) -> List[str]:
+    problems = []
+    if result.ms > budget.max_ms:
+        problems.append(f"{result.ms:.0f} ms > {budget.max_ms:.0f} ms")
+    pulled = sorted({n.split(".")[0] for n in result.loaded} & set(budget.forbidden))
+    if pulled:
+        problems.append("imports " + ", ".join(pulled))
+    return problems
+
+def main(argv: Sequence[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Check cold-import time and heavy dependencies per module.")
+    ap.add_argument("modules", nargs="*", help="only these modules (default: every budgeted module)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--top", type=int, default=5, help="slowest dependencies to list per failing module")
+    a = ap.parse_args(argv)
+    budgets = [b for b in BUDGETS if not a.modules or b.module in a.modules]
+    budgets += [Budget(m, 100) for m in a.modules if m not in {b.module for b in BUDGETS}]
+    failed = 0
+    for b in budgets:
+        r = measure(b.module, repeat=a.repeat)
+        problems = check(b, r)
+        print(f"{'FAIL' if problems else 'ok  '} {b.module:<28} {r.ms:7.1f} ms  (budget {b.max_ms:.0f})"
+              + (f"  – {'; '.join(problems)}" if problems else ""))
+        if problems or a.modules:
+            deps = sorted(((c, n) for n, (_, c) in r.loaded.items() if n != b.module), reverse=True)
+            for c, n in deps[:a.top]:
+                print(f"       {c:7.1f} ms  {n}")
+        failed += bool(problems)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
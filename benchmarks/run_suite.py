@@ -0,0 +1,372 @@
+# benchmarks/run_suite.py  –  end-to-end throughput suite, results kept per commit
+# -------------------------------------------------------------------------------------------------
+# Runs every document of the corpus (pdfs/*.pdf + synthetic large PDFs) through the pipeline one
+# stage at a time and records per-stage wall time and peak RSS:
+#
+#   convert   pdf_to_combined_markdown (Docling + appended tables; case filter off)
+#   tables    extract_pdf_tables.extract_tables on its own
+#   compact   md_compact.compact_markdown
+#   llm       combined_md_to_record           → fake OpenAI server (benchmarks.fake_services)
+#   resolve   resolve_record_ids              → fake PubMed / Wikidata / OLS server
+#   docx      landscape_word_doc.row_to_landscape_doc
+#
+# --batch additionally times utils.batch.run_batch over the same corpus (docs/s with the stage
+# concurrency). Conversion and LLM caches are switched off so every run is cold. Results go to
+# benchmarks/results/<commit>.json (+ one summary line in history.jsonl); --compare prints the
+# change per stage against an earlier commit and --fail-on-regression turns slowdowns into exit 1.
+#
+# --smoke only checks correctness: every PDF goes through run_batch by path and as an in-memory
+# download, and must be written exactly when the full case-report check accepts it; table
+# extraction must find the same tables with and without the page screen (exit 1 if not).
+#
+# Run from the repository root as a module (`python benchmarks/run_suite.py` works too):
+#     python -m benchmarks.run_suite                       # pdfs/ + 40- and 150-page synthetic
+#     python -m benchmarks.run_suite --synthetic 300 --batch --compare HEAD~1
+#     python -m benchmarks.run_suite --docling-pipeline default --no-save    # Docling's default options
+#     python -m benchmarks.run_suite --smoke               # pdfs/*.pdf through run_batch, no timings
+from __future__ import annotations
+import argparse
+import datetime
+import json
+import os
+import pathlib
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+RESULTS_DIR = pathlib.Path(__file__).resolve().parent / "results"
+STAGES = ("convert", "tables", "compact", "llm", "resolve", "docx")
+MIN_DELTA_S = 0.02          # stage-time changes below this never count as regressions
+
+# ---- memory ----
+def reset_peak_rss() -> bool:
+    """Reset this process' high-water mark (Linux ≥ 4.0); False where that isn't possible."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """Peak RSS since the last reset (VmHWM) for this process, lifetime peak for children."""
+    if who == resource.RUSAGE_SELF:
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+    kb = resource.getrusage(who).ru_maxrss
+    return kb / 1024 / (1024 if sys.platform == "darwin" else 1)   # bytes on macOS, KiB elsewhere
+
+def _timed(fn: Callable[[], Any]) -> Tuple[Any, float, float]:
+    reset_peak_rss()
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0, peak_rss_mb()
+
+# ---- git ----
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return ""
+
+def commit_id() -> Tuple[str, bool]:
+    sha = _git("rev-parse", "--short=10", "HEAD") or "unknown"
+    dirty = bool(_git("status", "--porcelain", "--untracked-files=no"))
+    return sha, dirty
+
+# ---- corpus ----
+def _page_count(path: pathlib.Path) -> int:
+    try:
+        import fitz
+        with fitz.open(path) as d:
+            return d.page_count
+    except Exception:
+        return 0
+
+def build_corpus(pdf_dir: Optional[pathlib.Path], synthetic: List[int], synthetic_dir: pathlib.Path) -> List[pathlib.Path]:
+    paths = sorted(pdf_dir.glob("*.pdf")) if pdf_dir else []
+    if synthetic:
+        from benchmarks.synthetic_pdfs import make_corpus
+        paths += make_corpus(synthetic_dir, synthetic)
+    return paths
+
+# ---- the suite ----
+def run_document(path: pathlib.Path, *, model: str, repeat: int, out_dir: pathlib.Path) -> Dict[str, Any]:
+    import pandas as pd
+    from utils.extract_pdf_tables import extract_tables
+    from utils.landscape_word_doc import row_to_landscape_doc
+    from utils.md_compact import compact_markdown
+    from utils.pdf_to_json_row import COLUMNS, combined_md_to_record, pdf_to_combined_markdown, resolve_record_ids
+
+    runs: Dict[str, List[Tuple[float, float]]] = {s: [] for s in STAGES}
+
+    def timed(stage: str, fn):
+        out, t, m = _timed(fn)
+        runs[stage].append((t, m))
+        return out
+
+    for _ in range(repeat):
+        # prefilter off: every corpus document is measured, whatever its metadata says
+        md = timed("convert", lambda: pdf_to_combined_markdown(path, prefilter=False))
+        timed("tables", lambda: extract_tables(path))
+        md_c = timed("compact", lambda: compact_markdown(md).text)
+        row = timed("llm", lambda: combined_md_to_record(md_c, model=model, use_cache=False))
+        row = timed("resolve", lambda: resolve_record_ids(row))
+        df = pd.DataFrame([row], columns=COLUMNS)
+        timed("docx", lambda: row_to_landscape_doc(df, out_dir / f"{path.stem}_summary.docx"))
+    stages = {s: {"s": round(statistics.median(t for t, _ in v), 5), "peak_rss_mb": round(max(m for _, m in v), 1)}
+              for s, v in runs.items()}
+    return {"pages": _page_count(path), "bytes": path.stat().st_size, "stages": stages,
+            "total_s": round(sum(v["s"] for k, v in stages.items() if k != "tables"), 5)}
+
+def run_batch_stage(paths: List[pathlib.Path], *, model: str, out_dir: pathlib.Path) -> Dict[str, Any]:
+    from utils.batch import BatchConfig, run_batch
+    cfg = BatchConfig(model=model, journal=None, outputs=("jsonl",), keep_records=False)
+    reset_peak_rss()
+    result = run_batch([str(p) for p in paths], out_dir / "batch", cfg)
+    return {"docs": result.written, "failed": len(result.failures), "elapsed_s": round(result.elapsed_s, 3),
+            "docs_per_s": round(result.docs_per_s, 4), "peak_rss_mb": round(peak_rss_mb(), 1),
+            "workers_peak_rss_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+            "convert_workers": cfg.convert_workers}
+
+def run_suite(paths: List[pathlib.Path], *, model: str = "gpt-4.1", repeat: int = 1, batch: bool = False,
+              llm_latency: float = 0.5, http_latency: float = 0.05) -> Dict[str, Any]:
+    from benchmarks.fake_services import FakeServices
+    os.environ["PDF_CACHE"] = "0"             # cold runs: no conversion / LLM / resolver cache hits
+    os.environ["LLM_CACHE"] = "0"
+    os.environ["RESOLVER_CACHE"] = "0"
+    sha, dirty = commit_id()
+    with FakeServices(llm_latency=llm_latency, http_latency=http_latency) as fake, \
+            tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        docs: Dict[str, Any] = {}
+        t0 = time.perf_counter()
+        for p in paths:
+            print(f"➜  {p.name}", flush=True)
+            try:
+                docs[p.name] = run_document(p, model=model, repeat=repeat, out_dir=pathlib.Path(tmp))
+            except Exception as e:
+                docs[p.name] = {"error": repr(e)}
+        wall = time.perf_counter() - t0
+        batch_res = run_batch_stage(paths, model=model, out_dir=pathlib.Path(tmp)) if batch else None
+        requests_served = dict(fake.counts)
+
+    ok = [d for d in docs.values() if "error" not in d]
+    totals = {s: round(sum(d["stages"][s]["s"] for d in ok), 5) for s in STAGES}
+    seq_s = sum(d["total_s"] for d in ok)
+    return {
+        "commit": sha, "dirty": dirty,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count(), "node": platform.node()},
+        "config": {"model": model, "repeat": repeat, "llm_latency": llm_latency, "http_latency": http_latency,
+                   "docling_pipeline": os.getenv("DOCLING_PIPELINE", "adaptive"),
+                   "table_mode": os.getenv("DOCLING_TABLE_MODE", "auto")},
+        "docs": docs,
+        "stage_totals_s": totals,
+        "docs_per_s": round(len(ok) / seq_s, 4) if seq_s else 0.0,          # sequential, one doc at a time
+        "pages_per_s": round(sum(d["pages"] for d in ok) / seq_s, 3) if seq_s else 0.0,
+        "peak_rss_mb": round(max((v["peak_rss_mb"] for d in ok for v in d["stages"].values()), default=0.0), 1),
+        "wall_s": round(wall, 3),
+        "batch": batch_res,
+        "requests": requests_served,
+    }
+
+# ---- smoke check ----
+def smoke(pdf_dir: pathlib.Path, *, model: str = "gpt-4.1") -> List[str]:
+    """
+    Every PDF in `pdf_dir` through utils.batch.run_batch with the default settings (case pre-filter
+    on), once by path and once as an in-memory download (a bytes-backed doc_sources.FetchedDoc),
+    against the fake services. A document must be written exactly when the definitive check –
+    pdf_to_combined_markdown without the pre-filter – accepts it, and every other failure counts.
+    Returns the problems found; empty = pass.
+    """
+    from benchmarks.fake_services import FakeServices
+    from utils.batch import BatchConfig, run_batch
+    from utils.doc_sources import FetchedDoc
+    from utils.pdf_to_json_row import pdf_to_combined_markdown
+    paths = sorted(pdf_dir.glob("*.pdf"))
+    if not paths:
+        return [f"no PDFs in {pdf_dir}"]
+    os.environ["PDF_CACHE"] = "0"
+    os.environ["LLM_CACHE"] = "0"
+    os.environ["RESOLVER_CACHE"] = "0"         # fake ids must not reach the real cache
+    expected: Dict[str, bool] = {}
+    for p in paths:
+        try:
+            pdf_to_combined_markdown(p, prefilter=False)
+            expected[p.name] = True
+        except ValueError:                        # not a case report
+            expected[p.name] = False
+    sources: List[Any] = [str(p) for p in paths]
+    sources += [FetchedDoc(f"memory-{p.name}", data=p.read_bytes()) for p in paths]
+    cfg = BatchConfig(model=model, journal=None, outputs=("jsonl",))
+    with FakeServices(llm_latency=0.0, http_latency=0.0), tempfile.TemporaryDirectory(prefix="smoke-") as tmp:
+        result = run_batch(sources, tmp, cfg)
+    problems = []
+    written = {r["Source_file"] for r in result.records}
+    failed = {f["file"]: f"{f['stage']}: {f['error']}" for f in result.failures}
+    for p in paths:
+        for name in (p.name, f"memory-{p.name}"):
+            if expected[p.name] and name not in written:
+                problems.append(f"{name}: not written ({failed.get(name)})")
+            elif not expected[p.name] and name in written:
+                problems.append(f"{name}: written, but the full check rejects it")
+            elif not expected[p.name] and "case report" not in failed.get(name, ""):
+                problems.append(f"{name}: {failed.get(name)}")
+    return problems + screen_check(paths)
+
+def screen_check(paths: List[pathlib.Path]) -> List[str]:
+    """
+    utils.extract_pdf_tables must return the same tables with the default PageScreen as with
+    screening off – on `paths` and on synthetic tables drawn with solid and with dashed rules.
+    """
+    from benchmarks.synthetic_pdfs import make_pdf
+    from utils.extract_pdf_tables import PageScreen, extract_tables
+    problems = []
+    with tempfile.TemporaryDirectory(prefix="screen-") as tmp:
+        synthetic = [make_pdf(pathlib.Path(tmp) / f"{style}.pdf", 4, dashed=style == "dashed")
+                     for style in ("solid", "dashed")]
+        for p in list(paths) + synthetic:
+            screened = extract_tables(p)
+            full = extract_tables(p, screen=PageScreen(enabled=False))
+            if not full and p in synthetic:
+                problems.append(f"{p.name}: no tables found even without the screen")
+            if len(screened) != len(full) or not all(
+                    a.attrs == b.attrs and a.equals(b) for a, b in zip(screened, full)):
+                problems.append(f"{p.name}: {len(screened)} tables with the screen, {len(full)} without")
+    return problems
+
+# ---- storage and comparison ----
+def save(result: Dict[str, Any], results_dir: pathlib.Path = RESULTS_DIR) -> pathlib.Path:
+    results_dir.mkdir(parents=True, exist_ok=True)
+    path = results_dir / f"{result['commit']}{'-dirty' if result['dirty'] else ''}.json"
+    path.write_text(json.dumps(result, indent=1, ensure_ascii=False))
+    summary = {k: result[k] for k in ("commit", "dirty", "timestamp", "stage_totals_s", "docs_per_s", "peak_rss_mb")}
+    if result.get("batch"):
+        summary["batch_docs_per_s"] = result["batch"]["docs_per_s"]
+    with open(results_dir / "history.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps(summary) + "\n")
+    return path
+
+def load_baseline(ref: Optional[str], current: str, results_dir: pathlib.Path = RESULTS_DIR) -> Optional[Dict[str, Any]]:
+    """Result for `ref` (file, commit-ish) or, without ref, the latest stored run of another commit."""
+    if ref:
+        p = pathlib.Path(ref)
+        if p.is_file():
+            return json.loads(p.read_text())
+        sha = _git("rev-parse", "--short=10", ref) or ref
+        for cand in (results_dir / f"{sha}.json", results_dir / f"{sha}-dirty.json"):
+            if cand.is_file():
+                return json.loads(cand.read_text())
+        return None
+    runs = sorted(results_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for p in runs:
+        r = json.loads(p.read_text())
+        if r.get("commit") != current:
+            return r
+    return None
+
+def compare(current: Dict[str, Any], base: Dict[str, Any], threshold: float = 0.10) -> List[str]:
+    """Print per-stage changes; return the metrics that regressed by more than `threshold`."""
+    common = [n for n, d in current["docs"].items()
+              if "error" not in d and "error" not in base.get("docs", {}).get(n, {"error": 1})]
+    def total(r, key):                                          # over the documents both runs measured
+        return sum(r["docs"][n]["stages"][key]["s"] if key in STAGES else r["docs"][n][key] for n in common)
+    rows: List[Tuple[str, float, float, bool]] = []          # (metric, base, now, higher_is_better)
+    for s in STAGES:
+        rows.append((f"{s} s", total(base, s), total(current, s), False))
+    b_s, n_s = total(base, "total_s"), total(current, "total_s")
+    rows.append(("docs/s", len(common) / b_s if b_s else 0.0, len(common) / n_s if n_s else 0.0, True))
+    rows.append(("peak RSS MB", base.get("peak_rss_mb", 0.0), current["peak_rss_mb"], False))
+    if current.get("batch") and base.get("batch"):
+        rows.append(("batch docs/s", base["batch"]["docs_per_s"], current["batch"]["docs_per_s"], True))
+    print(f"\nvs {base['commit']}{' (dirty)' if base.get('dirty') else ''} ({base['timestamp']}), "
+          f"{len(common)} common documents:")
+    regressed = []
+    for name, b, n, higher in rows:
+        change = (n - b) / b if b else 0.0
+        worse = (change < -threshold) if higher else (change > threshold)
+        if name.endswith(" s") and abs(n - b) < MIN_DELTA_S:    # ms-scale stages: timer noise
+            worse = False
+        if worse and b:
+            regressed.append(name)
+        print(f"  {name:<14} {b:>10.3f} → {n:>10.3f}  {change:+7.1%}{'  ⚠️' if worse and b else ''}")
+    return regressed
+
+def _print(result: Dict[str, Any]) -> None:
+    print(f"\n{'document':<32}{'pages':>6}" + "".join(f"{s:>10}" for s in STAGES) + f"{'peak MB':>10}")
+    for name, d in result["docs"].items():
+        if "error" in d:
+            print(f"{name[:31]:<32}  ⚠️  {d['error']}")
+            continue
+        peak = max(v["peak_rss_mb"] for v in d["stages"].values())
+        print(f"{name[:31]:<32}{d['pages']:>6}" + "".join(f"{d['stages'][s]['s']:>10.3f}" for s in STAGES) + f"{peak:>10.1f}")
+    print(f"\n{result['docs_per_s']:.3f} docs/s, {result['pages_per_s']:.1f} pages/s sequential; "
+          f"peak RSS {result['peak_rss_mb']:.0f} MB")
+    if result.get("batch"):
+        b = result["batch"]
+        print(f"batch: {b['docs']} docs in {b['elapsed_s']:.1f} s = {b['docs_per_s']:.3f} docs/s "
+              f"({b['convert_workers']} convert workers, worker peak RSS {b['workers_peak_rss_mb']:.0f} MB)")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.run_suite", description=__doc__)
+    ap.add_argument("--pdf-dir", default=str(ROOT / "pdfs"), help="real documents ('' = none)")
+    ap.add_argument("--synthetic", type=int, nargs="*", default=[40, 150], help="page counts of synthetic PDFs")
+    ap.add_argument("--synthetic-dir", default=os.path.join(tempfile.gettempdir(), "case-bench-synthetic"))
+    ap.add_argument("--repeat", type=int, default=1, help="runs per document (median is kept)")
+    ap.add_argument("--batch", action="store_true", help="also time utils.batch.run_batch")
+    ap.add_argument("--model", default="gpt-4.1")
+    ap.add_argument("--llm-latency", type=float, default=0.5, help="seconds per fake completion")
+    ap.add_argument("--http-latency", type=float, default=0.05, help="seconds per fake resolver request")
+    ap.add_argument("--docling-pipeline", choices=("adaptive", "default"), default=None,
+                    help="utils.docling_pipeline mode (default: $DOCLING_PIPELINE or adaptive)")
+    ap.add_argument("--table-mode", choices=("auto", "fast", "accurate"), default=None)
+    ap.add_argument("--results-dir", default=str(RESULTS_DIR))
+    ap.add_argument("--no-save", action="store_true")
+    ap.add_argument("--compare", nargs="?", const="", default=None,
+                    help="compare with a stored run (commit-ish or file; default: latest other commit)")
+    ap.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    ap.add_argument("--fail-on-regression", action="store_true")
+    ap.add_argument("--smoke", action="store_true",
+                    help="only check that --pdf-dir goes through run_batch without failures (exit 1 otherwise)")
+    a = ap.parse_args(argv)
+
+    sys.path.insert(0, str(ROOT))
+    if a.smoke:
+        problems = smoke(pathlib.Path(a.pdf_dir), model=a.model)
+        print("\n".join(f"FAIL {p}" for p in problems) or "smoke: ok")
+        return 1 if problems else 0
+    if a.docling_pipeline:
+        os.environ["DOCLING_PIPELINE"] = a.docling_pipeline
+    if a.table_mode:
+        os.environ["DOCLING_TABLE_MODE"] = a.table_mode
+    paths = build_corpus(pathlib.Path(a.pdf_dir) if a.pdf_dir else None, a.synthetic, pathlib.Path(a.synthetic_dir))
+    if not paths:
+        ap.error("empty corpus")
+    result = run_suite(paths, model=a.model, repeat=a.repeat, batch=a.batch,
+                       llm_latency=a.llm_latency, http_latency=a.http_latency)
+    _print(result)
+    results_dir = pathlib.Path(a.results_dir)
+    if not a.no_save:
+        print(f"saved {save(result, results_dir)}")
+    if a.compare is not None:
+        base = load_baseline(a.compare or None, result["commit"], results_dir)
+        if base is None:
+            print("\nno stored run to compare with")
+        elif compare(result, base, a.threshold) and a.fail_on_regression:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
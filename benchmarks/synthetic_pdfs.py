@@ -0,0 +1,100 @@
+# benchmarks/synthetic_pdfs.py  –  large, deterministic case-report-like PDFs for the benchmarks
+# -------------------------------------------------------------------------------------------------
+# PyMuPDF draws a title page ("Case report" in metadata and text, so utils.case_filter accepts it),
+# then pages of wrapped prose, with a ruled lab-values table every `table_every` pages – text for
+# Docling / PyMuPDF and ruling lines for utils.extract_pdf_tables, in realistic proportions.
+# dashed=True draws every rule as separate 2 pt segments (as some typesetters do), which pdfplumber
+# only turns into table edges after joining them.
+#
+#     python -m benchmarks.synthetic_pdfs out_dir --pages 40 150
+from __future__ import annotations
+import pathlib
+import random
+from typing import Iterable, List, Union
+
+_WORDS = ("patient presented with progressive weakness elevated enzyme activity plasma sample "
+          "genetic testing revealed heterozygous variant treatment was started follow-up showed "
+          "improvement renal function cardiac involvement biopsy confirmed deposits family history "
+          "negative consanguinity reported therapy dose adjusted months later symptoms resolved").split()
+_TESTS = ["Hemoglobin", "Creatinine", "ALT", "AST", "Lyso-Gb3", "α-Gal A", "Phenylalanine",
+          "Tyrosine", "CK", "Lactate", "Ammonia", "Glucose"]
+_UNITS = ["g/dL", "mg/dL", "U/L", "nmol/L", "µmol/L", "mmol/L"]
+
+def _sentence(rnd: random.Random) -> str:
+    words = [rnd.choice(_WORDS) for _ in range(rnd.randint(8, 22))]
+    return " ".join(words).capitalize() + "."
+
+def _rule(page, p0, p1, dashed: bool) -> None:
+    if not dashed:
+        page.draw_line(p0, p1, width=0.5)
+        return
+    (x0, y0), (x1, y1) = p0, p1
+    length = max(x1 - x0, y1 - y0)
+    for a in range(0, int(length), 3):                # 2 pt dash, 1 pt gap
+        b = min(a + 2, length)
+        page.draw_line((x0 + (x1 - x0) * a / length, y0 + (y1 - y0) * a / length),
+                       (x0 + (x1 - x0) * b / length, y0 + (y1 - y0) * b / length), width=0.5)
+
+def _draw_table(page, rnd: random.Random, top: float, rows: int, dashed: bool = False) -> float:
+    """Ruled 4-column table starting at `top`; returns its bottom y."""
+    x = [60, 220, 330, 430, 540]
+    h = 16
+    page.insert_text((x[0] + 3, top - 6), f"Table {rnd.randint(1, 9)}. Laboratory findings", fontsize=9)
+    for r in range(rows + 1):
+        y = top + r * h
+        cells = ["Test", "Value", "Unit", "Reference"] if r == 0 else \
+            [rnd.choice(_TESTS), f"{rnd.uniform(0.1, 400):.1f}", rnd.choice(_UNITS), f"{rnd.randint(1, 50)}–{rnd.randint(51, 300)}"]
+        for c, text in enumerate(cells):
+            page.insert_text((x[c] + 3, y + 12), text, fontsize=8)
+    for r in range(rows + 2):
+        _rule(page, (x[0], top + r * h), (x[-1], top + r * h), dashed)
+    for xx in x:
+        _rule(page, (xx, top), (xx, top + (rows + 1) * h), dashed)
+    return top + (rows + 1) * h
+
+def make_pdf(path: Union[str, pathlib.Path], pages: int, *, seed: int = 0, table_every: int = 2,
+             dashed: bool = False) -> pathlib.Path:
+    import fitz
+    rnd = random.Random(seed)
+    doc = fitz.open()
+    title = f"Case report: an atypical presentation in a {rnd.randint(2, 70)}-year-old patient ({pages} pages)"
+    doc.set_metadata({"title": title, "subject": "Case report", "keywords": "case report; synthetic"})
+    for p in range(pages):
+        page = doc.new_page(width=612, height=792)
+        page.set_cropbox(page.rect)                  # explicit CropBox (pdfplumber warns otherwise)
+        y = 72.0
+        if p == 0:
+            page.insert_textbox(fitz.Rect(60, y, 552, y + 60), title, fontsize=16)
+            y += 70
+        if table_every and p % table_every == 1:
+            y = _draw_table(page, rnd, y + 12, rnd.randint(5, 12), dashed) + 24
+        sentences = [_sentence(rnd) for _ in range(40)]
+        while sentences and page.insert_textbox(fitz.Rect(60, y, 552, 740), " ".join(sentences), fontsize=10) < 0:
+            sentences = sentences[:-4]                # overflowing text is not drawn at all: trim to fit
+        page.insert_text((300, 770), str(p + 1), fontsize=8)
+    path = pathlib.Path(path)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return path
+
+def make_corpus(out_dir: Union[str, pathlib.Path], page_counts: Iterable[int] = (40, 150), *,
+                seed: int = 0) -> List[pathlib.Path]:
+    """One synthetic PDF per page count (reused when already present)."""
+    out = pathlib.Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i, n in enumerate(page_counts):
+        path = out / f"synthetic_{n:04d}p.pdf"
+        if not path.exists():
+            make_pdf(path, n, seed=seed + i)
+        paths.append(path)
+    return paths
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("out_dir")
+    ap.add_argument("--pages", type=int, nargs="+", default=[40, 150])
+    a = ap.parse_args()
+    for p in make_corpus(a.out_dir, a.pages):
+        print(p)
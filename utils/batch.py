@@ -0,0 +1,416 @@
+# utils/batch.py  –  parallel batch runner for the case-report pipeline
+# -------------------------------------------------------------------------------------------------
+# The notebook loop ran conversion, the LLM call, the resolvers and the Word export back to back on
+# one core. Here each step is a stage with its own concurrency, connected by bounded queues:
+#
+#   convert  (CPU)  : N threads, each driving one job at a time in a spawn-based process pool
+#   extract  (I/O)  : LLM calls in a thread pool
+#   resolve  (I/O)  : PubMed / Wikidata / OLS lookups in a thread pool
+#   write           : Word export (utils.landscape_word_doc template) + record store, calling thread
+#
+# Progress is journaled per document (utils.run_journal, keyed by content hash): a restarted run
+# skips written documents, resumes partially processed ones and retries failures. Finished rows
+# are appended to all_summaries.jsonl / all_summaries.parquet (utils.record_writer) as they
+# complete; CSV/XLSX are exported from that store at the end.
+#
+# Documents come from a utils.doc_sources source (local dir, HTTP listing, Dropbox) and are
+# downloaded ahead of the convert stage by doc_sources.prefetch. A document that cannot be
+# downloaded or read fails on its own (journaled under "name:<name>", having no content hash);
+# the rest of the run goes on.
+#
+# --instrument (or $INSTRUMENT_SINK) records a span per stage and document (utils.instrument):
+# batch.<stage> spans here, docling / tables / llm / pubmed / wikidata / docx spans inside them.
+#
+# Docling runs the adaptive pipeline (utils.docling_pipeline): OCR only on pages without a usable
+# text layer, FAST / ACCURATE table structure per --table-mode. --docling-pipeline default restores
+# Docling's default options.
+#
+# Usage:  python -m utils.batch SOURCE OUT_DIR [--convert-workers 8] [--llm-workers 16] ...
+#         SOURCE = PDF_DIR | dropbox:/folder | https://host/listing.json
+from __future__ import annotations
+import argparse
+import multiprocessing
+import os
+import pathlib
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils import instrument
+
+_DONE = object()      # end-of-stream marker passed between stages
+
+@dataclass
+class BatchConfig:
+    convert_workers: int = max(1, (os.cpu_count() or 2) // 2)
+    llm_workers: int = 16
+    resolve_workers: int = 8
+    queue_size: int = 32                  # max items waiting between two stages
+    torch_threads: Optional[int] = None   # per conversion process; default cpu_count // convert_workers
+    model: str = "gpt-4.1"
+    write_docx: bool = True
+    compact: Any = True                   # True, False or a utils.md_compact.CompactConfig
+    prefetch: int = 8                     # documents downloaded ahead when given a DocSource
+    journal: Optional[str] = "run_journal.sqlite"   # relative to out_dir; None = no resume
+    outputs: Tuple[str, ...] = ("jsonl", "parquet") # incremental record stores (utils.record_writer)
+    keep_records: bool = True                       # also collect rows in BatchResult.records
+
+@dataclass
+class BatchResult:
+    records: List[Dict[str, str]] = field(default_factory=list)     # only with config.keep_records
+    written: int = 0
+    failures: List[Dict[str, str]] = field(default_factory=list)
+    elapsed_s: float = 0.0
+    fetch_stats: Dict[str, float] = field(default_factory=dict)   # doc_sources.prefetch counters
+    skipped: int = 0                                               # already written in an earlier run
+    journal_path: Optional[str] = None
+    resolver_stats: Dict[str, Dict[str, float]] = field(default_factory=dict)   # fast_resolvers.cache_stats()
+
+    @property
+    def docs_per_s(self) -> float:
+        n = self.written + len(self.failures)
+        return n / self.elapsed_s if self.elapsed_s else 0.0
+
+# ---- conversion runs in worker processes (top-level functions so they pickle) ----
+def _init_convert_worker(torch_threads: int) -> None:
+    os.environ.setdefault("OMP_NUM_THREADS", str(torch_threads))
+    from utils import docling_pipeline, instrument
+    instrument.configure_from_env(per_process=True)   # spans of the Docling / table stages
+    docling_pipeline.warm_up()            # load Docling models once per worker process (no-OCR converter)
+
+def _convert_worker(source: Any) -> str:
+    from utils import instrument
+    from utils.pdf_to_json_row import pdf_to_combined_markdown
+    if isinstance(source, tuple):                 # in-memory download: (name, bytes)
+        name, source = source
+    else:
+        name = pathlib.Path(str(source)).name
+    with instrument.document(name):
+        return pdf_to_combined_markdown(source)
+
+# ---- stage plumbing ----
+def _stage(name: str, fn: Callable[[Dict[str, Any]], None], n_workers: int,
+           q_in: "queue.Queue", q_out: "queue.Queue", journal=None) -> List[threading.Thread]:
+    """
+    Start `n_workers` threads applying `fn` to items from q_in; failures are passed through.
+    Items whose "resume" set names this stage skip it; outcomes are recorded in `journal`.
+    """
+    remaining = [n_workers]
+    lock = threading.Lock()
+
+    def run():
+        try:
+            while True:
+                item = q_in.get()
+                if item is _DONE:
+                    q_in.put(_DONE)                      # let sibling workers see it too
+                    return
+                if "error" not in item and name not in item.get("resume", ()):
+                    t0 = time.perf_counter()
+                    try:
+                        with instrument.document(item["name"]), instrument.stage(f"batch.{name}"):
+                            fn(item)
+                    except Exception as e:
+                        item["error"], item["stage"] = repr(e), name
+                    elapsed = item.setdefault("timings", {})[name] = time.perf_counter() - t0
+                    if journal is not None:
+                        try:
+                            if "error" in item:
+                                journal.fail(item["sha"], name, item["error"])
+                            else:
+                                journal.advance(item["sha"], name, elapsed=elapsed,
+                                                row=item.get("row") if name != "convert" else None)
+                        except Exception as e:           # journal unusable: report, keep the run going
+                            item["error"], item["stage"] = repr(e), name
+                q_out.put(item)
+        finally:                                         # also when a worker dies: never hang downstream
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    q_out.put(_DONE)
+
+    threads = [threading.Thread(target=run, name=f"{name}-{i}", daemon=True) for i in range(n_workers)]
+    for t in threads:
+        t.start()
+    return threads
+
+def _reconcile_output(journal, out: pathlib.Path) -> int:
+    """
+    Mark documents whose row reached the record store but not the journal (a crash between
+    writer.write and journal.advance) as written, so a resumed run does not append them again.
+    The writer appends in journal order, so only rows past the journal's written count qualify.
+    """
+    from utils.record_writer import read_records
+    written = journal.counts().get("written", 0)
+    df = read_records(out)
+    if len(df) <= written:
+        return 0
+    tail = df.iloc[written:].to_dict("records")
+    marked = 0
+    for state in journal.iter_states():
+        if state.stage != "resolved" or state.row is None:
+            continue
+        row = {c: "" if state.row.get(c) is None else str(state.row.get(c)) for c in df.columns}
+        if row in tail:
+            tail.remove(row)
+            journal.advance(state.sha, "write", row=state.row)
+            marked += 1
+    return marked
+
+def run_batch(sources: Iterable[Any], out_dir: str | pathlib.Path,
+              config: Optional[BatchConfig] = None,
+              *, on_item: Optional[Callable[[Dict[str, Any]], None]] = None) -> BatchResult:
+    """
+    Run the pipeline over `sources` and write results to `out_dir`. `sources` is a
+    utils.doc_sources.DocSource (prefetched `config.prefetch` deep), or an iterable of paths,
+    (name, bytes) tuples or doc_sources.FetchedDoc.
+    `on_item` is called on the writer thread for every finished item (success or failure).
+    """
+    from utils import conversion_cache
+    from utils.doc_sources import DocSource, FetchedDoc, prefetch
+    from utils.record_writer import RecordWriter
+    from utils.run_journal import RunJournal
+    from utils.md_compact import CompactConfig, compact_markdown
+    from utils.pdf_to_json_row import COLUMNS, combined_md_to_record, resolve_record_ids
+
+    cfg = config or BatchConfig()
+    out = pathlib.Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    torch_threads = cfg.torch_threads or max(1, (os.cpu_count() or 1) // cfg.convert_workers)
+
+    q_src, q_md, q_rec, q_out = (queue.Queue(maxsize=cfg.queue_size) for _ in range(4))
+    pool = ProcessPoolExecutor(max_workers=cfg.convert_workers,
+                               mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_convert_worker, initargs=(torch_threads,))
+
+    def convert(item):
+        try:
+            item["md"] = pool.submit(_convert_worker, item.pop("source")).result()
+        finally:
+            fetched = item.pop("fetched", None)
+            if fetched is not None:
+                fetched.discard()                        # spill file no longer needed
+
+    def extract(item):
+        md = item.pop("md")
+        if cfg.compact:
+            c = compact_markdown(md, cfg.compact if isinstance(cfg.compact, CompactConfig) else None)
+            md, item["tokens"] = c.text, (c.tokens_before, c.tokens_after)
+        item["row"] = combined_md_to_record(md, model=cfg.model)
+
+    def resolve(item):
+        row = resolve_record_ids(item["row"])
+        row["Source_file"] = item["name"]
+        item["row"] = row
+
+    result = BatchResult()
+    journal = None
+    if cfg.journal:
+        result.journal_path = str(out / cfg.journal)
+        journal = RunJournal(result.journal_path)
+    if isinstance(sources, DocSource):
+        sources = prefetch(sources, depth=cfg.prefetch, stats=result.fetch_stats)
+
+    def unreadable(name: str, stage: str, error: str) -> Dict[str, Any]:
+        """Failed item for a document whose bytes never arrived / could not be hashed."""
+        item = {"name": name, "sha": f"name:{name}", "stage": stage, "error": error}
+        if journal is not None:
+            try:
+                journal.start(item["sha"], name)
+                journal.fail(item["sha"], stage, error)
+            except Exception:                                # the item already carries its error
+                pass
+        return item
+
+    def admit(src: Any) -> Optional[Dict[str, Any]]:
+        """Work item for one source, or None when the journal says it is already written."""
+        if isinstance(src, FetchedDoc) and src.error is not None:
+            return unreadable(src.name, "fetch", src.error)
+        item: Dict[str, Any] = {}
+        if isinstance(src, FetchedDoc):
+            name, data = src.name, src.source()
+            item["fetched"] = src
+        elif isinstance(src, tuple):
+            name, data = src
+        else:
+            name, data = pathlib.Path(src).name, str(src)
+        item.update(name=name, source=data)
+        if journal is None:
+            return item
+        try:
+            item["sha"] = conversion_cache.content_key(data[1] if isinstance(data, tuple) else data)
+        except Exception as e:                           # unreadable input: report, keep going
+            if isinstance(src, FetchedDoc):
+                src.discard()
+            return unreadable(name, "read", repr(e))
+        journal.forget(f"name:{name}")                   # an earlier failed download, if any
+        state = journal.get(item["sha"])
+        if state is not None and state.done:
+            result.skipped += 1
+            if isinstance(src, FetchedDoc):
+                src.discard()
+            return None
+        journal.start(item["sha"], name)
+        if state is not None and state.row is not None and state.stage in ("extracted", "resolved"):
+            item["row"] = state.row                      # resume after the LLM call
+            item["resume"] = {"convert", "extract"} | ({"resolve"} if state.stage == "resolved" else set())
+            item.pop("source")
+            if isinstance(src, FetchedDoc):
+                src.discard()
+                item.pop("fetched")
+        return item
+
+    def feed():
+        try:
+            for src in sources:
+                try:
+                    item = admit(src)
+                except Exception as e:                   # e.g. the journal: fail this document only
+                    name = src.name if isinstance(src, FetchedDoc) else \
+                        src[0] if isinstance(src, tuple) else pathlib.Path(str(src)).name
+                    item = unreadable(name, "read", repr(e))
+                    if isinstance(src, FetchedDoc):
+                        src.discard()
+                if item is not None:
+                    q_src.put(item)
+        finally:
+            q_src.put(_DONE)
+
+    t0 = time.perf_counter()
+    writer = template = None
+    try:
+        writer = RecordWriter(out, formats=cfg.outputs)   # recovers a torn JSONL / Parquet tail first
+        if journal is not None:
+            _reconcile_output(journal, out)
+        threading.Thread(target=feed, name="feed", daemon=True).start()
+        _stage("convert", convert, cfg.convert_workers, q_src, q_md, journal)
+        _stage("extract", extract, cfg.llm_workers, q_md, q_rec, journal)
+        _stage("resolve", resolve, cfg.resolve_workers, q_rec, q_out, journal)
+
+        while (item := q_out.get()) is not _DONE:
+            if "error" not in item and cfg.write_docx:
+                try:
+                    if template is None:
+                        from utils.landscape_word_doc import default_template
+                        template = default_template()
+                    with instrument.document(item["name"]):
+                        template.save(item["row"], out / f"{pathlib.Path(item['name']).stem or 'document'}_summary.docx",
+                                      columns=COLUMNS)
+                except Exception as e:
+                    item["error"], item["stage"] = repr(e), "docx"
+            if "error" in item:
+                result.failures.append({"file": item["name"], "stage": item["stage"], "error": item["error"]})
+                if journal is not None and item["stage"] == "docx":
+                    journal.fail(item["sha"], "docx", item["error"])
+            else:
+                writer.write(item["row"])
+                result.written += 1
+                if cfg.keep_records:
+                    result.records.append(item["row"])
+                if journal is not None:
+                    journal.advance(item["sha"], "write", row=item["row"])
+            if on_item:
+                on_item(item)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if writer is not None:
+            writer.close()
+        if journal is not None:
+            journal.close()
+    result.elapsed_s = time.perf_counter() - t0
+    from utils import fast_resolvers
+    result.resolver_stats = fast_resolvers.cache_stats()
+    return result
+
+def write_master(result: BatchResult, out_dir: str | pathlib.Path,
+                 formats: Iterable[str] = ("csv", "xlsx")) -> None:
+    """
+    Export all_summaries.csv/.xlsx from the record store (every document written so far, earlier
+    runs included) and write failures_log.csv with the documents that are still failing.
+    """
+    import pandas as pd
+    from utils import record_writer
+    out = pathlib.Path(out_dir)
+    record_writer.export(out, formats)
+    failures = result.failures
+    if result.journal_path:
+        from utils.run_journal import RunJournal
+        with RunJournal(result.journal_path) as journal:
+            failures = journal.failures()
+    if failures:
+        pd.DataFrame(failures).to_csv(out / "failures_log.csv", index=False)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m utils.batch", description="Batch case-report extraction.")
+    ap.add_argument("source", help="PDF directory, dropbox:/folder or an http(s) JSON listing URL")
+    ap.add_argument("out_dir")
+    d = BatchConfig()
+    ap.add_argument("--convert-workers", type=int, default=d.convert_workers)
+    ap.add_argument("--llm-workers", type=int, default=d.llm_workers)
+    ap.add_argument("--resolve-workers", type=int, default=d.resolve_workers)
+    ap.add_argument("--queue-size", type=int, default=d.queue_size)
+    ap.add_argument("--torch-threads", type=int, default=None)
+    ap.add_argument("--model", default=d.model)
+    ap.add_argument("--no-docx", action="store_true")
+    ap.add_argument("--token-budget", type=int, default=None,
+                    help="fit each prompt into this many tokens (default: utils.md_compact default)")
+    ap.add_argument("--no-compact", action="store_true")
+    ap.add_argument("--prefetch", type=int, default=d.prefetch, help="documents to download ahead")
+    ap.add_argument("--no-journal", action="store_true", help="do not record progress / resume")
+    ap.add_argument("--restart", action="store_true", help="forget earlier progress in OUT_DIR")
+    ap.add_argument("--instrument", default=os.getenv("INSTRUMENT_SINK", ""),
+                    help="stage timing sinks, e.g. 'jsonl:spans.jsonl,chrome:trace.json,prom:metrics.prom' "
+                         "(see utils.instrument; conversion workers write their own -<pid> files)")
+    ap.add_argument("--docling-pipeline", choices=("adaptive", "default"),
+                    default=os.getenv("DOCLING_PIPELINE", "adaptive"),
+                    help="adaptive: OCR only where the text layer fails (utils.docling_pipeline)")
+    ap.add_argument("--table-mode", choices=("auto", "fast", "accurate"),
+                    default=os.getenv("DOCLING_TABLE_MODE", "auto"), help="Docling table-structure model")
+    ap.add_argument("--export", default="csv,xlsx", help="final exports from the record store: csv, xlsx, docx "
+                                                   "(one combined Word file); '' = none")
+    a = ap.parse_args(argv)
+    if a.instrument:
+        os.environ["INSTRUMENT_SINK"] = a.instrument        # inherited by the conversion workers
+        instrument.configure_from_env()
+    os.environ["DOCLING_PIPELINE"] = a.docling_pipeline      # read by the conversion workers
+    os.environ["DOCLING_TABLE_MODE"] = a.table_mode
+
+    cfg = BatchConfig(convert_workers=a.convert_workers, llm_workers=a.llm_workers,
+                      resolve_workers=a.resolve_workers, queue_size=a.queue_size,
+                      torch_threads=a.torch_threads, model=a.model, write_docx=not a.no_docx,
+                      prefetch=a.prefetch, journal=None if a.no_journal else d.journal,
+                      keep_records=False)
+    if a.restart and cfg.journal:
+        for suffix in ("", "-wal", "-shm"):
+            pathlib.Path(a.out_dir, cfg.journal + suffix).unlink(missing_ok=True)
+        pathlib.Path(a.out_dir, "all_summaries.jsonl").unlink(missing_ok=True)
+        shutil.rmtree(pathlib.Path(a.out_dir, "all_summaries.parquet"), ignore_errors=True)
+    if a.no_compact:
+        cfg.compact = False
+    elif a.token_budget:
+        from utils.md_compact import CompactConfig
+        cfg.compact = CompactConfig(token_budget=a.token_budget)
+    from utils.doc_sources import open_source
+
+    def report(item):
+        status = f"⚠️  {item['stage']}: {item['error']}" if "error" in item else "✅"
+        if "tokens" in item:
+            status += "  (prompt tokens {} → {})".format(*item["tokens"])
+        print(f"➜  {item['name']}  {status}", flush=True)
+
+    result = run_batch(open_source(a.source), a.out_dir, cfg, on_item=report)
+    write_master(result, a.out_dir, [f for f in a.export.split(",") if f])
+    print(f"\nDone: {result.written} ok, {len(result.failures)} failed, {result.skipped} already done, "
+          f"{result.elapsed_s:.1f} s ({result.docs_per_s:.2f} docs/s, "
+          f"{result.fetch_stats.get('wait_s', 0.0):.1f} s waiting on downloads)")
+    hits = ", ".join(f"{k} {v['hit_rate']:.0%}" for k, v in result.resolver_stats.items() if k != "_lru")
+    if hits:
+        print(f"Resolver cache hit rate: {hits}")
+    return 0 if not result.failures else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+# utils/case_filter.py  –  cheap "is this a case report?" check before any Docling work
+# -------------------------------------------------------------------------------------------------
+# pdf_to_combined_markdown used to convert the whole PDF and extract every table before looking
+# for "case report" in the result. This pre-filter reads only the PDF metadata (Title / Subject /
+# Keywords) and the text layer (PyMuPDF when installed, else pdfplumber), which takes milliseconds,
+# so documents that are clearly not case reports are rejected before the expensive path runs.
+# It must never be stricter than that full check: by default the whole text layer is searched, and
+# when any page has no usable text layer (scans, broken glyphs – see utils.text_layer) the document
+# is accepted and the full conversion decides.
+from __future__ import annotations
+import re
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple, Union
+
+from utils.pdf_ingest import IngestedPDF, PDFInput, ingest
+
+@dataclass(frozen=True)
+class CaseFilterConfig:
+    """Which signals the pre-filter looks at. Patterns are case-insensitive regexes."""
+    patterns: Tuple[str, ...] = (r"case[\s\-]+reports?",)
+    use_metadata: bool = True
+    metadata_fields: Tuple[str, ...] = ("Title", "Subject", "Keywords")
+    use_text: bool = True
+    pages: Optional[int] = None           # search only the first N pages (None = all; N can reject real cases)
+    accept_without_text: bool = True     # pages without a usable text layer: let the full conversion decide
+
+@dataclass(frozen=True)
+class CaseFilterResult:
+    is_case_report: bool
+    signal: str             # "metadata:Title", "text:page1", "no-text-layer" or "none"
+    elapsed_s: float
+
+    def __bool__(self) -> bool:
+        return self.is_case_report
+
+DEFAULT_CONFIG = CaseFilterConfig()
+
+def _as_text(value) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "ignore")
+    return value if isinstance(value, str) else ""
+
+def _first_pages_pymupdf(doc: IngestedPDF, n: Optional[int]):
+    """(metadata, [page texts], pages without a usable text layer) via PyMuPDF – roughly 10x faster than pdfplumber."""
+    from utils.text_layer import check_page
+    src = doc.fitz_open()
+    try:
+        meta = {k.capitalize(): v for k, v in (src.metadata or {}).items()}
+        texts, unreadable = [], 0
+        for i in range(src.page_count if n is None else min(n, src.page_count)):
+            page = src[i]
+            texts.append(page.get_text())
+            unreadable += check_page(page, texts[-1]).needs_ocr
+        return meta, texts, unreadable
+    finally:
+        src.close()
+
+def _first_pages_pdfplumber(doc: IngestedPDF, n: Optional[int]):
+    texts = [p.extract_text() or "" for p in doc.plumber.pages[:n]]
+    return doc.plumber.metadata or {}, texts, sum(not t.strip() for t in texts)
+
+def classify_case_report(pdf: Union[PDFInput, IngestedPDF],
+                         config: Optional[CaseFilterConfig] = None) -> CaseFilterResult:
+    """Return whether `pdf` may be a case report, using only metadata and the text layer."""
+    cfg = config or DEFAULT_CONFIG
+    t0 = time.perf_counter()
+    rx = re.compile("|".join(f"(?:{p})" for p in cfg.patterns), re.IGNORECASE)
+    doc = ingest(pdf)
+    try:
+        try:
+            meta, texts, unreadable = _first_pages_pymupdf(doc, cfg.pages if cfg.use_text else 0)
+        except ImportError:
+            meta, texts, unreadable = _first_pages_pdfplumber(doc, cfg.pages if cfg.use_text else 0)
+    finally:
+        if doc is not pdf:
+            doc.close()
+
+    if cfg.use_metadata:
+        for field in cfg.metadata_fields:
+            if rx.search(_as_text(meta.get(field))):
+                return CaseFilterResult(True, f"metadata:{field}", time.perf_counter() - t0)
+
+    if cfg.use_text:
+        for i, text in enumerate(texts, 1):
+            if rx.search(text):
+                return CaseFilterResult(True, f"text:page{i}", time.perf_counter() - t0)
+        if cfg.accept_without_text and (unreadable or not any(t.strip() for t in texts)):
+            return CaseFilterResult(True, "no-text-layer", time.perf_counter() - t0)
+
+    return CaseFilterResult(False, "none", time.perf_counter() - t0)
@@ -0,0 +1,199 @@
+# utils/conversion_cache.py  –  content-addressed on-disk cache for Docling output and tables
+# -------------------------------------------------------------------------------------------------
+# Key = SHA-256 of the PDF bytes + Docling version + pipeline options (tables: extractor version,
+# pdfplumber version and extraction settings such as the page screen), so unchanged files are never
+# converted twice while any upgrade or option change misses cleanly.
+# Values are zlib-compressed JSON: the DoclingDocument dict, and tables in "split" form – one JSON
+# line per table, compressed as the tables stream past (TableStore) and decoded one at a time.
+# The store is a size-bounded diskcache with LRU eviction (PDF_CACHE_MAX_BYTES, default 2 GiB).
+from __future__ import annotations
+import hashlib
+import json
+import mmap
+import os
+import pathlib
+import threading
+import zlib
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+TABLES_VERSION = "3"          # bump when extract_pdf_tables output or the stored format changes
+_CHUNK = 1 << 20
+
+_CACHE: Any = None
+_OPENED = False
+_LOCK = threading.Lock()
+
+def _cache():
+    """The diskcache store, opened on first use (None when diskcache is unavailable)."""
+    global _CACHE, _OPENED
+    if not _OPENED:
+        with _LOCK:
+            if not _OPENED:
+                try:
+                    import diskcache as dc
+                    _CACHE = dc.Cache(os.getenv("PDF_CACHE_DIR", "cache_conversions"),
+                                      size_limit=int(os.getenv("PDF_CACHE_MAX_BYTES", 2 << 30)),
+                                      eviction_policy="least-recently-used")
+                except Exception:
+                    _CACHE = None     # no diskcache → caching disabled
+                _OPENED = True
+    return _CACHE
+
+def __getattr__(name: str) -> Any:
+    if name == "CACHE":               # opened lazily, so importing this module stays cheap
+        return _cache()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _enabled() -> bool:
+    return os.getenv("PDF_CACHE", "1").lower() not in ("0", "false", "no") and _cache() is not None
+
+def _version(package: str) -> str:
+    try:
+        from importlib.metadata import version
+        return version(package)
+    except Exception:
+        return "unknown"
+
+def _docling_version() -> str:
+    return _version("docling")
+
+def content_key(pdf: Union[str, pathlib.Path, bytes, bytearray, memoryview, BytesIO, mmap.mmap]) -> str:
+    """SHA-256 hex digest of the PDF bytes (paths are hashed in 1 MiB chunks)."""
+    h = hashlib.sha256()
+    if isinstance(pdf, (str, pathlib.Path)):
+        with open(pdf, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK), b""):
+                h.update(chunk)
+    elif isinstance(pdf, BytesIO):
+        with pdf.getbuffer() as view:
+            h.update(view)
+    elif isinstance(pdf, (bytes, bytearray, memoryview, mmap.mmap)):
+        h.update(pdf)
+    else:
+        raise TypeError(f"Unsupported PDF input type: {type(pdf)!r}")
+    return h.hexdigest()
+
+def _docling_key(sha: str, options: Any = None, pages: Optional[Tuple[int, int]] = None) -> str:
+    from utils.converter_pool import options_key
+    opts = hashlib.sha1(options_key(options).encode("utf-8")).hexdigest()
+    key = f"docling:{_docling_version()}:{opts}:{sha}"
+    return key if pages is None else f"{key}:p{pages[0]}-{pages[1]}"
+
+def _pack(obj: Any) -> bytes:
+    return zlib.compress(json.dumps(obj, separators=(",", ":"), default=str).encode("utf-8"), 6)
+
+def _unpack(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+def _get(key: str):
+    if not _enabled():
+        return None
+    try:
+        return _cache().get(key)
+    except Exception:
+        return None
+
+def _set(key: str, value: bytes) -> None:
+    if not _enabled():
+        return
+    try:
+        _cache().set(key, value)
+    except Exception:
+        pass
+
+# ---- Docling documents ----
+def load_docling_document(sha: str, options: Any = None, pages: Optional[Tuple[int, int]] = None):
+    """Cached DoclingDocument for these bytes/options (and page range, if only part was converted), or None."""
+    blob = _get(_docling_key(sha, options, pages))
+    if blob is None:
+        return None
+    from docling_core.types.doc import DoclingDocument
+    return DoclingDocument.model_validate(_unpack(blob))
+
+def load_docling_markdown(sha: str, options: Any = None, pages: Optional[Tuple[int, int]] = None) -> Optional[str]:
+    doc = load_docling_document(sha, options, pages)
+    return None if doc is None else doc.export_to_markdown()
+
+def store_docling_document(sha: str, document, options: Any = None,
+                           pages: Optional[Tuple[int, int]] = None) -> None:
+    if _enabled():
+        _set(_docling_key(sha, options, pages), _pack(document.export_to_dict()))
+
+# ---- Extracted tables ----
+def _tables_key(sha: str, settings: Any = None) -> str:
+    """`settings`: anything with a stable repr that changes the output, e.g. an extract_pdf_tables.PageScreen."""
+    opts = hashlib.sha1(repr(settings).encode("utf-8")).hexdigest()
+    return f"tables:{TABLES_VERSION}:{_version('pdfplumber')}:{opts}:{sha}"
+
+def _frames(blob: bytes) -> Iterator[pd.DataFrame]:
+    import pandas as pd
+    z = zlib.decompressobj()
+
+    def pieces() -> Iterator[bytes]:
+        for i in range(0, len(blob), _CHUNK):
+            yield z.decompress(blob[i:i + _CHUNK])
+        yield z.flush()
+
+    rest = b""
+    for piece in pieces():
+        *lines, rest = (rest + piece).split(b"\n")
+        for line in lines:
+            t = json.loads(line)
+            df = pd.DataFrame(t["data"], index=t["index"], columns=t["columns"])
+            df.attrs.update(t.get("attrs", {}))
+            yield df
+
+def iter_tables(sha: str, settings: Any = None) -> Optional[Iterator[pd.DataFrame]]:
+    """Cached tables, decoded one at a time, or None when not cached."""
+    blob = _get(_tables_key(sha, settings))
+    return None if blob is None else _frames(blob)
+
+def load_tables(sha: str, settings: Any = None) -> Optional[List[pd.DataFrame]]:
+    tables = iter_tables(sha, settings)
+    return None if tables is None else list(tables)
+
+def _split(df: pd.DataFrame) -> Dict[str, list]:
+    # like to_dict("split"), but keeps duplicate column labels (common in PDF table headers)
+    return {"index": df.index.tolist(), "columns": df.columns.tolist(), "data": df.values.tolist(),
+            "attrs": dict(df.attrs)}
+
+class TableStore:
+    """
+    Compresses tables into one cache entry as they are produced; only the compressed bytes are
+    held. commit() stores the entry – call it after a complete pass, so a partial one never looks
+    cached. A no-op while the cache is disabled.
+    """
+
+    def __init__(self, sha: str, settings: Any = None):
+        self.key = _tables_key(sha, settings)
+        self._z = zlib.compressobj(6) if _enabled() else None
+        self._parts: List[bytes] = []
+
+    def add(self, df: pd.DataFrame) -> None:
+        if self._z is not None:
+            line = json.dumps(_split(df), separators=(",", ":"), default=str).encode("utf-8") + b"\n"
+            self._parts.append(self._z.compress(line))
+
+    def commit(self) -> None:
+        if self._z is not None:
+            self._parts.append(self._z.flush())
+            _set(self.key, b"".join(self._parts))
+            self._z, self._parts = None, []
+
+def store_tables(sha: str, tables: List[pd.DataFrame], settings: Any = None) -> None:
+    store = TableStore(sha, settings)
+    for t in tables:
+        store.add(t)
+    store.commit()
+
+def cache_stats() -> Dict[str, Any]:
+    """Entry count and on-disk size of the conversion cache."""
+    cache = _cache()
+    if cache is None:
+        return {"enabled": False, "entries": 0, "bytes": 0}
+    return {"enabled": _enabled(), "entries": len(cache), "bytes": cache.volume(),
+            "size_limit": cache.size_limit}
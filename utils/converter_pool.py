@@ -0,0 +1,121 @@
+# utils/converter_pool.py  –  process-wide, pre-warmed Docling converters
+# -------------------------------------------------------------------------------------------------
+# Building a DocumentConverter is cheap, but its first conversion loads the layout and table
+# models, which costs more than most conversions. Every entry point asks this registry instead of
+# calling DocumentConverter() itself, so the models are loaded once per process and option set.
+# Docling itself (torch and friends) is imported by the first _build(), not by importing this module.
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+    from docling.document_converter import DocumentConverter
+
+_LOCK = threading.Lock()                          # guards the dicts below; never held while building
+_CONVERTERS: Dict[str, DocumentConverter] = {}
+_BUILD_LOCKS: Dict[str, threading.Lock] = {}      # one per key: build + warm-up (kept across clear())
+_CONVERT_LOCKS: Dict[str, threading.Lock] = {}    # one per key: conversions (kept across clear())
+_STATS: Dict[str, Dict[str, float]] = {}
+
+
+def options_key(options: Optional[PdfPipelineOptions] = None) -> str:
+    """Stable key for a set of pipeline options (``"default"`` for Docling's defaults)."""
+    if options is None:
+        return "default"
+    return json.dumps(options.model_dump(mode="json"), sort_keys=True, default=str)
+
+
+def _build(options: Optional[PdfPipelineOptions]) -> DocumentConverter:
+    from docling.datamodel.base_models import InputFormat
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+    if options is None:
+        return DocumentConverter()
+    return DocumentConverter(format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=options)})
+
+
+def _acquire(options: Optional[PdfPipelineOptions], warm: bool,
+             count_reuse: bool) -> Tuple[str, DocumentConverter, Dict[str, float]]:
+    """(key, converter, its stats); builds and warms under the key's own lock, so other keys never wait."""
+    key = options_key(options)
+    with _LOCK:
+        conv = _CONVERTERS.get(key)
+        if conv is not None:
+            if count_reuse:
+                _STATS[key]["reuses"] += 1
+            return key, conv, _STATS[key]
+        build_lock = _BUILD_LOCKS.setdefault(key, threading.Lock())
+    with build_lock:
+        with _LOCK:
+            conv = _CONVERTERS.get(key)                    # built by another thread meanwhile
+            if conv is not None:
+                if count_reuse:
+                    _STATS[key]["reuses"] += 1
+                return key, conv, _STATS[key]
+        conv = _build(options)
+        stats = {"warmup_s": 0.0, "reuses": 0, "conversions": 0}
+        if warm:
+            from docling.datamodel.base_models import InputFormat
+            t0 = time.perf_counter()
+            conv.initialize_pipeline(InputFormat.PDF)     # loads layout + table models
+            stats["warmup_s"] = time.perf_counter() - t0
+        with _LOCK:
+            _CONVERTERS[key] = conv
+            _STATS[key] = stats
+    return key, conv, stats
+
+
+def get_converter(options: Optional[PdfPipelineOptions] = None, *, warm: bool = True) -> DocumentConverter:
+    """
+    Return the shared converter for `options`, creating (and by default warming) it on first use.
+    Safe to call from several threads; only one converter is ever built per key.
+    """
+    return _acquire(options, warm, count_reuse=True)[1]
+
+
+def convert(source: Any, *, options: Optional[PdfPipelineOptions] = None, **kwargs):
+    """
+    Convert `source` (path or docling DocumentStream) with the shared converter.
+    Docling's PDF backends are not thread-safe, so calls on the same converter are serialized.
+    """
+    key, conv, stats = _acquire(options, True, count_reuse=False)
+    with _LOCK:
+        lock = _CONVERT_LOCKS.setdefault(key, threading.Lock())
+    with lock:
+        stats["conversions"] += 1
+        return conv.convert(source, **kwargs)
+
+
+def warm_up(options: Optional[PdfPipelineOptions] = None) -> float:
+    """Build and warm the converter for `options`; returns warm-up seconds. Use as a worker initializer."""
+    return _acquire(options, True, count_reuse=False)[2]["warmup_s"]
+
+
+def pool_stats() -> Dict[str, Any]:
+    """
+    Per-key warm-up cost, conversions and reuses, plus the model-load time saved by reuse.
+    "reuses" counts get_converter() calls served by an existing converter (each would otherwise
+    have paid the warm-up again); conversions through convert() are counted separately.
+    """
+    with _LOCK:
+        per_key = {k: dict(v) for k, v in _STATS.items()}
+    saved = sum(v["warmup_s"] * v["reuses"] for v in per_key.values())
+    return {"converters": len(per_key), "saved_s": saved, "per_key": per_key}
+
+
+def clear() -> None:
+    """Drop every cached converter (frees model memory; the next call re-warms).
+
+    The per-key locks stay: a conversion still running holds its converter and lock, and a
+    converter rebuilt for the same key must not convert concurrently with it.
+    """
+    with _LOCK:
+        _CONVERTERS.clear()
+        _STATS.clear()
+
+
+if os.getenv("DOCLING_WARMUP_AT_IMPORT", "").lower() in ("1", "true", "yes"):
+    warm_up()
@@ -0,0 +1,310 @@
+# utils/doc_sources.py  –  where the PDFs come from, fetched ahead of the converter
+# -------------------------------------------------------------------------------------------------
+# A source lists documents (with pagination) and fetches one at a time:
+#   LocalDirSource("pdfs/")                               – files on disk (no copy, just paths)
+#   HTTPSource(listing_url=...) / HTTPSource.from_urls()  – JSON listing + GET, e.g. a presigned
+#                                                           object-store index or a static file server
+#   DropboxSource(dbx, "/PDFs_case_reports")              – files_list_folder / _continue + download
+# prefetch(source) downloads the next `depth` documents on background threads while the current
+# ones convert, keeping at most `max_buffer_bytes` in memory and spilling the rest to disk. A failed
+# download does not end the stream: it is yielded as a FetchedDoc carrying the error.
+#
+#     for doc in prefetch(DropboxSource.from_env("/PDFs_case_reports"), depth=8):
+#         run(doc.source())            # (name, bytes) or a path, as utils.batch.run_batch accepts
+#
+# open_source("pdfs/" | "dropbox:/folder" | "https://host/index.json") picks the class for a spec.
+from __future__ import annotations
+import glob
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Union
+from urllib.parse import urljoin
+
+@dataclass(frozen=True)
+class DocRef:
+    """A listed document, not yet fetched."""
+    name: str
+    key: str                          # path, URL or Dropbox path
+    size: Optional[int] = None
+
+@dataclass
+class FetchedDoc:
+    """A fetched document: bytes in memory, or a file (local original or spilled download)."""
+    name: str
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+    temporary: bool = False           # path is a spill file the consumer may delete after use
+    fetch_s: float = 0.0
+    error: Optional[str] = None       # download failed (after retries): no data, no path
+
+    def source(self) -> Any:
+        return self.path if self.path is not None else (self.name, self.data)
+
+    def discard(self) -> None:
+        if self.temporary and self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+def _retry(fn: Callable[[], Any], tries: int = 3, base_delay: float = 0.5) -> Any:
+    """Simple retry with exponential backoff for transient fetch errors."""
+    for i in range(tries):
+        try:
+            return fn()
+        except Exception:
+            if i == tries - 1:
+                raise
+            time.sleep(base_delay * (2 ** i))
+
+class DocSource:
+    """Base class: list() yields DocRefs; fetch() returns bytes, or a str path for local files."""
+    suffix = ".pdf"
+
+    def list(self) -> Iterator[DocRef]:
+        raise NotImplementedError
+
+    def fetch(self, ref: DocRef) -> Union[bytes, str]:
+        raise NotImplementedError
+
+    def fetch_to_file(self, ref: DocRef, path: str) -> None:
+        """Write the document to `path` (sources that can stream to disk override this)."""
+        got = self.fetch(ref)
+        if isinstance(got, str):
+            shutil.copyfile(got, path)
+        else:
+            with open(path, "wb") as f:
+                f.write(got)
+
+class LocalDirSource(DocSource):
+    def __init__(self, directory: Union[str, pathlib.Path], *, pattern: str = "*.pdf", recursive: bool = False):
+        self.directory, self.pattern, self.recursive = str(directory), pattern, recursive
+
+    def list(self) -> Iterator[DocRef]:
+        pat = os.path.join(self.directory, "**", self.pattern) if self.recursive else \
+              os.path.join(self.directory, self.pattern)
+        for p in sorted(glob.glob(pat, recursive=self.recursive)):
+            yield DocRef(pathlib.Path(p).name, p, os.path.getsize(p))
+
+    def fetch(self, ref: DocRef) -> str:
+        return ref.key                # converters read local files directly
+
+class HTTPSource(DocSource):
+    """
+    GET-able documents. Either a fixed URL list, or a JSON listing endpoint returning
+    {"items": [{"name": ..., "url": ..., "size": ...}, ...], "next": <URL or null>} – the keys are
+    configurable; relative URLs are resolved against the page they came from.
+    """
+
+    def __init__(self, listing_url: Optional[str] = None, *, urls: Optional[Iterable[str]] = None,
+                 items_key: str = "items", next_key: str = "next", url_key: str = "url",
+                 name_key: str = "name", size_key: str = "size", session=None, timeout: float = 60.0):
+        if listing_url is None and urls is None:
+            raise ValueError("HTTPSource needs listing_url or urls")
+        self.listing_url, self.urls = listing_url, list(urls) if urls is not None else None
+        self.items_key, self.next_key, self.url_key = items_key, next_key, url_key
+        self.name_key, self.size_key = name_key, size_key
+        self.timeout = timeout
+        self._session = session
+
+    @classmethod
+    def from_urls(cls, urls: Iterable[str], **kwargs) -> "HTTPSource":
+        return cls(urls=urls, **kwargs)
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            s = requests.Session()
+            retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+            adapter = HTTPAdapter(max_retries=retry, pool_connections=16, pool_maxsize=16)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            self._session = s
+        return self._session
+
+    def list(self) -> Iterator[DocRef]:
+        if self.urls is not None:
+            for u in self.urls:
+                yield DocRef(pathlib.PurePosixPath(u.split("?", 1)[0]).name or "document.pdf", u)
+            return
+        page_url: Optional[str] = self.listing_url
+        while page_url:
+            r = self.session.get(page_url, timeout=self.timeout)
+            r.raise_for_status()
+            body = r.json()
+            for it in body.get(self.items_key) or []:
+                url = urljoin(page_url, it[self.url_key])
+                name = it.get(self.name_key) or pathlib.PurePosixPath(url.split("?", 1)[0]).name
+                if name.lower().endswith(self.suffix):
+                    yield DocRef(name, url, it.get(self.size_key))
+            nxt = body.get(self.next_key)
+            page_url = urljoin(page_url, nxt) if nxt else None
+
+    def fetch(self, ref: DocRef) -> bytes:
+        def get():
+            r = self.session.get(ref.key, timeout=self.timeout)
+            r.raise_for_status()
+            return r.content
+        return _retry(get)
+
+    def fetch_to_file(self, ref: DocRef, path: str) -> None:
+        def get():
+            with self.session.get(ref.key, timeout=self.timeout, stream=True) as r:
+                r.raise_for_status()
+                with open(path, "wb") as f:
+                    for chunk in r.iter_content(1 << 20):
+                        f.write(chunk)
+        _retry(get)
+
+class DropboxSource(DocSource):
+    """A Dropbox folder through an authenticated `dropbox.Dropbox` client."""
+
+    def __init__(self, dbx, folder: str):
+        self.dbx, self.folder = dbx, folder.rstrip("/")
+
+    @classmethod
+    def from_env(cls, folder: str) -> "DropboxSource":
+        """Client from DROPBOX_APP_KEY / DROPBOX_APP_SECRET / DROPBOX_REFRESH_TOKEN."""
+        import dropbox
+        dbx = dropbox.Dropbox(app_key=os.environ["DROPBOX_APP_KEY"],
+                              app_secret=os.environ["DROPBOX_APP_SECRET"],
+                              oauth2_refresh_token=os.environ["DROPBOX_REFRESH_TOKEN"])
+        return cls(dbx, folder)
+
+    def list(self) -> Iterator[DocRef]:
+        res = self.dbx.files_list_folder(self.folder)
+        while True:
+            for e in res.entries:
+                # FileMetadata has a size; folders and deleted entries don't
+                if getattr(e, "size", None) is not None and e.name.lower().endswith(self.suffix):
+                    yield DocRef(e.name, getattr(e, "path_lower", None) or f"{self.folder}/{e.name}", e.size)
+            if not res.has_more:
+                return
+            res = self.dbx.files_list_folder_continue(res.cursor)
+
+    def fetch(self, ref: DocRef) -> bytes:
+        return _retry(lambda: self.dbx.files_download(ref.key)[1].content)
+
+    def fetch_to_file(self, ref: DocRef, path: str) -> None:
+        _retry(lambda: self.dbx.files_download_to_file(path, ref.key))
+
+def open_source(spec: Union[str, DocSource]) -> DocSource:
+    """'dir/' → LocalDirSource, 'dropbox:/folder' → DropboxSource.from_env, 'http(s)://…' → HTTPSource."""
+    if isinstance(spec, DocSource):
+        return spec
+    if spec.startswith("dropbox:"):
+        return DropboxSource.from_env(spec[len("dropbox:"):] or "/")
+    if spec.startswith(("http://", "https://")):
+        return HTTPSource(spec)
+    return LocalDirSource(spec)
+
+def prefetch(source: DocSource, *, depth: int = 8, workers: Optional[int] = None,
+             max_buffer_bytes: int = int(os.getenv("PREFETCH_MAX_BYTES", 512 << 20)),
+             spill_dir: Optional[str] = None, stats: Optional[Dict[str, float]] = None) -> Iterator[FetchedDoc]:
+    """
+    Yield the source's documents in listing order while up to `depth` further ones download
+    concurrently. At most `max_buffer_bytes` of downloaded-but-not-yet-consumed documents are kept
+    in memory; beyond that (or for listed sizes above it) downloads go to spill files, which the
+    consumer removes with FetchedDoc.discard(). A download that fails is yielded in its place as a
+    FetchedDoc with `error` set, and the stream goes on. `stats` (a dict) receives fetch counters;
+    its "wait_s" is the time the consumer sat waiting on a download (0 when fully overlapped).
+    """
+    stats = stats if stats is not None else {}
+    for k in ("fetched", "failed", "spilled", "bytes", "fetch_s", "wait_s"):
+        stats.setdefault(k, 0)
+    lock = threading.Lock()
+    buffered = [0]
+    own_spill = spill_dir is None
+    spill = spill_dir or tempfile.mkdtemp(prefix="docsrc-")
+
+    def fetch(ref: DocRef) -> FetchedDoc:
+        t0 = time.perf_counter()
+        with lock:
+            to_disk = ref.size is not None and buffered[0] + ref.size > max_buffer_bytes
+            reserved = 0 if to_disk else (ref.size or 0)
+            buffered[0] += reserved                                # reserve before downloading
+        if to_disk:
+            fd, path = tempfile.mkstemp(suffix=source.suffix, dir=spill)
+            os.close(fd)
+            try:
+                source.fetch_to_file(ref, path)
+            except BaseException:
+                os.remove(path)
+                raise
+            doc = FetchedDoc(ref.name, path=path, temporary=True)
+        else:
+            try:
+                got = source.fetch(ref)
+            except BaseException:
+                with lock:
+                    buffered[0] -= reserved                        # nothing arrived
+                raise
+            with lock:
+                buffered[0] += (0 if isinstance(got, str) else len(got)) - reserved
+                over = not isinstance(got, str) and buffered[0] > max_buffer_bytes and ref.size is None
+                if over:
+                    buffered[0] -= len(got)
+            if isinstance(got, str):
+                doc = FetchedDoc(ref.name, path=got)
+            elif over:                                             # unlisted size turned out too big
+                fd, path = tempfile.mkstemp(suffix=source.suffix, dir=spill)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(got)
+                doc = FetchedDoc(ref.name, path=path, temporary=True)
+            else:
+                doc = FetchedDoc(ref.name, data=got)
+        doc.fetch_s = time.perf_counter() - t0
+        return doc
+
+    pending: deque = deque()
+    refs = iter(source.list())
+    ex = ThreadPoolExecutor(max_workers=workers or max(1, min(depth, 8)), thread_name_prefix="prefetch")
+    try:
+        def top_up():
+            while len(pending) < depth:
+                ref = next(refs, None)
+                if ref is None:
+                    return
+                pending.append((ref, ex.submit(fetch, ref)))
+        top_up()
+        while pending:
+            t0 = time.perf_counter()
+            ref, fut = pending.popleft()
+            try:
+                doc = fut.result()
+            except Exception as e:                                 # one bad download: report, go on
+                doc = FetchedDoc(ref.name, error=repr(e))
+            stats["wait_s"] += time.perf_counter() - t0              # time the consumer was starved
+            if doc.error is not None:
+                stats["failed"] += 1
+                top_up()
+                yield doc
+                continue
+            stats["fetched"] += 1
+            stats["fetch_s"] += doc.fetch_s
+            stats["spilled"] += doc.temporary
+            if doc.data is not None:
+                stats["bytes"] += len(doc.data)
+                with lock:
+                    buffered[0] -= len(doc.data)                   # handed over to the consumer
+            top_up()
+            yield doc
+    finally:
+        for _, f in pending:
+            f.cancel()
+        ex.shutdown(wait=True)
+        if own_spill:                                              # spill files still queued are
+            try:                                                   # the consumer's to discard()
+                os.rmdir(spill)
+            except OSError:
+                pass
@@ -0,0 +1,102 @@
+# utils/docling_pipeline.py  –  Docling options per document: OCR only where the text layer fails
+# -------------------------------------------------------------------------------------------------
+# DocumentConverter() with default options runs OCR and the ACCURATE table-structure model on every
+# page, although nearly all of our PDFs are born-digital. plan() checks the text layer first
+# (utils.text_layer) and splits the document into runs of consecutive pages:
+#   good text layer               → do_ocr=False
+#   scanned / broken-glyph pages  → do_ocr=True (Docling's default OCR engine)
+# Each run is converted with page_range=(first, last) and the Markdown is joined in page order.
+# Usually every page is fine, so that is a single conversion without OCR. When the runs would
+# alternate more than `max_segments` times, the whole document is converted once with OCR.
+#
+# Table structure (TableFormer) follows `table_mode`: "fast", "accurate", or "auto" (ACCURATE up
+# to `accurate_max_pages` pages, FAST above – long documents are where table structure dominates,
+# and the full tables are appended from pdfplumber anyway).
+# DOCLING_PIPELINE=default restores Docling's defaults; DOCLING_TABLE_MODE sets table_mode.
+from __future__ import annotations
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from utils import converter_pool
+from utils.pdf_ingest import IngestedPDF, PDFInput
+from utils.text_layer import DEFAULT_CONFIG as DEFAULT_TEXT_LAYER, TextLayerConfig, assess
+
+TABLE_MODES = ("fast", "accurate", "auto")
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    adaptive: bool = True                 # False → Docling's default options, whole document
+    table_mode: str = "auto"              # "fast" | "accurate" | "auto"
+    accurate_max_pages: int = 12          # auto: ACCURATE up to this many pages, FAST above
+    max_segments: int = 4                 # more OCR / no-OCR runs than this → one OCR conversion
+    text_layer: TextLayerConfig = DEFAULT_TEXT_LAYER
+
+    def table_mode_for(self, n_pages: int) -> str:
+        if self.table_mode not in TABLE_MODES:
+            raise ValueError(f"unknown table mode: {self.table_mode!r} (expected one of {TABLE_MODES})")
+        if self.table_mode != "auto":
+            return self.table_mode
+        return "accurate" if n_pages <= self.accurate_max_pages else "fast"
+
+def config_from_env() -> PipelineConfig:
+    """PipelineConfig from $DOCLING_PIPELINE (adaptive | default) and $DOCLING_TABLE_MODE."""
+    return PipelineConfig(adaptive=os.getenv("DOCLING_PIPELINE", "adaptive").lower() != "default",
+                          table_mode=os.getenv("DOCLING_TABLE_MODE", "auto").lower())
+
+@lru_cache(maxsize=None)
+def pipeline_options(ocr: bool, table_mode: str = "accurate"):
+    """PdfPipelineOptions for one (ocr, table mode) pair; shared so converter_pool reuses converters."""
+    from docling.datamodel.pipeline_options import PdfPipelineOptions, TableFormerMode, TableStructureOptions
+    mode = TableFormerMode.FAST if table_mode == "fast" else TableFormerMode.ACCURATE
+    return PdfPipelineOptions(do_ocr=ocr, do_table_structure=True,
+                              table_structure_options=TableStructureOptions(mode=mode))
+
+@dataclass(frozen=True)
+class Segment:
+    pages: Optional[Tuple[int, int]]      # 1-based, inclusive; None = the whole document
+    ocr: Optional[bool]                   # None = Docling's default options
+    table_mode: Optional[str] = None
+
+    @property
+    def options(self):
+        return None if self.ocr is None else pipeline_options(self.ocr, self.table_mode)
+
+    def convert_kwargs(self) -> Dict[str, Any]:
+        return {} if self.pages is None else {"page_range": self.pages}
+
+    def describe(self) -> str:
+        if self.ocr is None:
+            return "default"
+        pages = "all" if self.pages is None else f"{self.pages[0]}-{self.pages[1]}"
+        return f"{pages}:{'ocr' if self.ocr else 'text'}:{self.table_mode}"
+
+def plan(pdf: Union[PDFInput, IngestedPDF], config: Optional[PipelineConfig] = None) -> List[Segment]:
+    """Conversion segments for `pdf` in page order (one whole-document segment in the common case)."""
+    cfg = config or config_from_env()
+    if not cfg.adaptive:
+        return [Segment(None, None)]
+    try:
+        pages = assess(pdf, cfg.text_layer)
+    except Exception:
+        return [Segment(None, None)]              # cannot inspect the text layer → Docling decides
+    mode = cfg.table_mode_for(len(pages))
+    runs: List[List[Any]] = []                    # [first, last, ocr]
+    for q in pages:
+        if runs and runs[-1][2] == q.needs_ocr:
+            runs[-1][1] = q.page
+        else:
+            runs.append([q.page, q.page, q.needs_ocr])
+    if len(runs) <= 1:
+        return [Segment(None, bool(runs and runs[0][2]), mode)]
+    if len(runs) > cfg.max_segments:
+        return [Segment(None, True, mode)]
+    return [Segment((first, last), ocr, mode) for first, last, ocr in runs]
+
+def warm_up(config: Optional[PipelineConfig] = None) -> float:
+    """Warm the converter most documents will use (no OCR; ACCURATE tables under "auto")."""
+    cfg = config or config_from_env()
+    if not cfg.adaptive:
+        return converter_pool.warm_up()
+    return converter_pool.warm_up(pipeline_options(False, cfg.table_mode_for(1)))
@@ -14,18 +14,31 @@ the `ocr=True` branch at the bottom: it renders the page with pdf2image and
 runs Tesseract, then uses camelot to guess table lines.
 """
 from __future__ import annotations
-import re, pathlib
-from typing import List
+import math
+import os
+import re
+import pathlib
+import time
+import multiprocessing as mp
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import Iterable, Iterator, List
+import numpy as np
 import pandas as pd
 import pdfplumber
 from unidecode import unidecode
-from tabulate import tabulate   # nice optional preview
+
+_SUP_RE = re.compile(r"\s*(?:[\u00B9\u00B2\u00B3\u2070-\u2079])+\s*$")  # ¹ ² ³ … ⁹
+_WS_RE = re.compile(r"\s+")
 
 def _postprocess(column_cells: list[str]) -> list[str]:
     """
     1. drop superscript digits / symbols (common footnote markers)
     2. normalise unicode to ASCII where possible
     3. squeeze inner whitespace
+    Reference implementation, one cell at a time; _clean_frame() is the vectorized equivalent.
     """
     out: list[str] = []
     sup_re = re.compile(r"\s*(?:[\u00B9\u00B2\u00B3\u2070-\u2079])+\s*$")  # ¹ ² ³ … ⁹
@@ -36,46 +49,258 @@ def _postprocess(column_cells: list[str]) -> list[str]:
         out.append(cleaned)
     return out
 
+@lru_cache(maxsize=65536)
+def _clean_cell(cell: str) -> str:
+    """_postprocess for one non-empty cell, precompiled patterns, memoized across tables."""
+    return _WS_RE.sub(" ", unidecode(_SUP_RE.sub("", cell))).strip()
+
+def _clean_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Same result as df.apply(_postprocess), on the whole frame at once.
+
+    Cells are factorized so every distinct value is cleaned once (tables repeat "+", units, "n.d."…).
+    """
+    values = df.to_numpy(dtype=object).ravel()
+    codes, uniques = pd.factorize(values)                          # None → code -1
+    cleaned = np.array([_clean_cell(u) if u else "" for u in uniques] + [""], dtype=object)
+    out = cleaned[codes].reshape(df.shape)
+    return pd.DataFrame(out, index=df.index, columns=df.columns)
+
+def _merge_continuation_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Fold rows whose cells after the first are all empty into the first column of the row above."""
+    values = df.to_numpy(dtype=object)
+    rest = values[:, 1:]
+    cont = ((rest == "") | pd.isna(rest)).all(axis=1)
+    cont[0] = False
+    if not cont.any():
+        return df
+    starts = np.flatnonzero(~cont)
+    owner = starts[np.cumsum(~cont) - 1]                           # row each row folds into
+    col0 = values[:, 0]
+    joined: dict[int, str] = {}
+    for i in np.flatnonzero(cont):
+        s = owner[i]
+        joined[s] = joined.get(s, col0[s] or "") + " " + (col0[i] or "")
+    out = values[starts].copy()
+    for pos, s in enumerate(starts):
+        if s in joined:
+            out[pos, 0] = joined[s]
+    return pd.DataFrame(out)
+
+def _table_to_df(raw_table: list[list[str]]) -> pd.DataFrame|None:
+    """Clean one raw pdfplumber table; None when it holds no non-blank rows."""
+    # pdfplumber already returns a list of rows (list[str])
+    # Remove completely blank rows
+    rows = [r for r in raw_table if any(c and c.strip() for c in r)]
+    if not rows:
+        return None
+
+    # Merge multi-row wrapped cells (very simple heuristic)
+    df = _merge_continuation_rows(pd.DataFrame(rows))
+
+    # DataFrame, clean-up
+    df = _clean_frame(df)
+
+    # Promote first non-blank row to header when sensible
+    if len(df) > 1 and df.iloc[0].isna().sum() < len(df.columns) / 2:
+        df.columns = df.iloc[0]
+        df = df.drop(index=df.index[0]).reset_index(drop=True)
+    return df
+
+# Below this many selected pages the spawn + import cost of a process pool outweighs the gain.
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_TABLES_PARALLEL_MIN_PAGES", 24))
+
+@dataclass(frozen=True)
+class PageScreen:
+    """
+    Cheap per-page test run before page.extract_tables().
+
+    pdfplumber's default "lines" strategy builds cells only from ruling edges (lines, rect sides,
+    straight curve segments), and a cell needs two horizontal and two vertical edges. Pages with
+    fewer therefore cannot yield a table, and skipping them does not change the output
+    (the conservative default).
+    check_alignment additionally requires `align_min_rows` text rows that share at least
+    `align_min_cols` word start positions; it is a heuristic, so it is off by default and can
+    drop tables on boxed-but-sparse pages.
+    """
+    enabled: bool = True
+    min_h_edges: int = 2
+    min_v_edges: int = 2
+    check_alignment: bool = False
+    align_min_rows: int = 3
+    align_min_cols: int = 3
+    align_tolerance: float = 2.0                  # pt bucket for word tops / x0
+
+DEFAULT_SCREEN = PageScreen()
+
+@dataclass
+class TableScanStats:
+    """Pages looked at vs. skipped by the PageScreen (accumulates over calls when reused)."""
+    pages_total: int = 0
+    pages_scanned: int = 0
+    pages_skipped: int = 0
+    tables: int = 0
+    screen_s: float = 0.0
+    extract_s: float = 0.0
+
+    def add(self, other: "TableScanStats") -> None:
+        for f in fields(self):
+            setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+
+def _aligned_rows(page, screen: PageScreen) -> int:
+    tol = screen.align_tolerance
+    rows: dict[int, set[int]] = defaultdict(set)
+    for w in page.extract_words():
+        rows[round(w["top"] / tol)].add(round(w["x0"] / tol))
+    cols = Counter(x for xs in rows.values() if len(xs) >= 2 for x in xs)
+    shared = {x for x, n in cols.items() if n >= screen.align_min_rows}
+    return sum(1 for xs in rows.values() if len(xs & shared) >= screen.align_min_cols)
+
+def _ruling_counts(page) -> tuple[int, int]:
+    """
+    (horizontal, vertical) edges of a pdfplumber page as its table finder starts from: page.edges
+    (lines, rect sides, curve segments) with pdfplumber's own orientation. The finder snaps and
+    joins these first and only then drops edges shorter than edge_min_length, so short segments
+    count too (dashed or segmented rules join into full-length edges); merging only reduces the
+    number, so the counts are an upper bound on the edges it uses.
+    """
+    h = v = 0
+    for e in page.edges:
+        if e["orientation"] == "h":
+            h += 1
+        elif e["orientation"] == "v":
+            v += 1
+    return h, v
+
+def _may_hold_table(page, screen: PageScreen) -> bool:
+    if not screen.enabled:
+        return True
+    if not (page.lines or page.rects or page.curves):
+        return False
+    h, v = _ruling_counts(page)
+    if h < screen.min_h_edges or v < screen.min_v_edges:
+        return False
+    return not screen.check_alignment or _aligned_rows(page, screen) >= screen.align_min_rows
+
+def _page_tables(page, page_no: int, screen: PageScreen = DEFAULT_SCREEN,
+                 stats: TableScanStats|None = None) -> list[pd.DataFrame]:
+    """Cleaned tables of one pdfplumber page; df.attrs carries page (1-based) and table_index on it."""
+    stats = stats if stats is not None else TableScanStats()
+    stats.pages_total += 1
+    t0 = time.perf_counter()
+    keep = _may_hold_table(page, screen)
+    t1 = time.perf_counter()
+    stats.screen_s += t1 - t0
+    if not keep:
+        stats.pages_skipped += 1
+        return []
+    stats.pages_scanned += 1
+    dfs: list[pd.DataFrame] = []
+    for raw_table in page.extract_tables():
+        df = _table_to_df(raw_table)
+        if df is None:
+            continue
+        df.attrs.update(page=page_no, table_index=len(dfs))
+        dfs.append(df)
+    stats.tables += len(dfs)
+    stats.extract_s += time.perf_counter() - t1
+    return dfs
+
+def _select_pages(n_pages: int, pages: Iterable[int]|None, max_pages: int|None) -> list[int]:
+    """1-based page numbers to scan: `pages` (default all) within the document, first `max_pages` of them."""
+    nums = list(range(1, n_pages + 1)) if pages is None else sorted({p for p in pages if 1 <= p <= n_pages})
+    return nums[:max_pages] if max_pages else nums
+
+def _show(df: pd.DataFrame, n: int) -> None:
+    from tabulate import tabulate   # nice optional preview (only when show=True)
+    print(f"\nPage {df.attrs.get('page')} · Table {n}")
+    print(tabulate(df.head(10), headers="keys", tablefmt="github"))
+
+def iter_tables(pdf: "str|pathlib.Path|pdfplumber.PDF",
+                *,
+                pages: Iterable[int]|None = None,
+                max_pages: int|None = None,
+                screen: PageScreen = DEFAULT_SCREEN,
+                stats: TableScanStats|None = None) -> Iterator[tuple[int, int, pd.DataFrame]]:
+    """Yield (page_no, table_idx, DataFrame) page by page, in page order.
+
+    Each page's parsed layout is released (page.close()) before its tables are yielded, so memory
+    stays flat however long the document is. Accepts a path or an already-open pdfplumber PDF
+    (which is left open). Pages failing `screen` are skipped; pass `stats` to count them.
+    """
+    if not isinstance(pdf, pdfplumber.PDF):
+        with pdfplumber.open(str(pdf)) as opened:
+            yield from iter_tables(opened, pages=pages, max_pages=max_pages, screen=screen, stats=stats)
+        return
+    page_numbers = _select_pages(len(pdf.pages), pages, max_pages)
+    for page_no in page_numbers:
+        page = pdf.pages[page_no - 1]
+        try:
+            dfs = _page_tables(page, page_no, screen, stats)
+        finally:
+            page.close()                                           # drop cached chars/layout/textmap
+        for df in dfs:
+            yield page_no, df.attrs["table_index"], df
+
+def tables_from_pdf(pdf: "pdfplumber.PDF",
+                    *,
+                    max_pages: int|None = None,
+                    pages: Iterable[int]|None = None,
+                    preview: bool = False,
+                    screen: PageScreen = DEFAULT_SCREEN,
+                    stats: TableScanStats|None = None) -> List[pd.DataFrame]:
+    """Same as `extract_tables`, but serial on an already-open pdfplumber document."""
+    dfs: list[pd.DataFrame] = []
+    for _, _, df in iter_tables(pdf, pages=pages, max_pages=max_pages, screen=screen, stats=stats):
+        dfs.append(df)
+        if preview:
+            _show(df, len(dfs))
+    return dfs
+
+def _tables_for_pages(path: str, page_numbers: list[int],
+                      screen: PageScreen) -> tuple[list[pd.DataFrame], TableScanStats]:
+    """Process-pool worker: open the PDF independently and extract the given pages."""
+    stats = TableScanStats()
+    return [df for _, _, df in iter_tables(path, pages=page_numbers, screen=screen, stats=stats)], stats
+
+def _tables_parallel(path: str, page_numbers: list[int], workers: int, screen: PageScreen,
+                     stats: TableScanStats|None) -> List[pd.DataFrame]:
+    size = max(1, math.ceil(len(page_numbers) / (workers * 4)))    # several chunks per worker: pages vary
+    chunks = [page_numbers[i:i + size] for i in range(0, len(page_numbers), size)]
+    ctx = mp.get_context("spawn")                                  # pdfminer state is not fork-friendly
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=ctx) as ex:
+        parts = ex.map(_tables_for_pages, [path] * len(chunks), chunks, [screen] * len(chunks))
+        dfs: list[pd.DataFrame] = []
+        for part, part_stats in parts:                             # map keeps page order
+            dfs.extend(part)
+            if stats is not None:
+                stats.add(part_stats)
+        return dfs
+
 def extract_tables(path: str|pathlib.Path,
                    *,
                    max_pages: int|None = None,
-                   preview: bool = False) -> List[pd.DataFrame]:
-    """Return a list of DataFrames – one per table."""
-    dfs: list[pd.DataFrame] = []
+                   pages: Iterable[int]|None = None,
+                   preview: bool = False,
+                   workers: int|None = None,
+                   screen: PageScreen = DEFAULT_SCREEN,
+                   stats: TableScanStats|None = None) -> List[pd.DataFrame]:
+    """Return a list of DataFrames – one per table, in page order.
 
+    pages   : 1-based page numbers to scan (e.g. range(10, 40)); default all pages
+    workers : processes to split the pages over; None → serial below PARALLEL_MIN_PAGES pages,
+              otherwise one per CPU (max 8); 1 forces the serial path.
+    screen  : per-page pre-screen (PageScreen(enabled=False) scans every page)
+    stats   : a TableScanStats to fill with pages scanned / skipped and timings
+    Each DataFrame's .attrs holds "page" and "table_index" (position on that page).
+    """
     with pdfplumber.open(str(path)) as pdf:
-        for page_idx, page in enumerate(pdf.pages, 1):
-            if max_pages and page_idx > max_pages:
-                break
-            for raw_table in page.extract_tables():
-                # pdfplumber already returns a list of rows (list[str])
-                # Remove completely blank rows
-                rows = [r for r in raw_table if any(c and c.strip() for c in r)]
-                if not rows:
-                    continue
-
-                # Merge multi-row wrapped cells (very simple heuristic)
-                merged_rows: list[list[str]] = []
-                for r in rows:
-                    if merged_rows and all(c in ("", None) for c in r[1:]):
-                        # treat as continuation of previous row’s first col
-                        merged_rows[-1][0] += " " + (r[0] or "")
-                    else:
-                        merged_rows.append(r)
-
-                # DataFrame, clean-up
-                df = pd.DataFrame(merged_rows)
-                df = df.apply(_postprocess)
-
-                # Promote first non-blank row to header when sensible
-                if len(df) > 1 and df.iloc[0].isna().sum() < len(df.columns) / 2:
-                    df.columns = df.iloc[0]
-                    df = df.drop(index=df.index[0]).reset_index(drop=True)
-
-                dfs.append(df)
-
-                if preview:
-                    print(f"\nPage {page_idx} · Table {len(dfs)}")
-                    print(tabulate(df.head(10), headers="keys", tablefmt="github"))
-
-    return dfs
\ No newline at end of file
+        page_numbers = _select_pages(len(pdf.pages), pages, max_pages)
+        if workers is None:
+            workers = 1 if len(page_numbers) < PARALLEL_MIN_PAGES else min(os.cpu_count() or 1, 8)
+        if workers <= 1 or len(page_numbers) < 2:
+            return tables_from_pdf(pdf, pages=page_numbers, preview=preview, screen=screen, stats=stats)
+    dfs = _tables_parallel(str(path), page_numbers, workers, screen, stats)
+    if preview:
+        for n, df in enumerate(dfs, 1):
+            _show(df, n)
+    return dfs
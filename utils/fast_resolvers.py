@@ -1,63 +1,151 @@
 # utils/fast_resolvers.py
 from __future__ import annotations
-import re, hashlib
-from typing import Dict, Optional
-import requests
+import os
+import re
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
 
-try:
-    import diskcache as dc
-    CACHE = dc.Cache("cache_resolvers")
-except Exception:
-    CACHE = {}
+if TYPE_CHECKING:                 # requests is imported with the first session (import time)
+    import requests
+
+from utils import instrument
+from utils.resolver_cache import TieredCache
+
+# Endpoints (override to point at a local stand-in server)
+EUTILS_URL   = os.getenv("EUTILS_URL", "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi")
+WIKIDATA_API = os.getenv("WIKIDATA_API", "https://www.wikidata.org/w/api.php")
+OLS_URL      = os.getenv("OLS_URL", "https://www.ebi.ac.uk/ols4/api/search")
+WBGETENTITIES_MAX = 50            # ids per wbgetentities request (API limit for anonymous clients)
+
+# In-process LRU in front of a process-shareable diskcache; blank results get a shorter TTL.
+# RESOLVER_CACHE=0 bypasses both tiers (benchmarks, fake endpoints).
+CACHE = TieredCache(os.getenv("RESOLVER_CACHE_DIR", "cache_resolvers"))
+
+def _enabled() -> bool:
+    return os.getenv("RESOLVER_CACHE", "1").lower() not in ("0", "false", "no")
 
 def _cache_get(k: str):
-    try: return CACHE.get(k)
-    except Exception: return None
+    if not _enabled():
+        return None
+    try:
+        return CACHE.get(k)
+    except Exception:
+        return None
 
-def _cache_set(k: str, v, expire: int = 60*60*24*30):
+def _cache_set(k: str, v, expire: Optional[int] = None):
+    if not _enabled():
+        return
     try:
-        if hasattr(CACHE, "set"): CACHE.set(k, v, expire=expire)
-        else: CACHE[k] = v
-    except Exception: pass
+        CACHE.set(k, v, expire=expire)
+    except Exception:
+        pass
+
+def cache_stats() -> Dict[str, Dict[str, float]]:
+    """Hit/miss/stale/eviction counters and network time per resolver (see utils.resolver_cache)."""
+    return CACHE.stats()
 
 def _norm(s: str) -> str:
     return re.sub(r"\s+", " ", (s or "")).strip()
 
 def _session(user_agent: str = "case-extractor/1.0") -> requests.Session:
+    import requests
     from requests.adapters import HTTPAdapter
     from urllib3.util.retry import Retry
     s = requests.Session()
     retries = Retry(total=1, connect=1, read=1, backoff_factor=0.2,
                     status_forcelist=[429,500,502,503,504], allowed_methods=["GET","POST"],
                     raise_on_status=False, respect_retry_after_header=True)
-    s.mount("https://", HTTPAdapter(max_retries=retries, pool_maxsize=50))
+    adapter = HTTPAdapter(max_retries=retries, pool_maxsize=50)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
     s.headers.update({"User-Agent": user_agent})
     return s
 
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+def _shared_session() -> requests.Session:
+    """One pooled session per process, so keep-alive connections are reused across calls/threads."""
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                _SESSION = _session()
+    return _SESSION
+
+def _dedupe(items: Iterable[str]) -> Dict[str, List[str]]:
+    """normalized → original spellings (so each distinct query runs once)."""
+    out: Dict[str, List[str]] = {}
+    for it in items:
+        out.setdefault(_norm(it), []).append(it)
+    return out
+
 # ---- PubMed (exact title) ----
-def resolve_pubmed_id_from_title(title: str) -> str:
-    title = _norm(title)
-    if not title: return ""
-    key = "pmid:" + hashlib.sha1(title.encode("utf-8")).hexdigest()
-    hit = _cache_get(key)
-    if hit is not None: return hit
+def _pmid_key(title: str) -> str:
+    return "pmid:" + hashlib.sha1(title.encode("utf-8")).hexdigest()
+
+def _fetch_pmid(s: requests.Session, title: str) -> str:
+    t0 = time.perf_counter()
     try:
-        s = _session()
-        r = s.get("https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi",
+        r = s.get(EUTILS_URL,
                   params={"db":"pubmed","retmode":"json","retmax":"1","term":f"{title}[Title]"},
                   timeout=(2.0,5.0))
         r.raise_for_status()
         js = r.json() or {}
         ids = (js.get("esearchresult",{}) or {}).get("idlist",[]) or []
-        pmid = ids[0] if ids else ""
+        return ids[0] if ids else ""
     except Exception:
-        pmid = ""
-    _cache_set(key, pmid)
+        return ""
+    finally:
+        CACHE.observe_fetch("pmid", time.perf_counter() - t0)
+
+def resolve_pubmed_id_from_title(title: str) -> str:
+    title = _norm(title)
+    if not title:
+        return ""
+    with instrument.stage("pubmed") as span:
+        key = _pmid_key(title)
+        hit = _cache_get(key)
+        if hit is not None:
+            span.set(cache="hit", found=bool(hit))
+            return hit
+        pmid = _fetch_pmid(_shared_session(), title)
+        span.set(cache="miss", found=bool(pmid))
+        _cache_set(key, pmid)
     return pmid
 
-# ---- OMIM/Orphanet via Wikidata API claims + OLS fallback (no SPARQL) ----
+def resolve_many_pmids(titles: Iterable[str], *, max_workers: int = 8) -> Dict[str, str]:
+    """
+    PMIDs for many titles: {title (as given): pmid or ""}.
+    Duplicates are queried once, cached titles are answered locally, the rest run concurrently
+    (at most `max_workers` requests in flight) over the shared session.
+    """
+    groups = _dedupe(titles)
+    found: Dict[str, str] = {"": ""}
+    todo: List[str] = []
+    for q in groups:
+        if not q:
+            continue
+        hit = _cache_get(_pmid_key(q))
+        if hit is not None:
+            found[q] = hit
+        else:
+            todo.append(q)
+    if todo:
+        s = _shared_session()
+        with instrument.stage("pubmed_many", queries=len(groups), fetched=len(todo)), \
+                ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(todo)))) as ex:
+            for q, pmid in zip(todo, ex.map(lambda q: _fetch_pmid(s, q), todo)):
+                found[q] = pmid
+                _cache_set(_pmid_key(q), pmid)
+    return {orig: found[q] for q, origs in groups.items() for orig in origs}
+
+# ---- OMIM/Orphanet: local ontology index, then Wikidata API claims + OLS fallback (no SPARQL) ----
 def _mediawiki_exact_qid(s: requests.Session, label_en: str) -> Optional[str]:
-    r = s.get("https://www.wikidata.org/w/api.php",
+    r = s.get(WIKIDATA_API,
               params={"action":"wbsearchentities","format":"json","language":"en",
                       "search":label_en,"limit":5,"strictlanguage":1},
               timeout=(2.0,5.0))
@@ -69,39 +157,92 @@ def _mediawiki_exact_qid(s: requests.Session, label_en: str) -> Optional[str]:
             return h.get("id")
     return hits[0]["id"] if hits else None
 
-def _claims_for_qid(s: requests.Session, qid: str) -> Dict[str,str]:
-    r = s.get("https://www.wikidata.org/w/api.php",
-              params={"action":"wbgetentities","format":"json","ids":qid,"props":"claims"},
-              timeout=(2.0,5.0))
-    r.raise_for_status()
-    ent = (r.json() or {}).get("entities",{}).get(qid,{}).get("claims",{}) or {}
-    def first(p): 
-        try: return ent[p][0]["mainsnak"]["datavalue"]["value"]
-        except Exception: return ""
+def _ids_from_claims(ent: dict) -> Dict[str,str]:
+    def first(p):
+        try:
+            return ent[p][0]["mainsnak"]["datavalue"]["value"]
+        except Exception:
+            return ""
     omim = str(first("P492") or "")
     orpha = str(first("P1550") or "")
     return {"OMIM": f"OMIM:{omim}" if omim else "", "OrphaNet": f"Orphanet:{orpha}" if orpha else ""}
 
+def _claims_for_qid(s: requests.Session, qid: str) -> Dict[str,str]:
+    return _claims_for_qids(s, [qid]).get(qid, {"OMIM":"","OrphaNet":""})
+
+def _claims_for_qids(s: requests.Session, qids: List[str]) -> Dict[str, Dict[str,str]]:
+    """OMIM/Orphanet ids for many QIDs, WBGETENTITIES_MAX per wbgetentities request."""
+    out: Dict[str, Dict[str,str]] = {}
+    for i in range(0, len(qids), WBGETENTITIES_MAX):
+        chunk = qids[i:i+WBGETENTITIES_MAX]
+        r = s.get(WIKIDATA_API,
+                  params={"action":"wbgetentities","format":"json","ids":"|".join(chunk),"props":"claims"},
+                  timeout=(2.0,5.0))
+        r.raise_for_status()
+        ents = (r.json() or {}).get("entities",{}) or {}
+        for qid in chunk:
+            out[qid] = _ids_from_claims((ents.get(qid,{}) or {}).get("claims",{}) or {})
+    return out
+
 def _ols_orphanet_exact(s: requests.Session, label: str) -> str:
-    r = s.get("https://www.ebi.ac.uk/ols4/api/search",
+    r = s.get(OLS_URL,
               params={"q":label,"ontology":"ordo","queryFields":"label","exact":"true"},
               timeout=(2.0,5.0))
-    if not r.ok: return ""
+    if not r.ok:
+        return ""
     js = r.json() or {}
-    if js.get("response",{}).get("numFound",0) <= 0: return ""
+    if js.get("response",{}).get("numFound",0) <= 0:
+        return ""
     doc = js["response"]["docs"][0]
     curie = next((x for x in doc.get("obo_id",[]) if isinstance(x,str) and x.startswith("Orphanet_")), "")
     return curie.split("_",1)[-1] if curie else ""
 
+def _ids_key(label: str) -> str:
+    return "ids:" + hashlib.sha1(label.encode("utf-8")).hexdigest()
+
+def _local_ids(label: str) -> Optional[Dict[str,str]]:
+    """Offline index first (utils.ontology_index); None when there is no index or no entry.
+    Ids it lacks (or finds ambiguous) come back blank and are filled from the network."""
+    try:
+        from utils import ontology_index
+        return ontology_index.lookup(label)
+    except Exception:
+        return None
+
 def resolve_omim_and_orphanet_from_disease(label: str) -> Dict[str,str]:
+    with instrument.stage("wikidata") as span:
+        out, source = _disease_ids(label)
+        span.set(cache="hit" if source != "network" else "miss", source=source,
+                 found=bool(out.get("OMIM") or out.get("OrphaNet")))
+    return out
+
+def _complete(ids: Optional[Dict[str,str]]) -> bool:
+    return bool(ids and ids.get("OMIM") and ids.get("OrphaNet"))
+
+def _with_local(local: Optional[Dict[str,str]], ids: Dict[str,str]) -> Dict[str,str]:
+    """Cached / network ids, with the local index's ids taking precedence where it has them."""
+    return {k: (local or {}).get(k) or ids.get(k, "") for k in ("OMIM", "OrphaNet")}
+
+def _disease_ids(label: str) -> Tuple[Dict[str,str], str]:
+    """(ids, where they came from: "local" index, "cache", "network" or "empty" label)."""
     q = _norm(label)
-    key = "ids:" + hashlib.sha1(q.encode("utf-8")).hexdigest()
+    local = _local_ids(q)
+    if _complete(local):
+        return local, "local"
+    ids, source = _remote_disease_ids(q)
+    return _with_local(local, ids), source
+
+def _remote_disease_ids(q: str) -> Tuple[Dict[str,str], str]:
+    key = _ids_key(q)
     hit = _cache_get(key)
-    if hit is not None: return hit
+    if hit is not None:
+        return hit, "cache"
     if not q:
         out = {"OMIM":"","OrphaNet":""}
-        _cache_set(key,out); return out
-    s = _session()
+        _cache_set(key,out)
+        return out, "empty"
+    s = _shared_session()
+    t0 = time.perf_counter()
     omim, orpha = "", ""
     try:
         qid = _mediawiki_exact_qid(s, q)
@@ -114,9 +255,69 @@ def resolve_omim_and_orphanet_from_disease(label: str) -> Dict[str,str]:
     if not orpha:
         try:
             o = _ols_orphanet_exact(s, q)
-            if o: orpha = f"Orphanet:{o}"
+            if o:
+                orpha = f"Orphanet:{o}"
         except Exception:
             pass
+    CACHE.observe_fetch("ids", time.perf_counter() - t0)
     out = {"OMIM": omim, "OrphaNet": orpha}
     _cache_set(key, out)
-    return out
\ No newline at end of file
+    return out, "network"
+
+def resolve_many_disease_ids(labels: Iterable[str], *, max_workers: int = 8) -> Dict[str, Dict[str,str]]:
+    """
+    OMIM/Orphanet ids for many disease labels: {label (as given): {"OMIM": .., "OrphaNet": ..}}.
+    Same result per label as resolve_omim_and_orphanet_from_disease, but duplicates run once,
+    cached labels are answered locally, searches and OLS fallbacks run concurrently, and the
+    Wikidata claim lookups are batched WBGETENTITIES_MAX ids per request.
+    """
+    groups = _dedupe(labels)
+    found: Dict[str, Dict[str,str]] = {"": {"OMIM":"","OrphaNet":""}}
+    local: Dict[str, Optional[Dict[str,str]]] = {}
+    todo: List[str] = []
+    for q in groups:
+        if not q:
+            continue
+        local[q] = _local_ids(q)
+        if _complete(local[q]):
+            found[q] = local[q]
+            continue
+        hit = _cache_get(_ids_key(q))
+        if hit is not None:
+            found[q] = hit
+        else:
+            todo.append(q)
+    if todo:
+        s = _shared_session()
+        workers = max(1, min(max_workers, len(todo)))
+
+        def qid_for(q: str) -> Optional[str]:
+            try:
+                return _mediawiki_exact_qid(s, q)
+            except Exception:
+                return None
+
+        def ols_for(q: str) -> str:
+            try:
+                return _ols_orphanet_exact(s, q)
+            except Exception:
+                return ""
+
+        t0 = time.perf_counter()
+        with instrument.stage("wikidata_many", queries=len(groups), fetched=len(todo)), \
+                ThreadPoolExecutor(max_workers=workers) as ex:
+            qids = dict(zip(todo, ex.map(qid_for, todo)))
+            try:
+                claims = _claims_for_qids(s, sorted({v for v in qids.values() if v}))
+            except Exception:
+                claims = {}
+            for q in todo:
+                found[q] = dict(claims.get(qids[q] or "", {"OMIM":"","OrphaNet":""}))
+            missing = [q for q in todo if not found[q]["OrphaNet"]]
+            for q, o in zip(missing, ex.map(ols_for, missing)):
+                if o:
+                    found[q]["OrphaNet"] = f"Orphanet:{o}"
+        CACHE.observe_fetch("ids", time.perf_counter() - t0)
+        for q in todo:
+            _cache_set(_ids_key(q), found[q])
+    return {orig: _with_local(local.get(q), found[q]) for q, origs in groups.items() for orig in origs}
@@ -0,0 +1,306 @@
+# utils/instrument.py  –  per-stage timings and counters for every document
+# -------------------------------------------------------------------------------------------------
+# Pipeline steps run inside `with stage("docling") as span:` and attach what they know with
+# span.set(pages=..., bytes_out=..., prompt_tokens=..., cache="hit"). document(name) tags every
+# span of the current thread / asyncio task with the document it belongs to. Finished spans go
+# to the active sink:
+#   NullSink          default; stage() then returns one shared no-op span (no clock reads, no
+#                     allocation beyond the call itself)
+#   JSONLSink(path)   one JSON object per span
+#   PrometheusSink    counters per stage (seconds, calls, errors, bytes, pages, tokens, cache
+#                     hits/misses); .text() in exposition format, written to `path` on flush
+#   ChromeTraceSink   trace-event JSON ("X" events) for chrome://tracing or ui.perfetto.dev
+#   MultiSink(a, b)   fan out
+#
+#     instrument.set_sink(instrument.ChromeTraceSink("trace.json"))
+#     with instrument.document("aec.pdf"):
+#         md = pdf_to_combined_markdown("pdfs/aec.pdf")
+#     instrument.get_sink().flush()
+#
+# INSTRUMENT_SINK="jsonl:spans.jsonl,chrome:trace.json,prom:metrics.prom" sets this up from the
+# environment (configure_from_env(); batch conversion workers call it with per_process=True, so
+# their trace / metrics files get a "-<pid>" suffix). Sinks are flushed at interpreter exit.
+from __future__ import annotations
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_DOC: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("instrument_doc", default=None)
+
+def _tid() -> int:
+    """Thread id, or the asyncio task's id inside a running loop (concurrent tasks share a thread)."""
+    try:
+        import asyncio
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return id(task) if task is not None else threading.get_ident()
+
+class Span:
+    """One timed stage; attributes are free-form, numbers are summed by PrometheusSink."""
+    __slots__ = ("name", "attrs", "doc", "start_ns", "dur_ns", "pid", "tid", "error", "_sink", "_t0")
+
+    def __init__(self, sink: "Sink", name: str, attrs: Dict[str, Any]):
+        self._sink, self.name, self.attrs = sink, name, attrs
+        self.doc = _DOC.get()
+        self.pid, self.tid = os.getpid(), _tid()
+        self.error: Optional[str] = None
+        self.start_ns = self.dur_ns = self._t0 = 0
+
+    def set(self, **attrs: Any) -> "Span":
+        self.attrs.update(attrs)
+        return self
+
+    def __enter__(self) -> "Span":
+        self.start_ns = time.time_ns()
+        self._t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.dur_ns = time.perf_counter_ns() - self._t0
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        try:
+            self._sink.emit(self)
+        except Exception:
+            pass                                  # instrumentation never breaks the pipeline
+        return False
+
+    @property
+    def seconds(self) -> float:
+        return self.dur_ns / 1e9
+
+    def as_dict(self) -> Dict[str, Any]:
+        d = {"stage": self.name, "doc": self.doc, "start": self.start_ns / 1e9, "seconds": self.seconds,
+             "pid": self.pid, "tid": self.tid}
+        if self.error:
+            d["error"] = self.error
+        d.update(self.attrs)
+        return d
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> "_NoopSpan":
+        return self
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+_NOOP = _NoopSpan()
+
+# ---- sinks ----
+class Sink:
+    def emit(self, span: Span) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+class NullSink(Sink):
+    def emit(self, span: Span) -> None:
+        pass
+
+def _expand(path: str) -> str:
+    return path.replace("{pid}", str(os.getpid()))
+
+def _atomic_write(path: str, text: str) -> None:
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+class JSONLSink(Sink):
+    """Appends one line per span; O_APPEND keeps lines from several processes intact."""
+
+    def __init__(self, path: str):
+        self.path = _expand(path)
+        self._lock = threading.Lock()
+        self._f = open(self.path, "a", encoding="utf-8", buffering=1)
+
+    def emit(self, span: Span) -> None:
+        line = json.dumps(span.as_dict(), ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._f.write(line)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._f.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._f.close()
+
+# numeric attributes summed into <prefix>_<attr>_total{stage=...}
+COUNTED = ("bytes_in", "bytes_out", "pages", "pages_scanned", "tables", "prompt_tokens", "completion_tokens")
+
+class PrometheusSink(Sink):
+    def __init__(self, path: Optional[str] = None, *, prefix: str = "case_pipeline"):
+        self.path = _expand(path) if path else None
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+    def _inc(self, metric: str, labels: Tuple[Tuple[str, str], ...], v: float) -> None:
+        key = (metric, labels)
+        self._values[key] = self._values.get(key, 0.0) + v
+
+    def emit(self, span: Span) -> None:
+        lab = (("stage", span.name),)
+        with self._lock:
+            self._inc("stage_seconds_total", lab, span.seconds)
+            self._inc("stage_calls_total", lab, 1)
+            if span.error:
+                self._inc("stage_errors_total", lab, 1)
+            for k in COUNTED:
+                v = span.attrs.get(k)
+                if isinstance(v, (int, float)) and not isinstance(v, bool):
+                    self._inc(f"{k}_total", lab, v)
+            cache = span.attrs.get("cache")
+            if cache:
+                self._inc("cache_total", lab + (("result", str(cache)),), 1)
+
+    def text(self) -> str:
+        with self._lock:
+            items = sorted(self._values.items())
+        out: List[str] = []
+        seen = set()
+        for (metric, labels), v in items:
+            name = f"{self.prefix}_{metric}"
+            if name not in seen:
+                seen.add(name)
+                out.append(f"# TYPE {name} counter")
+            lab = ",".join(f'{k}="{val}"' for k, val in labels)
+            # shortest exact form: `:g` kept 6 significant digits, so large counters stopped moving
+            out.append(f"{name}{{{lab}}} {v if isinstance(v, int) else repr(float(v))}")
+        return "\n".join(out) + "\n"
+
+    def flush(self) -> None:
+        if self.path:
+            _atomic_write(self.path, self.text())
+
+class ChromeTraceSink(Sink):
+    """Collects complete ("X") events; flush() rewrites `path` with everything so far."""
+
+    def __init__(self, path: str):
+        self.path = _expand(path)
+        self._lock = threading.Lock()
+        self._events: List[Dict[str, Any]] = []
+
+    def emit(self, span: Span) -> None:
+        args = dict(span.attrs)
+        if span.doc:
+            args["doc"] = span.doc
+        if span.error:
+            args["error"] = span.error
+        ev = {"name": span.name, "cat": "stage", "ph": "X", "ts": span.start_ns / 1000,
+              "dur": span.dur_ns / 1000, "pid": span.pid, "tid": span.tid, "args": args}
+        with self._lock:
+            self._events.append(ev)
+
+    def flush(self) -> None:
+        with self._lock:
+            events = list(self._events)
+        _atomic_write(self.path, json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, default=str))
+
+class MultiSink(Sink):
+    def __init__(self, *sinks: Sink):
+        self.sinks = sinks
+
+    def emit(self, span: Span) -> None:
+        for s in self.sinks:
+            s.emit(span)
+
+    def flush(self) -> None:
+        for s in self.sinks:
+            s.flush()
+
+    def close(self) -> None:
+        for s in self.sinks:
+            s.close()
+
+# ---- the active sink ----
+_NULL = NullSink()
+_SINK: Sink = _NULL
+
+def stage(name: str, **attrs: Any):
+    """Context manager timing one step; returns a span (no-op when nothing is listening)."""
+    sink = _SINK
+    if sink is _NULL:
+        return _NOOP
+    return Span(sink, name, attrs)
+
+def enabled() -> bool:
+    return _SINK is not _NULL
+
+@contextmanager
+def document(name: Optional[str]) -> Iterator[None]:
+    """Attribute all spans in this context (thread / asyncio task) to document `name`."""
+    token = _DOC.set(name)
+    try:
+        yield
+    finally:
+        _DOC.reset(token)
+
+def current_document() -> Optional[str]:
+    return _DOC.get()
+
+def get_sink() -> Sink:
+    return _SINK
+
+def set_sink(sink: Optional[Sink]) -> Sink:
+    """Install `sink` (None → NullSink); returns the previous one, which is not closed."""
+    global _SINK
+    prev, _SINK = _SINK, sink if sink is not None else _NULL
+    return prev
+
+_KINDS = {"jsonl": JSONLSink, "prom": PrometheusSink, "prometheus": PrometheusSink, "chrome": ChromeTraceSink}
+_DEFAULT_PATH = {"jsonl": "spans-{pid}.jsonl", "prom": "metrics-{pid}.prom", "prometheus": "metrics-{pid}.prom",
+                 "chrome": "trace-{pid}.json"}
+
+def sink_from_spec(spec: str, *, per_process: bool = False) -> Sink:
+    """
+    'jsonl:path,chrome:path,prom:path' → sink (several → MultiSink; '' or 'null' → NullSink).
+    per_process=True adds "-{pid}" to chrome / prom paths without one, so worker processes
+    don't overwrite each other's files (JSONL lines are appended and can share a file).
+    """
+    sinks: List[Sink] = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        kind, _, path = part.partition(":")
+        if kind in ("null", "none"):
+            continue
+        if kind not in _KINDS:
+            raise ValueError(f"unknown instrument sink: {kind!r}")
+        path = path or _DEFAULT_PATH[kind]
+        if per_process and kind != "jsonl" and "{pid}" not in path:
+            root, ext = os.path.splitext(path)
+            path = f"{root}-{{pid}}{ext}"
+        sinks.append(_KINDS[kind](path))
+    if not sinks:
+        return _NULL
+    return sinks[0] if len(sinks) == 1 else MultiSink(*sinks)
+
+def configure_from_env(var: str = "INSTRUMENT_SINK", *, per_process: bool = False) -> Sink:
+    """Install the sink described by $INSTRUMENT_SINK, if set; returns the active sink."""
+    spec = os.getenv(var, "")
+    if spec:
+        set_sink(sink_from_spec(spec, per_process=per_process))
+    return _SINK
+
+@atexit.register
+def _flush_at_exit() -> None:
+    try:
+        _SINK.close()
+    except Exception:
+        pass
@@ -0,0 +1,161 @@
+# utils/llm_async.py  –  asyncio, rate-limited version of combined_md_to_record
+# -------------------------------------------------------------------------------------------------
+# One AsyncOpenAI client (one pooled HTTP connection set) serves every request. Requests are
+# throttled on both requests-per-minute and tokens-per-minute, and 429 / 5xx / connection errors
+# are retried with full-jitter exponential backoff (honouring Retry-After when the server sends it).
+#
+#     records = await extract_many(mds)                       # hundreds of documents in flight
+#     records = asyncio.run(extract_many(mds, rpm=500, tpm=200_000))
+#
+# Point it at a local stub server with base_url=... or the usual OPENAI_BASE_URL variable.
+# Results share utils.llm_cache with the sync path; refresh=True forces a new call.
+from __future__ import annotations
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from utils import instrument, llm_cache
+from utils.pdf_to_json_row import build_record_messages, load_env, parse_record
+
+class RateLimiter:
+    """Two token buckets (requests and tokens per minute) refilled continuously."""
+
+    def __init__(self, rpm: float, tpm: float):
+        self.rpm, self.tpm = float(rpm), float(tpm)
+        self._req, self._tok = self.rpm, self.tpm
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        dt, self._last = now - self._last, now
+        self._req = min(self.rpm, self._req + dt * self.rpm / 60.0)
+        self._tok = min(self.tpm, self._tok + dt * self.tpm / 60.0)
+
+    async def acquire(self, tokens: int) -> None:
+        tokens = min(tokens, self.tpm)           # an oversized request must still be able to run
+        async with self._lock:                   # FIFO: later callers wait behind the first
+            while True:
+                self._refill()
+                if self._req >= 1 and self._tok >= tokens:
+                    self._req -= 1
+                    self._tok -= tokens
+                    return
+                wait_req = (1 - self._req) * 60.0 / self.rpm if self._req < 1 else 0.0
+                wait_tok = (tokens - self._tok) * 60.0 / self.tpm if self._tok < tokens else 0.0
+                await asyncio.sleep(max(wait_req, wait_tok, 0.01))
+
+    def refund(self, tokens: int) -> None:
+        """Give back (or, if negative, take) the difference between estimated and actual usage."""
+        self._tok = min(self.tpm, self._tok + tokens)
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1                    # ~4 characters per token for English prose
+
+def _retryable(e: Exception) -> bool:
+    if isinstance(e, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError)):
+        return True
+    return isinstance(e, openai.APIStatusError) and e.status_code >= 500
+
+def _retry_after(e: Exception) -> Optional[float]:
+    resp = getattr(e, "response", None)
+    try:
+        return float(resp.headers.get("retry-after")) if resp is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class AsyncExtractor:
+    """Shared async client + limiter. Use `async with AsyncExtractor(...) as ex:` or call aclose()."""
+
+    def __init__(self, *, model: str = "gpt-4o-mini", rpm: float = 500, tpm: float = 200_000,
+                 max_concurrency: int = 64, max_retries: int = 6, completion_tokens: int = 1500,
+                 base_url: Optional[str] = None, api_key: Optional[str] = None, timeout: float = 120.0,
+                 backoff_base: float = 1.0, backoff_cap: float = 60.0, use_cache: bool = True):
+        self.model = model
+        self.use_cache = use_cache
+        self.max_retries = max_retries
+        self.completion_tokens = completion_tokens
+        self.backoff_base, self.backoff_cap = backoff_base, backoff_cap
+        self.limiter = RateLimiter(rpm, tpm)
+        self._sem = asyncio.Semaphore(max_concurrency)
+        limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        load_env()                                 # OPENAI_API_KEY from .env, as for the sync client
+        self.client = AsyncOpenAI(base_url=base_url, api_key=api_key, timeout=timeout, max_retries=0,
+                                  http_client=httpx.AsyncClient(limits=limits, timeout=timeout))
+        self.usage = {"requests": 0, "retries": 0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    async def __aenter__(self) -> "AsyncExtractor":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+    async def extract(self, md_text: str, *, refresh: bool = False) -> Dict[str, str]:
+        """One document → record (same output and cache as combined_md_to_record)."""
+        messages = build_record_messages(md_text)
+        instructions = messages[0]["content"][0]["text"]
+        with instrument.stage("llm", model=self.model, bytes_in=len(md_text)) as span:
+            if self.use_cache and not refresh:
+                hit = llm_cache.get(self.model, instructions, md_text)
+                if hit is not None:
+                    self.usage["cache_hits"] += 1
+                    span.set(cache="hit")
+                    return dict(hit["record"])
+
+            estimate = estimate_tokens(md_text) + estimate_tokens(instructions) + self.completion_tokens
+            async with self._sem:
+                r, attempts = await self._complete(messages, estimate)
+                self.usage["requests"] += 1
+                span.set(cache="miss" if self.use_cache else "off", attempts=attempts,
+                         bytes_out=len(r.choices[0].message.content or ""))
+                if r.usage is not None:
+                    span.set(prompt_tokens=r.usage.prompt_tokens, completion_tokens=r.usage.completion_tokens)
+                    self.usage["prompt_tokens"] += r.usage.prompt_tokens
+                    self.usage["completion_tokens"] += r.usage.completion_tokens
+                    self.limiter.refund(estimate - r.usage.total_tokens)
+                record = parse_record(r.choices[0].message.content)
+                if self.use_cache:
+                    llm_cache.put(self.model, instructions, md_text, record, llm_cache.usage_dict(r.usage))
+                return record
+
+    async def _complete(self, messages: List[Dict[str, Any]], estimate: int) -> Tuple[Any, int]:
+        """
+        (completion, attempts made). Transient errors are retried with backoff; the error of the
+        last allowed attempt, or any non-retryable one, propagates as raised.
+        """
+        attempt = 0
+        while True:
+            await self.limiter.acquire(estimate)
+            try:
+                r = await self.client.chat.completions.create(
+                    model=self.model, messages=messages, response_format={"type": "json_object"})
+                return r, attempt + 1
+            except Exception as e:
+                if not _retryable(e) or attempt == self.max_retries:
+                    raise
+                delay = _retry_after(e)
+            self.usage["retries"] += 1
+            if delay is None:
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def extract_many(self, mds: Sequence[str], *, return_exceptions: bool = False,
+                           refresh: bool = False) -> List[Any]:
+        """All documents concurrently (bounded by max_concurrency and the rate limits), in input order."""
+        return await asyncio.gather(*(self.extract(md, refresh=refresh) for md in mds),
+                                    return_exceptions=return_exceptions)
+
+async def extract_many(mds: Sequence[str], *, return_exceptions: bool = False, refresh: bool = False,
+                       **kwargs) -> List[Any]:
+    """Convenience wrapper: `records = await extract_many(mds, model=..., rpm=..., tpm=...)`."""
+    async with AsyncExtractor(**kwargs) as ex:
+        return await ex.extract_many(mds, return_exceptions=return_exceptions, refresh=refresh)
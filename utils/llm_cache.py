@@ -0,0 +1,83 @@
+# utils/llm_cache.py  –  persistent cache for LLM extraction results
+# -------------------------------------------------------------------------------------------------
+# Key = model + SHA-256 of the instruction block (PROMPT_INSTRUCTIONS, JSON skeleton, DESCRIPTORS
+# guidance) + SHA-256 of the document markdown. Re-running over unchanged documents costs nothing;
+# editing the prompt or any field description changes the instruction hash, so only entries built
+# with the old prompt stop matching (they age out via TTL / size-bounded LRU eviction).
+# Values: {"record": parsed JSON, "usage": token counts, "created": unix time}.
+from __future__ import annotations
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+_CACHE: Any = None
+_OPENED = False
+_LOCK = threading.Lock()
+
+def _cache():
+    """The diskcache store, opened on first use (None when diskcache is unavailable)."""
+    global _CACHE, _OPENED
+    if not _OPENED:
+        with _LOCK:
+            if not _OPENED:
+                try:
+                    import diskcache as dc
+                    _CACHE = dc.Cache(os.getenv("LLM_CACHE_DIR", "cache_llm"),
+                                      size_limit=int(os.getenv("LLM_CACHE_MAX_BYTES", 512 << 20)),
+                                      eviction_policy="least-recently-used")
+                except Exception:
+                    _CACHE = None     # no diskcache → caching disabled
+                _OPENED = True
+    return _CACHE
+
+def __getattr__(name: str) -> Any:
+    if name == "CACHE":               # opened lazily, so importing this module stays cheap
+        return _cache()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+DEFAULT_TTL = int(os.getenv("LLM_CACHE_TTL", 60*60*24*90))     # seconds; 0 = never expire
+
+def _enabled() -> bool:
+    return os.getenv("LLM_CACHE", "1").lower() not in ("0", "false", "no") and _cache() is not None
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def cache_key(model: str, instructions: str, md_text: str) -> str:
+    return f"llm:{model}:{_sha(instructions)[:16]}:{_sha(md_text)}"
+
+def get(model: str, instructions: str, md_text: str) -> Optional[Dict[str, Any]]:
+    """Cached {"record", "usage", "created"} or None."""
+    if not _enabled():
+        return None
+    try:
+        return _cache().get(cache_key(model, instructions, md_text))
+    except Exception:
+        return None
+
+def put(model: str, instructions: str, md_text: str, record: Dict[str, str],
+        usage: Optional[Dict[str, int]] = None, *, ttl: Optional[int] = None) -> None:
+    if not _enabled():
+        return
+    ttl = DEFAULT_TTL if ttl is None else ttl
+    value = {"record": record, "usage": usage or {}, "created": time.time()}
+    try:
+        _cache().set(cache_key(model, instructions, md_text), value, expire=ttl or None)
+    except Exception:
+        pass
+
+def usage_dict(usage: Any) -> Dict[str, int]:
+    """OpenAI usage object → plain dict (empty if the server sent none)."""
+    if usage is None:
+        return {}
+    return {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens,
+            "total_tokens": usage.total_tokens}
+
+def cache_stats() -> Dict[str, Any]:
+    cache = _cache()
+    if cache is None:
+        return {"enabled": False, "entries": 0, "bytes": 0}
+    return {"enabled": _enabled(), "entries": len(cache), "bytes": cache.volume(),
+            "size_limit": cache.size_limit}
@@ -0,0 +1,208 @@
+# utils/md_compact.py  –  shrink the combined markdown before it is sent to the LLM
+# -------------------------------------------------------------------------------------------------
+# The Docling export carries a lot the extraction prompt never needs: reference lists,
+# acknowledgements, funding/ethics boilerplate, author affiliations, image placeholders and inline
+# base64 images, and every table twice (Docling's inline version + the "Full Table N" re-extract).
+# compact_markdown() splits the text into sections, drops the low-value ones, replaces each inline
+# table whose content reappears in an appended full version, and finally truncates low-priority
+# sections until the text fits a token budget (tables lose rows, never their header). It reports
+# token counts before and after.
+from __future__ import annotations
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import FrozenSet, List, Optional, Tuple
+
+@dataclass(frozen=True)
+class CompactConfig:
+    token_budget: Optional[int] = 24_000          # None → only drop, never truncate
+    drop_sections: Tuple[str, ...] = (
+        r"references?", r"literature cited", r"bibliography", r"acknowledge?ments?",
+        r"funding( sources?)?", r"(declaration of )?(conflicts? of interests?|competing interests?)",
+        r"author'?s?'? (contributions?|notes|history)", r"revision history", r"license",
+        r"data availability.*", r"provenance and peer review", r"guarantor", r"consent to publish",
+        r"chapter notes", r"resources", r"supplementary (material|data).*", r"abbreviations",
+        r"nlm citation.*", r"a r t i c l e i n f o", r"article info(rmation)?",
+    )
+    high_priority: Tuple[str, ...] = (            # truncated last
+        r".*\bcase\b.*", r".*\bpatients?\b.*", r"abstract", r"summary", r"introduction",
+        r".*presentation.*", r"clinical.*", r"discussion.*", r"conclusions?",
+    )
+    drop_affiliations: bool = True
+    max_affiliation_chars: int = 300              # longer front-matter lines are prose, never stripped
+    drop_images: bool = True
+    dedupe_tables: bool = True                    # inline Docling table → pointer if a "Full Table N" repeats it
+    table_match: float = 0.8                      # share of the inline table's words found in the full table
+    min_section_tokens: int = 64                  # truncation never cuts a section below this
+
+@dataclass
+class CompactResult:
+    text: str
+    tokens_before: int
+    tokens_after: int
+    dropped: List[str] = field(default_factory=list)
+    truncated: List[str] = field(default_factory=list)
+
+    @property
+    def saved_ratio(self) -> float:
+        return 1 - self.tokens_after / self.tokens_before if self.tokens_before else 0.0
+
+DEFAULT_CONFIG = CompactConfig()
+
+_HEADING_RE = re.compile(r"^#{1,6}\s+(.*)$", re.MULTILINE)
+_FULL_TABLE_RE = re.compile(r"\n*\*\*Full Table \d+\*\*\n")
+_NOTICE_RE = re.compile(r"\n*---\n\*\*NOTE to the language-model:\*\*")
+_IMAGE_RE = re.compile(r"^\s*(<!-- image -->|!\[[^\]]*\]\(data:[^)]*\))\s*$", re.MULTILINE)
+_INLINE_IMAGE_RE = re.compile(r"!\[[^\]]*\]\(data:[^)]*\)")
+_TABLE_BLOCK_RE = re.compile(r"(?:^\|.*\|[ \t]*\n?)+", re.MULTILINE)
+_AFFIL_RE = re.compile(
+    r"^\s*(?:[-*]\s*)?(?:\$\^\{?[\w,*]+\}?\$|\d+|[a-z]\b)?\s*"
+    r"(?:Department|Dept\.?|Division|Institute|School|Faculty|University|Hospital|Cent(?:er|re)|"
+    r"Laboratory|Unit|Clinic)\b.*$", re.MULTILINE)
+_EMAIL_LINE_RE = re.compile(r"^.*\b[\w.+-]+@[\w-]+\.[\w.-]+\b.*$", re.MULTILINE)
+_TABLE_POINTER = "[Table omitted here – see the full tables at the end.]\n"
+
+@lru_cache(maxsize=1)
+def _encoder():
+    """tiktoken's o200k_base, loaded on the first count (None without tiktoken)."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+def count_tokens(text: str) -> int:
+    enc = _encoder()
+    if enc is None:
+        return len(text) // 4 + 1                 # ~4 characters per token for English prose
+    return len(enc.encode(text, disallowed_special=()))
+
+@dataclass
+class _Section:
+    title: str
+    body: str
+    kind: str = "text"                            # "text" | "notice" | "table"
+    priority: int = 1                             # 0 = truncate first, 2 = truncate last
+
+def _split(md: str) -> List[_Section]:
+    """Headings split the main text; the notice and each 'Full Table N' become their own sections."""
+    tables: List[_Section] = []
+    notice = None
+    m = _NOTICE_RE.search(md)
+    if m:
+        main, tail = md[:m.start()], md[m.start():]
+        parts = _FULL_TABLE_RE.split(tail)
+        heads = _FULL_TABLE_RE.findall(tail)
+        notice = _Section("notice", parts[0], "notice", 2)
+        tables = [_Section(h.strip(), h + body, "table", 0) for h, body in zip(heads, parts[1:])]
+    else:
+        main = md
+
+    sections: List[_Section] = []
+    pos, title = 0, ""
+    for h in _HEADING_RE.finditer(main):
+        sections.append(_Section(title, main[pos:h.start()]))
+        pos, title = h.start(), h.group(1).strip()
+    sections.append(_Section(title, main[pos:]))
+    return [s for s in sections if s.body.strip()] + ([notice] if notice else []) + tables
+
+def _words(text: str) -> FrozenSet[str]:
+    """Cell words of a Markdown table, ASCII-folded like the full tables (utils.extract_pdf_tables)."""
+    ascii_ = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return frozenset(re.findall(r"\w+", ascii_.casefold()))
+
+def _dedupe_tables(body: str, full: List[FrozenSet[str]], threshold: float) -> str:
+    """Replace each inline table whose words mostly reappear in one full table by a pointer."""
+    def replace(m: re.Match) -> str:
+        words = _words(m.group(0))
+        if words and any(len(words & f) >= threshold * len(words) for f in full):
+            return _TABLE_POINTER
+        return m.group(0)
+    return _TABLE_BLOCK_RE.sub(replace, body)
+
+def _matches(title: str, patterns: Tuple[str, ...]) -> bool:
+    t = re.sub(r"^[\d.\s]+", "", title).strip(" :*").casefold()
+    return any(re.fullmatch(p, t) for p in patterns)
+
+def _truncate_table(table: str, max_tokens: int) -> str:
+    """Header and separator rows of a Markdown table, then as many data rows as fit."""
+    lines = table.splitlines()
+    out, used = lines[:2], count_tokens("\n".join(lines[:2]))
+    for row in lines[2:]:
+        n = count_tokens(row) + 1
+        if used + n > max_tokens:
+            break
+        out.append(row)
+        used += n
+    return "\n".join(out)
+
+def _truncate(body: str, max_tokens: int) -> str:
+    """
+    Keep whole paragraphs from the start while they fit, then mark the cut. A table that does not
+    fit is cut by rows instead (header kept), so a full table an inline pointer refers to survives.
+    """
+    out, used = [], 0
+    for para in body.split("\n\n"):
+        n = count_tokens(para)
+        if used + n > max_tokens and not (not out and para.startswith("#")):   # always keep the heading
+            if para.startswith("|"):
+                out.append(_truncate_table(para, max_tokens - used))
+            break
+        out.append(para)
+        used += n
+    return "\n\n".join(out).rstrip() + "\n\n[…]\n\n"
+
+def compact_markdown(md: str, config: Optional[CompactConfig] = None) -> CompactResult:
+    """Drop low-value sections and fit `md` into `config.token_budget` tokens."""
+    cfg = config or DEFAULT_CONFIG
+    before = count_tokens(md)
+    dropped: List[str] = []
+    truncated: List[str] = []
+
+    sections = _split(md)
+    full_tables = [_words(s.body) for s in sections if s.kind == "table"] if cfg.dedupe_tables else []
+
+    def short(m: re.Match) -> str:
+        return "" if len(m.group(0).strip()) <= cfg.max_affiliation_chars else m.group(0)
+
+    kept: List[_Section] = []
+    for i, s in enumerate(sections):
+        if s.kind == "text":
+            if s.title and _matches(s.title, cfg.drop_sections):
+                dropped.append(s.title)
+                continue
+            body = s.body
+            if cfg.drop_images:
+                body = _INLINE_IMAGE_RE.sub("", _IMAGE_RE.sub("", body))
+            if cfg.drop_affiliations and i < 3:     # affiliations only sit in the front matter
+                body = _EMAIL_LINE_RE.sub(short, _AFFIL_RE.sub(short, body))
+            if full_tables:
+                body = _dedupe_tables(body, full_tables, cfg.table_match)
+            body = re.sub(r"\n{3,}", "\n\n", body)
+            if not body.strip() or body.strip() == f"## {s.title}":
+                continue
+            s.body = body
+            s.priority = 2 if (not s.title or _matches(s.title, cfg.high_priority)) else 1
+        kept.append(s)
+
+    if cfg.token_budget is not None:
+        sizes = [count_tokens(s.body) for s in kept]
+        excess = sum(sizes) - cfg.token_budget
+        # lowest priority first; within a level, the last (least central) sections first
+        order = sorted(range(len(kept)), key=lambda i: (kept[i].priority, -i))
+        for i in order:
+            if excess <= 0:
+                break
+            s = kept[i]
+            if s.kind == "notice" or sizes[i] <= cfg.min_section_tokens:
+                continue
+            target = max(cfg.min_section_tokens, sizes[i] - excess)
+            s.body = _truncate(s.body, target)
+            new = count_tokens(s.body)
+            excess -= sizes[i] - new
+            sizes[i] = new
+            truncated.append(s.title or "(front matter)")
+
+    text = "".join(s.body for s in kept).strip() + "\n"
+    return CompactResult(text, before, count_tokens(text), dropped, truncated)
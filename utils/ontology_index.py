@@ -0,0 +1,209 @@
+# utils/ontology_index.py  –  offline OMIM / Orphanet lookup from local dump files
+# -------------------------------------------------------------------------------------------------
+# Builds a compact SQLite index (labels, synonyms, normalized forms, FTS5 for fuzzy candidates) from
+#   • ORDO      : Orphanet's OWL release (ORDO_en_*.owl) – labels, alternative terms, OMIM xrefs
+#   • OMIM      : mimTitles.txt from omim.org/downloads – phenotype titles, alternative/included titles
+#   • Wikidata  : CSV/TSV export with columns label, omim, orphanet (optional: aliases "a|b|c")
+# fast_resolvers (and so resolve_record_ids in the pipeline) consults it before going to the network,
+# so workers behind restrictive egress resolve most labels locally; ids the index lacks or finds
+# ambiguous are left blank and still looked up online.
+#
+# Build:   python -m utils.ontology_index build --ordo ORDO_en_4.5.owl --omim mimTitles.txt \
+#              --wikidata wikidata_diseases.tsv --out ontology_index.sqlite
+# Lookup:  python -m utils.ontology_index lookup "Phenylketonuria"
+from __future__ import annotations
+import argparse
+import csv
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterator, List, Optional, Tuple
+
+INDEX_PATH = os.getenv("ONTOLOGY_INDEX", "ontology_index.sqlite")
+
+_RDF   = "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}"
+_RDFS  = "{http://www.w3.org/2000/01/rdf-schema#}"
+_OWL   = "{http://www.w3.org/2002/07/owl#}"
+_OBO   = "{http://www.geneontology.org/formats/oboInOwl#}"
+_EFO   = "{http://www.ebi.ac.uk/efo/}"
+
+# (label, kind, omim, orphanet, source)   kind: "label" | "synonym"
+Row = Tuple[str, str, str, str, str]
+
+def normalize(label: str) -> str:
+    """Accent-, case- and punctuation-insensitive form: "Gaucher's Disease, Type 1" → "gaucher disease type 1"."""
+    s = unicodedata.normalize("NFKD", label or "")
+    s = "".join(c for c in s if not unicodedata.combining(c)).casefold()
+    s = re.sub(r"['’]s\b", "", s)
+    s = re.sub(r"[^\w]+", " ", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+# ---- importers ----
+def iter_ordo_owl(path: str) -> Iterator[Row]:
+    """Stream owl:Class entries of the ORDO OWL file (labels, alternative terms, OMIM xrefs)."""
+    for _, el in ET.iterparse(path, events=("end",)):
+        if el.tag != f"{_OWL}Class":
+            continue
+        about = el.get(f"{_RDF}about") or ""
+        if "Orphanet_" not in about:
+            el.clear()
+            continue
+        orpha = about.rsplit("Orphanet_", 1)[-1]
+        label = (el.findtext(f"{_RDFS}label") or "").strip()
+        syns = [(t.text or "").strip() for t in el.findall(f"{_EFO}alternative_term")]
+        omims = [(x.text or "").split(":", 1)[-1] for x in el.findall(f"{_OBO}hasDbXref")
+                 if (x.text or "").startswith("OMIM:")]
+        omim = omims[0] if len(omims) == 1 else ""      # ambiguous mappings are left to the network
+        if label:
+            yield (label, "label", omim, orpha, "ordo")
+        for syn in syns:
+            if syn:
+                yield (syn, "synonym", omim, orpha, "ordo")
+        el.clear()
+
+def iter_omim_titles(path: str) -> Iterator[Row]:
+    """mimTitles.txt: phenotype entries (#, %, NULL prefixes); genes (*, +) and moved (^) are skipped."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 3 or cols[0] not in ("Number Sign", "Percent", "NULL"):
+                continue
+            mim = cols[1].strip()
+            yield (cols[2].split(";")[0].strip(), "label", mim, "", "omim")
+            for extra in cols[3:5]:
+                for title in (extra or "").split(";;"):
+                    title = title.split(";")[0].strip()
+                    if title:
+                        yield (title, "synonym", mim, "", "omim")
+
+def iter_wikidata_table(path: str) -> Iterator[Row]:
+    """CSV/TSV with a header containing label, omim, orphanet (and optionally aliases)."""
+    with open(path, encoding="utf-8", newline="") as f:
+        dialect = "excel-tab" if path.endswith((".tsv", ".tab")) else "excel"
+        for rec in csv.DictReader(f, dialect=dialect):
+            omim = (rec.get("omim") or "").strip().removeprefix("OMIM:")
+            orpha = (rec.get("orphanet") or "").strip().removeprefix("Orphanet:")
+            if not (omim or orpha):
+                continue
+            if (rec.get("label") or "").strip():
+                yield (rec["label"].strip(), "label", omim, orpha, "wikidata")
+            for alias in (rec.get("aliases") or "").split("|"):
+                if alias.strip():
+                    yield (alias.strip(), "synonym", omim, orpha, "wikidata")
+
+def build_index(out_path: str = INDEX_PATH, *, ordo: Optional[str] = None,
+                omim_titles: Optional[str] = None, wikidata: Optional[str] = None) -> int:
+    """(Re)build the SQLite index from whichever dumps are given; returns the number of rows."""
+    tmp = out_path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    con = sqlite3.connect(tmp)
+    con.executescript("""
+        PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;
+        CREATE TABLE terms(label TEXT, norm TEXT, kind TEXT, omim TEXT, orpha TEXT, source TEXT);
+    """)
+    sources = [(ordo, iter_ordo_owl), (omim_titles, iter_omim_titles), (wikidata, iter_wikidata_table)]
+    n = 0
+    for path, reader in sources:
+        if not path:
+            continue
+        rows = ((lab, normalize(lab), kind, omim, orpha, src) for lab, kind, omim, orpha, src in reader(path))
+        cur = con.executemany("INSERT INTO terms VALUES (?,?,?,?,?,?)", rows)
+        n += cur.rowcount
+    con.executescript("""
+        CREATE INDEX terms_label ON terms(label COLLATE NOCASE);
+        CREATE INDEX terms_norm  ON terms(norm);
+        CREATE VIRTUAL TABLE terms_fts USING fts5(norm, content='terms', content_rowid='rowid');
+        INSERT INTO terms_fts(terms_fts) VALUES ('rebuild');
+    """)
+    con.commit()
+    con.execute("VACUUM")
+    con.close()
+    os.replace(tmp, out_path)
+    return n
+
+# ---- lookup ----
+_LOCAL = threading.local()
+
+def _connect(path: str) -> Optional[sqlite3.Connection]:
+    """Per-thread read-only connection (None when the index file does not exist)."""
+    cons = getattr(_LOCAL, "cons", None)
+    if cons is None:
+        cons = _LOCAL.cons = {}
+    if path not in cons:
+        if not os.path.exists(path):
+            return None
+        cons[path] = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    return cons[path]
+
+def _merge(rows: List[Tuple[str, str, str]]) -> Optional[Dict[str, str]]:
+    """
+    Rows (kind, omim, orpha) ordered best-first → the ids of the best entry that has any, None when
+    no row has one. Ids are never combined across entries: an id the best entry lacks, or one that
+    another matching row contradicts (ambiguous label), is left blank for the network.
+    """
+    best = next((r for r in rows if r[1] or r[2]), None)
+    if best is None:
+        return None
+    omim = best[1] if all(r[1] in ("", best[1]) for r in rows) else ""
+    orpha = best[2] if all(r[2] in ("", best[2]) for r in rows) else ""
+    return {"OMIM": f"OMIM:{omim}" if omim else "", "OrphaNet": f"Orphanet:{orpha}" if orpha else ""}
+
+_ORDER = "ORDER BY kind = 'label' DESC, source = 'ordo' DESC"
+
+def lookup(label: str, *, path: Optional[str] = None) -> Optional[Dict[str, str]]:
+    """
+    Exact (case-insensitive) label match, then normalized match.
+    Returns {"OMIM": "OMIM:…", "OrphaNet": "Orphanet:…"} or None on a miss / missing index.
+    """
+    con = _connect(path or INDEX_PATH)
+    if con is None or not (label or "").strip():
+        return None
+    q = label.strip()
+    rows = con.execute(f"SELECT kind, omim, orpha FROM terms WHERE label = ? COLLATE NOCASE {_ORDER}",
+                       (q,)).fetchall()
+    hit = _merge(rows)
+    if hit is None:
+        rows = con.execute(f"SELECT kind, omim, orpha FROM terms WHERE norm = ? {_ORDER}",
+                           (normalize(q),)).fetchall()
+        hit = _merge(rows)
+    return hit
+
+def search(label: str, *, limit: int = 10, path: Optional[str] = None) -> List[Dict[str, str]]:
+    """Fuzzy candidates via FTS5 (all words must match), best rank first. Not used automatically."""
+    con = _connect(path or INDEX_PATH)
+    words = normalize(label).split()
+    if con is None or not words:
+        return []
+    match = " ".join(f'"{w}"' for w in words)
+    rows = con.execute("""
+        SELECT t.label, t.omim, t.orpha, t.source FROM terms_fts f JOIN terms t ON t.rowid = f.rowid
+        WHERE terms_fts MATCH ? ORDER BY rank LIMIT ?""", (match, limit)).fetchall()
+    return [{"label": r[0], "OMIM": r[1], "OrphaNet": r[2], "source": r[3]} for r in rows]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m utils.ontology_index")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="build the SQLite index from dump files")
+    b.add_argument("--ordo")
+    b.add_argument("--omim")
+    b.add_argument("--wikidata")
+    b.add_argument("--out", default=INDEX_PATH)
+    lk = sub.add_parser("lookup", help="look up a disease label")
+    lk.add_argument("label")
+    lk.add_argument("--index", default=INDEX_PATH)
+    a = ap.parse_args(argv)
+    if a.cmd == "build":
+        n = build_index(a.out, ordo=a.ordo, omim_titles=a.omim, wikidata=a.wikidata)
+        print(f"✅  {n} terms → {a.out}")
+    else:
+        print(lookup(a.label, path=a.index) or search(a.label, path=a.index))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
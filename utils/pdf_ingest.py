@@ -0,0 +1,287 @@
+# utils/pdf_ingest.py  –  load a PDF once, hand the same parsed document to every stage
+# -------------------------------------------------------------------------------------------------
+# pdf_to_combined_markdown used to open the file three times (Docling + two extract_tables runs),
+# each with its own temp file and its own pdfplumber parse. IngestedPDF holds the bytes (or path)
+# and a single pdfplumber document; text, tables and page geometry are all derived from it lazily
+# and cached, and Docling reads the same bytes through a DocumentStream instead of a temp file.
+# Docling output and tables are also persisted in utils.conversion_cache, keyed by content hash.
+#
+# In-memory inputs are not copied for parsing: bytes are kept as-is (a BytesIO hands over its bytes
+# via getvalue(), which CPython shares rather than copies), bytearray / memoryview / mmap are held as
+# one memoryview. pdfplumber reads it through a seekable view stream, PyMuPDF opens the view
+# directly, Docling gets a DocumentStream (one heap copy for non-bytes buffers, none for bytes).
+# Anything that needs a real path gets materialize(): a single tmpfs (/dev/shm) copy shared by all
+# stages, removed on close().
+from __future__ import annotations
+import io
+import mmap
+import os
+import pathlib
+import tempfile
+from dataclasses import dataclass
+from io import BytesIO
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple, Union
+
+from utils import conversion_cache, converter_pool, instrument
+
+if TYPE_CHECKING:                 # pdfplumber / pandas load with the first parse, not on import
+    import pandas as pd
+    import pdfplumber
+    from utils.extract_pdf_tables import TableScanStats
+
+PDFInput = Union[str, pathlib.Path, bytes, bytearray, memoryview, BytesIO, mmap.mmap]
+
+_TMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+class _ViewStream(io.RawIOBase):
+    """Read-only, seekable file object over a buffer (BytesIO(view) would copy it)."""
+
+    def __init__(self, view: memoryview):
+        self._view, self._pos = view, 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = (0, self._pos, len(self._view))[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._pos + size)
+        chunk = bytes(self._view[self._pos:end])
+        self._pos = max(self._pos, end)
+        return chunk
+
+    def readinto(self, b) -> int:
+        chunk = self.read(len(b))
+        b[:len(chunk)] = chunk
+        return len(chunk)
+
+    def getbuffer(self) -> memoryview:
+        return self._view
+
+@dataclass(frozen=True)
+class PageInfo:
+    number: int          # 1-based
+    width: float
+    height: float
+
+class IngestedPDF:
+    """
+    A PDF loaded once and parsed once by pdfplumber. Use as a context manager, or call close().
+
+    Attributes are computed on first access and cached:
+    - pages     : page geometry (PageInfo per page)
+    - page_texts: text layer per page
+    - tables    : cleaned DataFrames (same output as extract_tables); iter_tables() streams them
+                  without keeping them
+    - docling_markdown(): Docling conversion of the same bytes/path
+    """
+
+    def __init__(self, pdf: PDFInput, *, name: str = "document.pdf"):
+        self.path: Optional[str] = None
+        self.data: Optional[Union[bytes, memoryview]] = None       # bytes as given, or a view – never a copy
+        self.name = name
+        if isinstance(pdf, (str, pathlib.Path)):
+            self.path, self.name = str(pdf), pathlib.Path(pdf).name
+        elif isinstance(pdf, bytes):
+            self.data = pdf
+        elif isinstance(pdf, BytesIO):
+            self.data = pdf.getvalue()                             # shared with the BytesIO, not copied
+        elif isinstance(pdf, (bytearray, memoryview, mmap.mmap)):
+            view = memoryview(pdf)
+            self.data = view if view.format == "B" and view.ndim == 1 else view.cast("B")
+        else:
+            raise TypeError(f"Unsupported PDF input type: {type(pdf)!r}")
+        self._tmp_path: Optional[str] = None
+        self._views: List[memoryview] = []                         # handed to readers; released on close()
+        self._plumber: Optional[pdfplumber.PDF] = None
+        self._pages: Optional[List[PageInfo]] = None
+        self._page_texts: Optional[List[str]] = None
+        self._tables: Optional[List[pd.DataFrame]] = None
+        self._md: Optional[str] = None
+        self._sha: Optional[str] = None
+
+    @property
+    def nbytes(self) -> int:
+        return os.path.getsize(self.path) if self.path is not None else len(self.data)
+
+    @property
+    def sha256(self) -> str:
+        """Content hash of the PDF bytes (key for utils.conversion_cache)."""
+        if self._sha is None:
+            self._sha = conversion_cache.content_key(self.path if self.path is not None else self.data)
+        return self._sha
+
+    # --- the one pdfplumber parse --------------------------------------------------------------
+    @property
+    def plumber(self) -> pdfplumber.PDF:
+        if self._plumber is None:
+            import pdfplumber
+            self._plumber = pdfplumber.open(self.path if self.path is not None else self.open_stream())
+        return self._plumber
+
+    @property
+    def pages(self) -> List[PageInfo]:
+        if self._pages is None:
+            self._pages = [PageInfo(i, float(p.width), float(p.height))
+                           for i, p in enumerate(self.plumber.pages, 1)]
+        return self._pages
+
+    @property
+    def page_texts(self) -> List[str]:
+        if self._page_texts is None:
+            texts = []
+            for p in self.plumber.pages:
+                texts.append(p.extract_text() or "")
+                p.close()                           # keep the text, drop the parsed layout
+            self._page_texts = texts
+        return self._page_texts
+
+    @property
+    def tables(self) -> List[pd.DataFrame]:
+        if self._tables is None:
+            for _ in self.iter_tables(keep=True):
+                pass
+        return self._tables
+
+    def iter_tables(self, stats: Optional[TableScanStats] = None, *,
+                    keep: bool = False) -> Iterator[Tuple[int, int, pd.DataFrame]]:
+        """
+        Stream (page_no, table_idx, DataFrame) from memory / the conversion cache when available,
+        otherwise page by page with each page's layout released as it goes. No DataFrame is held
+        on to (a fresh pass only feeds the cache's compressor); keep=True also leaves them in
+        .tables after a complete pass. `stats` counts scanned pages (left untouched when the
+        tables come from memory or the cache).
+        """
+        from utils.extract_pdf_tables import DEFAULT_SCREEN, iter_tables
+        if self._tables is not None:
+            for df in self._tables:
+                yield df.attrs.get("page", 0), df.attrs.get("table_index", 0), df
+            return
+        found: Optional[List[pd.DataFrame]] = [] if keep else None
+        cached = conversion_cache.iter_tables(self.sha256, DEFAULT_SCREEN)
+        if cached is not None:
+            for df in cached:
+                if found is not None:
+                    found.append(df)
+                yield df.attrs.get("page", 0), df.attrs.get("table_index", 0), df
+        else:
+            store = conversion_cache.TableStore(self.sha256, DEFAULT_SCREEN)
+            for item in iter_tables(self.plumber, screen=DEFAULT_SCREEN, stats=stats):
+                store.add(item[2])
+                if found is not None:
+                    found.append(item[2])
+                yield item
+            store.commit()
+        if found is not None:
+            self._tables = found
+
+    # --- Docling (own parser, same input) ------------------------------------------------------
+    def docling_source(self):
+        """Path or DocumentStream for Docling; in-memory inputs never touch the filesystem."""
+        if self.path is not None:
+            return self.path
+        from docling.datamodel.base_models import DocumentStream
+        # BytesIO(bytes) shares the bytes object until written to; a view is copied once into it
+        data = self.data if isinstance(self.data, bytes) else bytes(self.data)
+        return DocumentStream(name=self.name, stream=BytesIO(data))
+
+    def docling_markdown(self, config=None) -> str:
+        """
+        Docling Markdown, converted per utils.docling_pipeline.plan (OCR only on pages without a
+        usable text layer; `config` is a PipelineConfig, default from the environment).
+        Each segment is cached separately in utils.conversion_cache.
+        """
+        if self._md is None:
+            from utils import docling_pipeline
+            with instrument.stage("docling", bytes_in=self.nbytes) as span:
+                segments = docling_pipeline.plan(self, config)
+                parts, hits, pages = [], 0, 0
+                for seg in segments:
+                    md, converted, hit = self.docling_segment(seg)
+                    parts.append(md)
+                    pages += converted
+                    hits += hit
+                self._md = "\n\n".join(parts)
+                span.set(cache="hit" if hits == len(segments) else "miss", pages=pages,
+                         segments=len(segments), plan=",".join(s.describe() for s in segments),
+                         bytes_out=len(self._md))
+        return self._md
+
+    def docling_segment(self, seg) -> Tuple[str, int, bool]:
+        """
+        Markdown for one utils.docling_pipeline.Segment (page range + options), from the conversion
+        cache when possible; returns (markdown, pages converted, cache hit). Not memoized here.
+        """
+        md = conversion_cache.load_docling_markdown(self.sha256, seg.options, seg.pages)
+        if md is not None:
+            return md, 0, True
+        document = converter_pool.convert(self.docling_source(), options=seg.options, **seg.convert_kwargs()).document
+        conversion_cache.store_docling_document(self.sha256, document, seg.options, seg.pages)
+        return document.export_to_markdown(), len(getattr(document, "pages", None) or ()), False
+
+    # --- other readers of the same buffer -------------------------------------------------------
+    def open_stream(self) -> io.RawIOBase:
+        """A fresh seekable file object over the PDF (a view on the buffer, or the opened file)."""
+        if self.path is not None:
+            return open(self.path, "rb")
+        return _ViewStream(self._view())
+
+    def fitz_open(self):
+        """PyMuPDF document on the same path/buffer (caller closes it)."""
+        import fitz  # PyMuPDF
+        if self.path is not None:
+            return fitz.open(self.path)
+        return fitz.open(stream=self._view(), filetype="pdf")
+
+    def _view(self) -> memoryview:
+        view = memoryview(self.data)
+        self._views.append(view)
+        return view
+
+    def materialize(self) -> str:
+        """A filesystem path for tools that need one: the original file, or one tmpfs copy per document."""
+        if self.path is not None:
+            return self.path
+        if self._tmp_path is None:
+            fd, tmp = tempfile.mkstemp(suffix=".pdf", dir=_TMP_DIR)
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.data)
+            self._tmp_path = tmp
+        return self._tmp_path
+
+    # --- lifetime --------------------------------------------------------------------------------
+    def close(self) -> None:
+        if self._plumber is not None:
+            self._plumber.close()
+            self._plumber = None
+        if self._tmp_path is not None:
+            try:
+                os.remove(self._tmp_path)
+            except OSError:
+                pass
+            self._tmp_path = None
+        for view in self._views + ([self.data] if isinstance(self.data, memoryview) else []):
+            try:
+                view.release()                                     # lets a source bytearray resize again
+            except BufferError:
+                pass
+        self._views.clear()
+
+    def __enter__(self) -> "IngestedPDF":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def ingest(pdf: Union[PDFInput, IngestedPDF], *, name: str = "document.pdf") -> IngestedPDF:
+    """Wrap any supported input as an IngestedPDF (an existing IngestedPDF is returned as-is)."""
+    return pdf if isinstance(pdf, IngestedPDF) else IngestedPDF(pdf, name=name)
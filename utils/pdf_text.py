@@ -1,89 +1,219 @@
-# utils/pdf_text.py
+# utils/pdf_text.py  –  fast PyMuPDF text first, Docling only where the fast text is poor
+# -------------------------------------------------------------------------------------------------
+# pdf_to_markdown_text used to run Docling on every document and keep PyMuPDF as a last resort,
+# although page.get_text() is orders of magnitude cheaper and good enough for most case
+# descriptions. Now every page is extracted with PyMuPDF and scored (0–1) on layout signals:
+#   columns     multi-column text read across the columns (left/right blocks interleaved)
+#   tables      share of short, cell-like lines (tables flattened to one cell per line)
+#   hyphens     words broken at line ends ("pa-\ntient")
+#   text layer  scans / broken glyph maps score 0 (utils.text_layer); blank pages are ignored
+# Pages below `min_score` (PDF_TEXT_MIN_SCORE, default 0.6) are escalated to Docling as page
+# ranges (utils.docling_pipeline options, one conversion per range), or the whole document when
+# most pages are bad or the ranges would be too fragmented. The path taken – "pymupdf", "mixed"
+# or "docling" – is returned by extract_text() and recorded on the "pdf_text" span.
+# use_pymupdf_fallback=False keeps its old meaning, "Docling or fail": the whole document goes to
+# Docling, the fast text is never returned, and a Docling failure ends in the same RuntimeError
+# ("PDF→text produced empty output; last error: …") as before.
 from __future__ import annotations
-from io import BytesIO
-import pathlib, tempfile, contextlib
-from typing import Union, Optional
-
-from docling.document_converter import DocumentConverter
-
-PDFLike = Union[str, pathlib.Path, bytes, bytearray, memoryview, BytesIO]
-
-@contextlib.contextmanager
-def _as_pdf_path(pdf: PDFLike, suffix: str = ".pdf"):
-    if isinstance(pdf, (str, pathlib.Path)):
-        yield str(pdf)
-        return
-    if isinstance(pdf, BytesIO):
-        data = pdf.getvalue()
-    elif isinstance(pdf, (bytes, bytearray, memoryview)):
-        data = bytes(pdf)
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from utils import instrument
+from utils.pdf_ingest import IngestedPDF, PDFInput, ingest
+from utils.text_layer import DEFAULT_CONFIG as DEFAULT_TEXT_LAYER, TextLayerConfig, check_page
+
+PDFLike = PDFInput
+
+@dataclass(frozen=True)
+class TextQualityConfig:
+    min_score: float = float(os.getenv("PDF_TEXT_MIN_SCORE", 0.6))   # pages below → Docling
+    column_weight: float = 0.6
+    table_weight: float = 0.5
+    hyphen_weight: float = 0.2
+    interleave_full: float = 0.3          # excess column switches per block that counts as fully scrambled
+    table_density_full: float = 0.5       # share of cell-like lines that counts as fully tabular
+    hyphen_ratio_full: float = 0.1        # share of hyphen-broken lines that counts as fully broken
+    max_bad_share: float = 0.5            # more bad pages than this → whole document to Docling
+    max_ranges: int = 4                   # more escalated page ranges than this → whole document
+    text_layer: TextLayerConfig = DEFAULT_TEXT_LAYER
+
+DEFAULT_CONFIG = TextQualityConfig()
+
+@dataclass(frozen=True)
+class PageScore:
+    page: int                 # 1-based
+    score: float              # 0 (unusable) … 1 (clean)
+    verdict: str              # utils.text_layer verdict: "ok" | "blank" | "scan" | "glyphs"
+    interleave: float         # excess column switches per column block (0 = single column / in order)
+    table_density: float
+    hyphen_ratio: float
+
+    @property
+    def needs_ocr(self) -> bool:
+        return self.verdict in ("scan", "glyphs")
+
+@dataclass
+class TextResult:
+    text: str
+    path: str                                    # "pymupdf" | "mixed" | "docling"
+    pages: List[PageScore] = field(default_factory=list)
+    escalated: List[Tuple[int, int]] = field(default_factory=list)   # page ranges sent to Docling
+    error: Optional[str] = None                  # Docling failure that left the fast text in place
+
+    @property
+    def score(self) -> float:
+        """Mean score of the non-blank pages."""
+        scored = [p.score for p in self.pages if p.verdict != "blank"]
+        return sum(scored) / len(scored) if scored else 0.0
+
+# ---- signals ----
+_CELL_LINE = re.compile(r"^\S+(?:\s+\S+){0,2}$")          # up to three tokens
+_HYPHEN_BREAK = re.compile(r"[a-z]-\n[a-z]")
+
+def _interleave(blocks, width: float) -> float:
+    """Excess left/right column switches in reading order, per column block (full-width blocks split sections)."""
+    mid, margin = width / 2, width * 0.05
+    sections: List[List[str]] = [[]]
+    for x0, _, x1, _, text, *_rest in blocks:
+        if len(text.strip()) < 20:
+            continue
+        if x1 <= mid + margin:
+            sections[-1].append("L")
+        elif x0 >= mid - margin:
+            sections[-1].append("R")
+        else:
+            sections.append([])
+    cols = [s for s in sections if s]
+    n = sum(len(s) for s in cols)
+    if n < 4 or all(len(set(s)) == 1 for s in cols):
+        return 0.0
+    excess = sum(max(0, sum(a != b for a, b in zip(s, s[1:])) - 1) for s in cols)
+    return min(1.0, excess / (n - 1))
+
+def _line_stats(text: str) -> Tuple[float, float]:
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    if not lines:
+        return 0.0, 0.0
+    cells = sum(1 for ln in lines if len(ln) <= 25 and _CELL_LINE.match(ln))
+    return cells / len(lines), len(_HYPHEN_BREAK.findall(text)) / len(lines)
+
+def score_page(page, cfg: TextQualityConfig = DEFAULT_CONFIG) -> Tuple[str, PageScore]:
+    """(PyMuPDF text, PageScore) for one page; text and blocks come from one text page."""
+    tp = page.get_textpage()
+    text = page.get_text("text", textpage=tp)
+    blocks = [b for b in page.get_text("blocks", textpage=tp) if b[6] == 0]
+    quality = check_page(page, text, cfg.text_layer)
+    interleave = _interleave(blocks, page.rect.width)
+    tables, hyphens = _line_stats(text)
+    if quality.needs_ocr:
+        score = 0.0
     else:
-        raise TypeError(f"Unsupported PDF input type: {type(pdf)!r}")
-    with tempfile.NamedTemporaryFile(suffix=suffix, delete=True) as tmp:
-        tmp.write(data)
-        tmp.flush()
-        yield tmp.name
-
-def _try_docling_markdown_from_bytes(data: bytes) -> Optional[str]:
-    conv = DocumentConverter()
-    convert_bytes = getattr(conv, "convert_bytes", None)
-    if convert_bytes is None:
-        return None
-    doc = convert_bytes(data)  # type: ignore
-    return doc.document.export_to_markdown()
-
-def _try_docling_markdown_from_path(p: str) -> str:
-    conv = DocumentConverter()
-    doc = conv.convert(p)
-    return doc.document.export_to_markdown()
-
-def pdf_to_markdown_text(pdf: PDFLike, *, use_pymupdf_fallback: bool = True) -> str:
+        score = 1.0 - (cfg.column_weight * min(1.0, interleave / cfg.interleave_full)
+                       + cfg.table_weight * min(1.0, tables / cfg.table_density_full)
+                       + cfg.hyphen_weight * min(1.0, hyphens / cfg.hyphen_ratio_full))
+    return text, PageScore(quality.page, round(max(0.0, score), 3), quality.verdict,
+                           round(interleave, 3), round(tables, 3), round(hyphens, 3))
+
+def _ranges(pages: List[int]) -> List[Tuple[int, int]]:
+    out: List[List[int]] = []
+    for p in pages:
+        if out and p == out[-1][1] + 1:
+            out[-1][1] = p
+        else:
+            out.append([p, p])
+    return [(a, b) for a, b in out]
+
+# ---- extraction ----
+def _escalate_pages(doc: IngestedPDF, scores: List[PageScore], ranges: List[Tuple[int, int]]) -> List[str]:
+    """Docling Markdown for each page range (OCR when any page in it lacks a usable text layer)."""
+    from utils import docling_pipeline
+    cfg = docling_pipeline.config_from_env()
+    mode = cfg.table_mode_for(len(scores))
+    out = []
+    for first, last in ranges:
+        ocr = any(s.needs_ocr for s in scores[first - 1:last])
+        seg = docling_pipeline.Segment((first, last), ocr if cfg.adaptive else None, mode if cfg.adaptive else None)
+        out.append(doc.docling_segment(seg)[0])
+    return out
+
+def extract_text(pdf: PDFLike | IngestedPDF, config: Optional[TextQualityConfig] = None, *,
+                 use_pymupdf_fallback: bool = True) -> TextResult:
     """
-    Convert PDF to markdown using Docling; fallback to PyMuPDF plain text.
-    Raises RuntimeError if everything yields empty text.
+    PyMuPDF text, with badly scoring pages (or the whole document) replaced by Docling Markdown.
+    When Docling fails, the fast text is kept (error recorded). With use_pymupdf_fallback=False
+    the fast path is skipped: Docling converts the whole document, and a failure leaves empty
+    text with the error recorded.
     """
-    # 1) bytes route (if supported)
+    cfg = config or DEFAULT_CONFIG
+    doc = ingest(pdf)
     try:
-        if isinstance(pdf, BytesIO):
-            md = _try_docling_markdown_from_bytes(pdf.getvalue())
-            if isinstance(md, str) and md.strip():
-                return md
-        elif isinstance(pdf, (bytes, bytearray, memoryview)):
-            md = _try_docling_markdown_from_bytes(bytes(pdf))
-            if isinstance(md, str) and md.strip():
-                return md
-    except Exception as e:
-        # don't print; let caller handle
-        _last_err = e  # for possible reporting below
-
-    # 2) path route
-    try:
-        with _as_pdf_path(pdf) as p:
-            md = _try_docling_markdown_from_path(p)
-            if isinstance(md, str) and md.strip():
-                return md
-    except Exception as e:
-        _last_err = e
-
-    # 3) fallback: PyMuPDF plain text
-    if use_pymupdf_fallback:
-        try:
-            import fitz  # PyMuPDF
-            if isinstance(pdf, BytesIO):
-                doc = fitz.open(stream=pdf.getvalue(), filetype="pdf")
-            elif isinstance(pdf, (bytes, bytearray, memoryview)):
-                doc = fitz.open(stream=bytes(pdf), filetype="pdf")
+        with instrument.stage("pdf_text", bytes_in=doc.nbytes) as span:
+            if not use_pymupdf_fallback:
+                try:
+                    result = TextResult(doc.docling_markdown(), "docling")
+                except Exception as e:
+                    result = TextResult("", "docling", error=repr(e))
+                span.set(path=result.path, bytes_out=len(result.text))
+                return result
+            texts: List[str] = []
+            scores: List[PageScore] = []
+            try:
+                src = doc.fitz_open()
+                try:
+                    for page in src:
+                        text, score = score_page(page, cfg)
+                        texts.append(text)
+                        scores.append(score)
+                finally:
+                    src.close()
+            except Exception:
+                texts, scores = [], []                 # no fast text → the whole document goes to Docling
+            bad = [s.page for s in scores if s.score < cfg.min_score and s.verdict != "blank"]
+            ranges = _ranges(bad)
+            result = TextResult("\n\n".join(texts).strip(), "pymupdf", scores)
+            if not result.text or len(bad) > cfg.max_bad_share * len(scores) or len(ranges) > cfg.max_ranges:
+                ranges = [(1, len(scores))] if scores else []
+                escalate = "docling"
             else:
-                with _as_pdf_path(pdf) as p:
-                    doc = fitz.open(p)
-            parts = [page.get_text() for page in doc]
+                escalate = "mixed" if ranges else None
+            try:
+                if escalate == "docling":
+                    md = doc.docling_markdown()
+                    if md.strip() or not result.text:
+                        result = TextResult(md, "docling", scores, ranges)
+                    else:
+                        result.error = "Docling produced empty output"
+                elif escalate == "mixed":
+                    parts = dict(zip(ranges, _escalate_pages(doc, scores, ranges)))
+                    chunks, page = [], 1
+                    for first, last in ranges:
+                        chunks += texts[page - 1:first - 1] + [parts[(first, last)]]
+                        page = last + 1
+                    chunks += texts[page - 1:]
+                    result = TextResult("\n\n".join(chunks).strip(), "mixed", scores, ranges)
+            except Exception as e:
+                result.error = repr(e)
+            span.set(path=result.path, score=round(result.score, 3), pages=len(scores),
+                     escalated=",".join(f"{a}-{b}" for a, b in result.escalated), bytes_out=len(result.text))
+        return result
+    finally:
+        if doc is not pdf:
             doc.close()
-            text = "\n\n".join(parts).strip()
-            if text:
-                return text
-        except Exception as e:
-            _last_err = e
-
-    # If we got here, everything produced empty
-    raise RuntimeError(f"PDF→text produced empty output"
-                       f"{'; last error: ' + repr(_last_err) if '_last_err' in locals() else ''}")
\ No newline at end of file
+
+def pdf_to_markdown_text(pdf: PDFLike | IngestedPDF, *, use_pymupdf_fallback: bool = True,
+                         min_score: Optional[float] = None) -> str:
+    """
+    Text of a PDF: PyMuPDF first, Docling for the pages (or documents) whose fast text scores
+    below `min_score` (see extract_text for the path taken); use_pymupdf_fallback=False → Docling
+    only, as before. Docling results are served from and stored in utils.conversion_cache;
+    in-memory inputs are read in place (utils.pdf_ingest).
+    Raises RuntimeError (with the last Docling error, if any) if everything yields empty text.
+    """
+    cfg = DEFAULT_CONFIG if min_score is None else TextQualityConfig(min_score=min_score)
+    result = extract_text(pdf, cfg, use_pymupdf_fallback=use_pymupdf_fallback)
+    if not result.text.strip():
+        raise RuntimeError(f"PDF→text produced empty output"
+                           f"{'; last error: ' + result.error if result.error else ''}")
+    return result.text
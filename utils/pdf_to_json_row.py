@@ -93,27 +93,31 @@
 
 # pdf_to_json_row_cases.py  –  Docling text + full tables → JSON row (case-centric)
 # -------------------------------------------------------------------------------------------------
+# Importing this module only defines the schema and prompt; pandas, requests, openai, dotenv and
+# Docling are imported by the functions that use them (see benchmarks/import_budget.py).
 from __future__ import annotations
-import json, pathlib, textwrap, re
-from typing import List, Optional, Dict
-import pandas as pd
-import requests
-from dotenv import load_dotenv
-from openai import OpenAI
-from docling.document_converter import DocumentConverter           # your patched Docling
-from utils.extract_pdf_tables import extract_tables                # your custom utility
-import re
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from typing import Dict, Optional
-from typing import Union
-from io import BytesIO
-import pathlib
-import tempfile
-import contextlib
+import json
 import textwrap
-
-load_dotenv()  # expects OPENAI_API_KEY
+from typing import TYPE_CHECKING, List, Optional, Dict
+from utils.pdf_ingest import IngestedPDF, PDFInput, ingest         # single-pass PDF loading
+from utils.case_filter import CaseFilterConfig, classify_case_report  # cheap case-report check
+from utils import llm_cache                                          # persistent LLM results
+from utils import instrument                                         # per-stage timings (no-op by default)
+from utils.md_compact import CompactConfig, compact_markdown          # token-budgeted prompt text
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from openai import OpenAI
+
+_ENV_LOADED = False
+
+def load_env() -> None:
+    """Read .env once (expects OPENAI_API_KEY); called before the first client is built."""
+    global _ENV_LOADED
+    if not _ENV_LOADED:
+        _ENV_LOADED = True
+        from dotenv import load_dotenv
+        load_dotenv()
 
 # ────────────────────────────────────────────────────────────────────────────────────────────────
 # 1) Target schema for the new task
@@ -131,124 +135,79 @@ DESCRIPTORS = {
 }
 COLUMNS = list(DESCRIPTORS.keys())
 
-# Types your function will accept
-PDFInput = Union[str, pathlib.Path, bytes, BytesIO]
-
-@contextlib.contextmanager
-def _as_pdf_path(pdf: PDFInput, suffix: str = ".pdf"):
-    """
-    Context manager that yields a filesystem path to the PDF.
-    - If `pdf` is already a path-like, yields it directly.
-    - If `pdf` is bytes or BytesIO, writes to a NamedTemporaryFile and yields that path.
-    File is cleaned up on exit.
-    """
-    if isinstance(pdf, (str, pathlib.Path)):
-        yield str(pdf)
-        return
-
-    # bytes or BytesIO -> temp file
-    if isinstance(pdf, BytesIO):
-        data = pdf.getvalue()
-    elif isinstance(pdf, (bytes, bytearray, memoryview)):
-        data = bytes(pdf)
-    else:
-        raise TypeError(f"Unsupported PDF input type: {type(pdf)!r}")
-
-    with tempfile.NamedTemporaryFile(suffix=suffix, delete=True) as tmp:
-        tmp.write(data)
-        tmp.flush()
-        yield tmp.name  # path-like expected by libs
-        # tmp is auto-deleted on context exit
-
 # ────────────────────────────────────────────────────────────────────────────────────────────────
 # 2) PDF → (markdown_text with appended full-table block)  [unchanged idea]
-def pdf_to_combined_markdown(pdf: PDFInput) -> str:
+_TABLES_NOTICE = textwrap.dedent("""
+    ---
+    **NOTE to the language-model:**  
+    Some tables in the text above may be incomplete; the full versions
+    extracted directly from the PDF are reproduced in a more complete manner below.
+    ---
+""").strip()
+
+def pdf_to_combined_markdown(pdf: PDFInput | IngestedPDF,
+                             *, prefilter: bool | CaseFilterConfig = True) -> str:
     """
     Convert a PDF (path or in-memory bytes/BytesIO) to Markdown, and append
     full table extracts below the main text.
 
+    The PDF is loaded and parsed once (see utils.pdf_ingest); Docling and the
+    table extraction both read from that single ingested document.
+
     Parameters
     ----------
-    pdf : str | pathlib.Path | bytes | io.BytesIO
-        Path to a PDF, or the PDF file bytes/stream.
+    pdf : str | pathlib.Path | bytes | io.BytesIO | IngestedPDF
+        Path to a PDF, the PDF file bytes/stream, or an already-ingested document.
+    prefilter : bool | CaseFilterConfig
+        Run the metadata/text-layer case-report check (utils.case_filter) before
+        conversion; pass a CaseFilterConfig to choose the signals, False to skip it.
 
     Returns
     -------
     str
         Combined Markdown with a notice + tables rendered as Markdown.
     """
-    # --- Main text -----------------------------------------------------------
-
-    try:
-        # Prefer a bytes-based conversion if available
-        if isinstance(pdf, (bytes, bytearray, memoryview)):
-            conv = DocumentConverter()
-            md_main = conv.convert_bytes(bytes(pdf)).document.export_to_markdown()  # if your lib supports it
-        elif isinstance(pdf, BytesIO):
-            conv = DocumentConverter()
-            md_main = conv.convert_bytes(pdf.getvalue()).document.export_to_markdown()
-        else:
-            # Fall back to path mode
-            with _as_pdf_path(pdf) as pdf_path:
-                conv = DocumentConverter()
-                md_main = conv.convert(str(pdf_path)).document.export_to_markdown()
-    except AttributeError:
-        # Library doesn't support bytes -> always go through a temp path
-        with _as_pdf_path(pdf) as pdf_path:
-            conv = DocumentConverter()
-            md_main = conv.convert(str(pdf_path)).document.export_to_markdown()
-
-    # --- Tables --------------------------------------------------------------
-    # Give extract_tables the same flexibility by always handing it a path via the helper.
-    with _as_pdf_path(pdf) as pdf_path_for_tables:
-        tables: List[pd.DataFrame] = extract_tables(pdf_path_for_tables)
-
-    md_tables: List[str] = []
-    for i, t in enumerate(tables, 1):
-        md_tables.append(f"\n\n**Full Table {i}**\n\n" + t.to_markdown(index=False))
-
-    notice = textwrap.dedent("""
-        ---
-        **NOTE to the language-model:**  
-        Some tables in the text above may be incomplete; the full versions
-        extracted directly from the PDF are reproduced in a more complete manner below.
-        ---
-    """).strip()
-
-        # --- Detect if this is a case report -----------------------------
-    is_case_report = False
-    if md_main:
-        lowered = md_main.lower()
-        if "case report" in lowered:
-            is_case_report = True
-
-    # --- Tables ------------------------------------------------------
-    with _as_pdf_path(pdf) as pdf_path_for_tables:
-        tables: List[pd.DataFrame] = extract_tables(pdf_path_for_tables)
-
-    md_tables: List[str] = []
-    for i, t in enumerate(tables, 1):
-        md_tables.append(f"\n\n**Full Table {i}**\n\n" + t.to_markdown(index=False))
-
-    notice = textwrap.dedent("""
-        ---
-        **NOTE to the language-model:**  
-        Some tables in the text above may be incomplete; the full versions
-        extracted directly from the PDF are reproduced in a more complete manner below.
-        ---
-    """).strip()
-
-    result = md_main + "\n\n" + notice + ("\n".join(md_tables) if md_tables else "")
-
-    if is_case_report:
+    with instrument.stage("convert") as span:
+        doc = ingest(pdf)
+        try:
+            span.set(bytes_in=doc.nbytes)
+            # --- Cheap pre-filter: reject non-case-reports before any Docling work ---
+            if prefilter:
+                cfg = prefilter if isinstance(prefilter, CaseFilterConfig) else None
+                with instrument.stage("case_filter") as s:
+                    verdict = classify_case_report(doc, cfg)
+                    s.set(signal=verdict.signal)
+                if not verdict:
+                    raise ValueError("The document does not appear to be a case report.")
+
+            # --- Main text (shared, pre-warmed Docling converter) -------------------
+            md_main = doc.docling_markdown()
+
+            # --- Tables (same pdfplumber parse), rendered as each page is done ---------
+            from utils.extract_pdf_tables import TableScanStats
+            md_tables: List[str] = []
+            stats = TableScanStats()
+            with instrument.stage("tables") as s:
+                for i, (_, _, t) in enumerate(doc.iter_tables(stats), 1):
+                    md_tables.append(f"\n\n**Full Table {i}**\n\n" + t.to_markdown(index=False))
+                s.set(tables=len(md_tables), pages=stats.pages_total, pages_scanned=stats.pages_scanned,
+                      cache="miss" if stats.pages_total else "hit")
+        finally:
+            if doc is not pdf:
+                doc.close()
+
+        # --- Detect if this is a case report -----------------------------------------
+        is_case_report = bool(md_main) and "case report" in md_main.lower()
+
+        result = md_main + "\n\n" + _TABLES_NOTICE + ("\n".join(md_tables) if md_tables else "")
+
+        if not is_case_report:
+            raise ValueError("The document does not appear to be a case report.")
         result = "**[This document is a CASE REPORT]**\n\n" + result
-    else: 
-        raise ValueError("The document does not appear to be a case report.")
+        span.set(bytes_out=len(result), tables=len(md_tables))
 
     return result
 
-    # return md_main + "\n\n" + notice + ("\n".join(md_tables) if md_tables else "")
-
 # ────────────────────────────────────────────────────────────────────────────────────────────────
 # 3) LLM prompt → draft record (JSON)
 PROMPT_INSTRUCTIONS = textwrap.dedent("""
@@ -279,29 +238,28 @@ PROMPT_INSTRUCTIONS = textwrap.dedent("""
     Return ONLY valid JSON with the following keys and nothing else:
 """).strip()
 
-def combined_md_to_record(md_text: str, *, model="gpt-4o-mini") -> Dict[str, str]:
+def build_record_messages(md_text: str) -> List[dict]:
+    """Chat messages for one document (shared by the sync and async extractors)."""
     # skeleton with ellipses so we force all keys to appear
     skeleton = {k: "…" for k in COLUMNS}
     schema   = json.dumps(skeleton, indent=2)
 
     descriptor_block = "\n".join(f"**{k}** – {v}" for k, v in DESCRIPTORS.items())
 
-    client = OpenAI()
-    r = client.chat.completions.create(
-        model=model,
-        messages=[{
-            "role": "user",
-            "content": [
-                { "type": "text",
-                  "text": (
-                    f"{PROMPT_INSTRUCTIONS}\n\n{schema}\n\nField guidance:\n{descriptor_block}"
-                  )},
-                { "type": "text", "text": md_text }
-            ]
-        }],
-        response_format={"type": "json_object"},
-    )
-    data = json.loads(r.choices[0].message.content)
+    return [{
+        "role": "user",
+        "content": [
+            { "type": "text",
+              "text": (
+                f"{PROMPT_INSTRUCTIONS}\n\n{schema}\n\nField guidance:\n{descriptor_block}"
+              )},
+            { "type": "text", "text": md_text }
+        ]
+    }]
+
+def parse_record(content: str) -> Dict[str, str]:
+    """Model JSON → record with exactly COLUMNS (missing keys and leftover ellipses become "")."""
+    data = json.loads(content)
 
     # Normalize keys and strip ellipses if any remain
     out = {k: (data.get(k, "") or "").strip() for k in COLUMNS}
@@ -310,181 +268,65 @@ def combined_md_to_record(md_text: str, *, model="gpt-4o-mini") -> Dict[str, str
             out[k] = ""
     return out
 
-# ────────────────────────────────────────────────────────────────────────────────────────────────
-# 4) Lightweight web resolvers (no keys required)
-#    - PubMed PMID from title (NCBI E-utilities)
-#    - OMIM & Orphanet from disease name (Wikidata SPARQL; fallback OLS for Orphanet)
-
-def _http_get_json(url: str, params: dict, timeout: float = 12.0) -> Optional[dict]:
-    try:
-        r = requests.get(url, params=params, timeout=timeout)
-        r.raise_for_status()
-        return r.json()
-    except Exception:
-        return None
+_CLIENT: Optional[OpenAI] = None
 
-def resolve_pubmed_id_from_title(title: str) -> str:
-    if not title:
-        return ""
-    # Exact-title search bias
-    base = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-    params = {
-        "db": "pubmed",
-        "retmode": "json",
-        "retmax": "1",
-        "term": f"{title}[Title]"
-    }
-    js = _http_get_json(base, params)
-    try:
-        ids = js["esearchresult"]["idlist"]
-        return ids[0] if ids else ""
-    except Exception:
-        return ""
-
-def _clean_label(label: str) -> str:
-    return re.sub(r"\s+", " ", (label or "")).strip()
-
-def _requests_session(user_agent: str = "pdf-to-json-row/1.0 (you@example.com)") -> requests.Session:
-    s = requests.Session()
-    retries = Retry(
-        total=1, connect=3, read=5, backoff_factor=0.8,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["GET", "POST"]
-    )
-    s.mount("https://", HTTPAdapter(max_retries=retries))
-    s.headers.update({"User-Agent": user_agent})
-    return s
-
-def _mediawiki_exact_qid(s: requests.Session, label_en: str) -> Optional[str]:
-    r = s.get(
-        "https://www.wikidata.org/w/api.php",
-        params={
-            "action": "wbsearchentities",
-            "format": "json",
-            "language": "en",
-            "search": label_en,
-            "limit": 5,
-            "strictlanguage": 1
-        },
-        timeout=(5, 30)
-    )
-    r.raise_for_status()
-    hits = r.json().get("search", [])
-    target = _normalize_for_match(label_en)
-
-    # 1) exact label match ignoring case
-    for h in hits:
-        if _normalize_for_match(h.get("label", "")) == target:
-            return h.get("id")
-
-    # 2) otherwise, take the top hit (optional but practical)
-    return hits[0]["id"] if hits else None
-
-def _claims_for_qid(s: requests.Session, qid: str) -> Dict[str, str]:
-    r = s.get(
-        "https://www.wikidata.org/w/api.php",
-        params={
-            "action": "wbgetentities",
-            "format": "json",
-            "ids": qid,
-            "props": "claims"
-        },
-        timeout=(5, 30)
-    )
-    r.raise_for_status()
-    ent = r.json()["entities"][qid].get("claims", {})
-    def first(prop):
-        try:
-            return ent[prop][0]["mainsnak"]["datavalue"]["value"]
-        except Exception:
-            return ""
-    omim = str(first("P492") or "")
-    orpha = str(first("P1550") or "")
-    return {"OMIM": f"OMIM:{omim}" if omim else "", "OrphaNet": f"Orphanet:{orpha}" if orpha else ""}
-
-def _normalize_for_match(s: str) -> str:
-    s = re.sub(r"\s+", " ", (s or "").strip())
-    return s.casefold()  # better than lower() for Unicode
+def _openai_client() -> OpenAI:
+    # one client (and HTTP connection pool) per process instead of one per document
+    global _CLIENT
+    if _CLIENT is None:
+        from openai import OpenAI
+        load_env()
+        _CLIENT = OpenAI()
+    return _CLIENT
 
-def resolve_omim_and_orphanet_from_disease(label: str) -> Dict[str, str]:
+def combined_md_to_record(md_text: str, *, model="gpt-4o-mini",
+                          use_cache: bool = True, refresh: bool = False) -> Dict[str, str]:
     """
-    Returns {"OMIM": "OMIM:123456", "OrphaNet": "Orphanet:123"} (or blanks if not found).
-    Strategy: MediaWiki exact label -> SPARQL fallback -> EBI OLS Orphanet fallback.
+    Ask the model to fill the schema for one document.
+    Results are cached by (model, prompt hash, markdown hash) in utils.llm_cache;
+    refresh=True forces a new call (and overwrites the entry), use_cache=False bypasses it.
     """
-    q = _clean_label(label)
-    if not q:
-        return {"OMIM": "", "OrphaNet": ""}
-
-    s = _requests_session()
-
-    # 1) MediaWiki exact label → QID → claims
-    try:
-        qid = _mediawiki_exact_qid(s, q)
-        if qid:
-            ids = _claims_for_qid(s, qid)
-            if ids["OMIM"] or ids["OrphaNet"]:
-                return ids
-    except Exception as e:
-        print(f"⚠️ MediaWiki lookup failed for '{q}': {e}")
-
-    # 2) SPARQL fallback (exact English label)
-    omim_id, orpha_id = "", ""
-    q_escaped = q.replace('"', '\\"')
-    sparql = f"""
-    SELECT ?omim ?orpha WHERE {{
-    ?d rdfs:label ?label .
-    FILTER(LANG(?label) = "en")
-    FILTER(LCASE(STR(?label)) = LCASE("{q_escaped}"))
-    OPTIONAL {{ ?d wdt:P492 ?omim. }}
-    OPTIONAL {{ ?d wdt:P1550 ?orpha. }}
-    }}
-    LIMIT 1
-    """
-    try:
-        resp = s.post(
-            "https://query.wikidata.org/sparql",
-            data={"query": sparql},
-            headers={"Accept": "application/sparql-results+json"},
-            timeout=(5, 60)
+    messages = build_record_messages(md_text)
+    instructions = messages[0]["content"][0]["text"]
+    with instrument.stage("llm", model=model, bytes_in=len(md_text)) as span:
+        if use_cache and not refresh:
+            hit = llm_cache.get(model, instructions, md_text)
+            if hit is not None:
+                span.set(cache="hit")
+                return dict(hit["record"])
+
+        r = _openai_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            response_format={"type": "json_object"},
         )
-        resp.raise_for_status()
-        rows = resp.json()["results"]["bindings"]
-        if rows:
-            r0 = rows[0]
-            omim_id = (r0.get("omim", {}) or {}).get("value", "") or ""
-            orpha_id = (r0.get("orpha", {}) or {}).get("value", "") or ""
-    except Exception as e:
-        print(f"⚠️ SPARQL failed for '{q}': {e}")
-
-    # 3) Orphanet fallback via EBI OLS if missing
-    if not orpha_id:
-        try:
-            ols = s.get(
-                "https://www.ebi.ac.uk/ols4/api/search",
-                params={"q": q, "ontology": "ordo", "queryFields": "label", "exact": "true"},
-                timeout=(5, 30)
-            )
-            if ols.ok:
-                js = ols.json()
-                if js.get("response", {}).get("numFound", 0) > 0:
-                    doc = js["response"]["docs"][0]
-                    curie = next((x for x in doc.get("obo_id", []) if x.startswith("Orphanet_")), "")
-                    if curie:
-                        orpha_id = curie.split("_", 1)[-1]
-        except Exception:
-            pass
-
-    # Normalize prefixes and return (single return point, consistent type)
-    omim = f"OMIM:{omim_id}" if omim_id else ""
-    orpha = f"Orphanet:{orpha_id}" if orpha_id else ""
-    return {"OMIM": omim, "OrphaNet": orpha}
+        usage = llm_cache.usage_dict(r.usage)
+        span.set(cache="miss" if use_cache else "off", bytes_out=len(r.choices[0].message.content or ""),
+                 prompt_tokens=usage.get("prompt_tokens", 0), completion_tokens=usage.get("completion_tokens", 0))
+        record = parse_record(r.choices[0].message.content)
+        if use_cache:
+            llm_cache.put(model, instructions, md_text, record, usage)
+    return record
 
 # ────────────────────────────────────────────────────────────────────────────────────────────────
-# 5) End-to-end convenience
-def pdf_to_dataframe_cases(pdf_path: str | pathlib.Path, *, model="gpt-4.1") -> pd.DataFrame:
-    md   = pdf_to_combined_markdown(pdf_path)
-    row  = combined_md_to_record(md, model=model)
+# 4) ID resolvers (no keys required) – utils.fast_resolvers: the offline ontology index
+#    (utils.ontology_index) first, then PubMed E-utilities / Wikidata API / EBI OLS over one pooled
+#    session, with results in a two-tier cache shared by the batch workers (utils.resolver_cache).
+#    Endpoints can be overridden with EUTILS_URL / WIKIDATA_API / OLS_URL to use a local stand-in.
+def resolve_pubmed_id_from_title(title: str) -> str:
+    """PMID for an exact paper title ("" when not found)."""
+    from utils import fast_resolvers
+    return fast_resolvers.resolve_pubmed_id_from_title(title)
+
+def resolve_omim_and_orphanet_from_disease(label: str) -> Dict[str, str]:
+    """Returns {"OMIM": "OMIM:123456", "OrphaNet": "Orphanet:123"} (or blanks if not found)."""
+    from utils import fast_resolvers
+    return fast_resolvers.resolve_omim_and_orphanet_from_disease(label)
 
+# ────────────────────────────────────────────────────────────────────────────────────────────────
+# 5) End-to-end convenience
+def resolve_record_ids(row: Dict[str, str]) -> Dict[str, str]:
+    """Fill PubMed_ID / OMIM / OrphaNet in `row` (utils.fast_resolvers); returns the row in COLUMNS order."""
     # Derive PMID from title (we store title separately for lookup, then put back)
     title = row.get("Reference_title", "") or row.get("Reference", "")
     pmid  = resolve_pubmed_id_from_title(title)
@@ -497,8 +339,23 @@ def pdf_to_dataframe_cases(pdf_path: str | pathlib.Path, *, model="gpt-4.1") ->
     row["OMIM"]     = ids.get("OMIM", "")     or row.get("OMIM", "")
     row["OrphaNet"] = ids.get("OrphaNet", "") or row.get("OrphaNet", "")
 
-    # Final column order and single-row DataFrame
-    return pd.DataFrame([ {k: row.get(k, "") for k in COLUMNS} ], columns=COLUMNS)
+    return {k: row.get(k, "") for k in COLUMNS}
+
+def pdf_to_record_cases(pdf_path: PDFInput, *, model="gpt-4.1",
+                        compact: bool | CompactConfig = True) -> Dict[str, str]:
+    """One PDF → one record (plain dict in COLUMNS order); see utils.record_writer for output."""
+    md   = pdf_to_combined_markdown(pdf_path)
+    if compact:
+        # drop references/boilerplate/duplicate tables and fit the token budget (utils.md_compact)
+        md = compact_markdown(md, compact if isinstance(compact, CompactConfig) else None).text
+    row  = combined_md_to_record(md, model=model)
+    return resolve_record_ids(row)
+
+def pdf_to_dataframe_cases(pdf_path: PDFInput, *, model="gpt-4.1",
+                           compact: bool | CompactConfig = True) -> pd.DataFrame:
+    """Single-row DataFrame wrapper around pdf_to_record_cases (kept for the notebooks)."""
+    import pandas as pd
+    return pd.DataFrame([pdf_to_record_cases(pdf_path, model=model, compact=compact)], columns=COLUMNS)
 
 # ────────────────────────────────────────────────────────────────────────────────────────────────
 # 6) Tiny CLI helper (optional)
@@ -0,0 +1,173 @@
+# utils/record_writer.py  –  append extracted records as they finish (JSONL + Parquet)
+# -------------------------------------------------------------------------------------------------
+# Records are plain dicts with a fixed, all-string schema: pdf_to_json_row.COLUMNS + Source_file.
+#   <stem>.jsonl        one line per record, flushed immediately (crash-safe, greppable)
+#   <stem>.parquet/     a directory of part files, one row group each, written atomically every
+#                       `row_group_size` records; read it back with pd.read_parquet(dir)
+# Opening a writer on an existing output first copies any JSONL tail that never reached Parquet
+# (e.g. after a crash) into a new part, so both stores always hold the same rows.
+# CSV / XLSX / one combined Word document are optional final exports from the columnar store
+# (export()).
+from __future__ import annotations
+import json
+import os
+import pathlib
+import time
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None            # no pyarrow → JSONL only
+
+def default_columns() -> List[str]:
+    from utils.pdf_to_json_row import COLUMNS
+    return list(COLUMNS) + ["Source_file"]
+
+def _normalize(record: Dict[str, object], columns: Sequence[str]) -> Dict[str, str]:
+    return {c: "" if record.get(c) is None else str(record.get(c)) for c in columns}
+
+class RecordWriter:
+    """`with RecordWriter(out_dir) as w: w.write(record)` – appends; never rewrites earlier output."""
+
+    def __init__(self, out_dir: str | pathlib.Path, *, stem: str = "all_summaries",
+                 formats: Iterable[str] = ("jsonl", "parquet"), columns: Optional[Sequence[str]] = None,
+                 row_group_size: int = 1000):
+        self.out = pathlib.Path(out_dir)
+        self.out.mkdir(parents=True, exist_ok=True)
+        self.columns = list(columns or default_columns())
+        self.formats = {f for f in formats if f != "parquet" or pq is not None}
+        self.row_group_size = row_group_size
+        self.jsonl_path = self.out / f"{stem}.jsonl"
+        self.parquet_dir = self.out / f"{stem}.parquet"
+        self._schema = pa.schema([(c, pa.string()) for c in self.columns]) if pq is not None else None
+        self._run = f"{time.time_ns():020d}-{uuid.uuid4().hex[:6]}"   # parts sort in write order
+        self._part = 0
+        self._buffer: List[Dict[str, str]] = []
+        self._jsonl = None
+        self.written = 0
+        if self.jsonl_path.exists():
+            _drop_torn_line(self.jsonl_path)
+        if "jsonl" in self.formats and "parquet" in self.formats:
+            self._recover()
+        if "jsonl" in self.formats:
+            self._jsonl = open(self.jsonl_path, "a", encoding="utf-8")
+
+    # ---- writing ----
+    def write(self, record: Dict[str, object]) -> None:
+        row = _normalize(record, self.columns)
+        if self._jsonl is not None:
+            self._jsonl.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self._jsonl.flush()
+        if "parquet" in self.formats:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.row_group_size:
+                self.flush()
+        self.written += 1
+
+    def flush(self) -> None:
+        """Write buffered rows as one Parquet part (tmp file + rename, so readers never see half a file)."""
+        if not self._buffer or "parquet" not in self.formats:
+            return
+        self.parquet_dir.mkdir(exist_ok=True)
+        table = pa.Table.from_pylist(self._buffer, schema=self._schema)
+        path = self.parquet_dir / f"part-{self._run}-{self._part:05d}.parquet"
+        tmp = path.with_suffix(".tmp")
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, path)
+        self._part += 1
+        self._buffer.clear()
+
+    def close(self) -> None:
+        self.flush()
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+
+    def __enter__(self) -> "RecordWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---- crash recovery ----
+    def _recover(self) -> None:
+        if not self.jsonl_path.exists():
+            return
+        in_parquet = _parquet_rows(self.parquet_dir)
+        tail = list(_iter_jsonl(self.jsonl_path, skip=in_parquet))
+        for row in tail:
+            self._buffer.append(_normalize(row, self.columns))
+        self.flush()
+
+def _drop_torn_line(path: pathlib.Path) -> None:
+    """Cut a partially written last line (crash mid-write) so the next append starts cleanly."""
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        pos = size
+        while pos > 0:
+            step = min(1 << 16, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            nl = chunk.rfind(b"\n")
+            if nl >= 0:
+                f.truncate(pos - step + nl + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+def _parquet_parts(parquet_dir: pathlib.Path) -> List[pathlib.Path]:
+    return sorted(parquet_dir.glob("part-*.parquet")) if parquet_dir.is_dir() else []
+
+def _parquet_rows(parquet_dir: pathlib.Path) -> int:
+    return sum(pq.ParquetFile(p).metadata.num_rows for p in _parquet_parts(parquet_dir))
+
+def _iter_jsonl(path: pathlib.Path, skip: int = 0) -> Iterator[Dict[str, str]]:
+    with open(path, encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            if i >= skip and line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:      # torn last line from a crash
+                    return
+
+def read_records(out_dir: str | pathlib.Path, *, stem: str = "all_summaries",
+                 columns: Optional[Sequence[str]] = None):
+    """All records written so far as a DataFrame (Parquet when present, else JSONL)."""
+    import pandas as pd
+    out = pathlib.Path(out_dir)
+    cols = list(columns or default_columns())
+    parts = _parquet_parts(out / f"{stem}.parquet") if pq is not None else []
+    if parts:
+        return pq.ParquetDataset([str(p) for p in parts]).read(columns=cols).to_pandas()
+    path = out / f"{stem}.jsonl"
+    rows = [_normalize(r, cols) for r in _iter_jsonl(path)] if path.exists() else []
+    return pd.DataFrame(rows, columns=cols)
+
+def export(out_dir: str | pathlib.Path, formats: Iterable[str] = ("csv", "xlsx"), *,
+           stem: str = "all_summaries") -> List[pathlib.Path]:
+    """Write <stem>.csv / .xlsx / .docx from the columnar store; returns the files written."""
+    out = pathlib.Path(out_dir)
+    df = read_records(out, stem=stem)
+    written = []
+    for fmt in formats:
+        path = out / f"{stem}.{fmt}"
+        if fmt == "csv":
+            df.to_csv(path, index=False)
+        elif fmt == "xlsx":
+            df.to_excel(path, index=False)
+        elif fmt == "docx":
+            from utils.landscape_word_doc import records_to_combined_doc
+            records_to_combined_doc(df.to_dict("records"), path, columns=list(df.columns))
+        else:
+            raise ValueError(f"unknown export format: {fmt!r}")
+        written.append(path)
+    return written
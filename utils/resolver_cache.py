@@ -0,0 +1,135 @@
+# utils/resolver_cache.py  –  two-tier cache for the web resolvers
+# -------------------------------------------------------------------------------------------------
+# Tier 1: bounded in-process LRU (no I/O, per process).
+# Tier 2: diskcache on SQLite, safe to share between the batch runner's worker processes.
+# Negative results ("" / all-blank id dicts) get their own, shorter TTL so a transient miss or a
+# newly indexed paper is retried soon, while hits keep the long TTL.
+# Counters per key prefix ("pmid", "ids", …): memory/disk hits, misses, stale, evictions, sets,
+# plus time spent on the network per resolver — see stats() / stats_text() (Prometheus format).
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional
+
+POSITIVE_TTL = int(os.getenv("RESOLVER_CACHE_TTL", 60*60*24*30))            # 30 days
+NEGATIVE_TTL = int(os.getenv("RESOLVER_CACHE_NEGATIVE_TTL", 60*60*24))      # 1 day
+LRU_SIZE     = int(os.getenv("RESOLVER_CACHE_LRU_SIZE", 10_000))
+
+_COUNTERS = ("hits_memory", "hits_disk", "misses", "stale", "evictions", "sets", "fetches", "fetch_seconds")
+
+def is_negative(value: Any) -> bool:
+    if value in ("", None):
+        return True
+    return isinstance(value, dict) and not any(value.values())
+
+class TieredCache:
+    def __init__(self, directory: Optional[str] = None, *, lru_size: int = LRU_SIZE,
+                 ttl: int = POSITIVE_TTL, negative_ttl: int = NEGATIVE_TTL):
+        self.ttl, self.negative_ttl, self.lru_size = ttl, negative_ttl, lru_size
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()      # key → (value, expires_at)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = defaultdict(lambda: dict.fromkeys(_COUNTERS, 0))
+        self.directory = directory
+        self._disk: Any = None
+        self._disk_opened = not directory
+
+    @property
+    def disk(self) -> Any:
+        """The diskcache tier, opened on first use (None → memory tier only, still bounded)."""
+        if not self._disk_opened:
+            with self._lock:
+                if not self._disk_opened:
+                    try:
+                        import diskcache as dc
+                        self._disk = dc.Cache(self.directory)
+                    except Exception:
+                        self._disk = None
+                    self._disk_opened = True
+        return self._disk
+
+    @staticmethod
+    def _prefix(key: str) -> str:
+        return key.split(":", 1)[0]
+
+    def _remember(self, key: str, value: Any, expires_at: float) -> None:
+        # caller holds self._lock
+        self._lru[key] = (value, expires_at)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            old, _ = self._lru.popitem(last=False)
+            self._stats[self._prefix(old)]["evictions"] += 1
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        with self._lock:                                  # counters are only touched under the lock
+            st = self._stats[self._prefix(key)]
+            entry = self._lru.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._lru.move_to_end(key)
+                    st["hits_memory"] += 1
+                    return entry[0]
+                del self._lru[key]
+                st["stale"] += 1
+        if self.disk is not None:
+            try:
+                value, expire_time = self.disk.get(key, default=None, expire_time=True)
+            except Exception:
+                value, expire_time = None, None
+            if value is not None:
+                with self._lock:
+                    st["hits_disk"] += 1
+                    self._remember(key, value, expire_time or now + self.ttl)
+                return value
+        with self._lock:
+            st["misses"] += 1
+        return None
+
+    def set(self, key: str, value: Any, expire: Optional[int] = None) -> None:
+        if expire is None:
+            expire = self.negative_ttl if is_negative(value) else self.ttl
+        with self._lock:
+            self._remember(key, value, time.time() + expire)
+            self._stats[self._prefix(key)]["sets"] += 1
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value, expire=expire)
+            except Exception:
+                pass
+
+    def observe_fetch(self, prefix: str, seconds: float) -> None:
+        """Record one network round for a resolver (for latency attribution)."""
+        with self._lock:
+            st = self._stats[prefix]
+            st["fetches"] += 1
+            st["fetch_seconds"] += seconds
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            out = {p: dict(v) for p, v in self._stats.items()}
+            size = len(self._lru)
+        for v in out.values():
+            lookups = v["hits_memory"] + v["hits_disk"] + v["misses"]
+            v["hit_rate"] = (v["hits_memory"] + v["hits_disk"]) / lookups if lookups else 0.0
+        out["_lru"] = {"size": size, "capacity": self.lru_size}
+        return out
+
+    def stats_text(self, metric: str = "resolver_cache") -> str:
+        """Prometheus text exposition of the counters."""
+        lines = []
+        for prefix, v in self.stats().items():
+            if prefix == "_lru":
+                continue
+            for name in _COUNTERS:
+                kind = "seconds_total" if name == "fetch_seconds" else "total"
+                label = "fetch" if name == "fetch_seconds" else name
+                lines.append(f'{metric}_{label}_{kind}{{resolver="{prefix}"}} {v[name]}')
+        lru = self.stats()["_lru"]
+        lines.append(f"{metric}_lru_entries {lru['size']}")
+        return "\n".join(lines) + "\n"
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._lru.clear()
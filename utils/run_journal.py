@@ -0,0 +1,136 @@
+# utils/run_journal.py  –  durable per-document progress for batch runs
+# -------------------------------------------------------------------------------------------------
+# One SQLite row per document, keyed by the SHA-256 of its bytes (same key as utils.conversion_cache):
+# last completed stage (converted → extracted → resolved → written), the extracted/resolved row,
+# the last error with its stage, attempt count and per-stage timings. utils.batch consults it so a
+# restarted run skips written documents, resumes extracted ones at the resolver, and retries only
+# failures; conversion and LLM calls that did finish are also served from their own caches.
+from __future__ import annotations
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+STAGES = ("converted", "extracted", "resolved", "written")
+STAGE_OF = {"convert": "converted", "extract": "extracted", "resolve": "resolved", "write": "written"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs(
+    sha      TEXT PRIMARY KEY,
+    name     TEXT NOT NULL,
+    stage    TEXT NOT NULL DEFAULT '',      -- last completed stage ('' = none)
+    error    TEXT,                          -- last error (NULL once the document gets through)
+    failed   TEXT,                          -- stage that raised it
+    attempts INTEGER NOT NULL DEFAULT 0,
+    row      TEXT,                          -- JSON record after extract / resolve
+    timings  TEXT NOT NULL DEFAULT '{}',    -- JSON {stage: seconds}
+    seq      INTEGER,                       -- order in which documents were written
+    updated  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS docs_stage ON docs(stage);
+"""
+
+@dataclass
+class DocState:
+    sha: str
+    name: str
+    stage: str = ""
+    error: Optional[str] = None
+    failed: Optional[str] = None
+    attempts: int = 0
+    row: Optional[Dict[str, str]] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def done(self) -> bool:
+        return self.stage == "written"
+
+class RunJournal:
+    """Thread-safe journal on one SQLite file (WAL, one connection guarded by a lock)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._con.executescript("PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;" + _SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
+
+    def __enter__(self) -> "RunJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---- reads ----
+    def get(self, sha: str) -> Optional[DocState]:
+        with self._lock:
+            r = self._con.execute("SELECT sha, name, stage, error, failed, attempts, row, timings "
+                                  "FROM docs WHERE sha = ?", (sha,)).fetchone()
+        if r is None:
+            return None
+        return DocState(r[0], r[1], r[2], r[3], r[4], r[5], json.loads(r[6]) if r[6] else None, json.loads(r[7]))
+
+    def rows(self) -> List[Dict[str, str]]:
+        """Records of all written documents, in the order they were written (across runs)."""
+        with self._lock:
+            return [json.loads(r[0]) for r in
+                    self._con.execute("SELECT row FROM docs WHERE stage = 'written' ORDER BY seq")]
+
+    def failures(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return [{"file": n, "stage": f, "error": e} for n, f, e in
+                    self._con.execute("SELECT name, failed, error FROM docs WHERE error IS NOT NULL ORDER BY updated")]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            out = {s or "pending": n for s, n in self._con.execute("SELECT stage, COUNT(*) FROM docs GROUP BY stage")}
+            out["failed"] = self._con.execute("SELECT COUNT(*) FROM docs WHERE error IS NOT NULL").fetchone()[0]
+        return out
+
+    def iter_states(self) -> Iterator[DocState]:
+        with self._lock:
+            shas = [r[0] for r in self._con.execute("SELECT sha FROM docs ORDER BY updated")]
+        for sha in shas:
+            state = self.get(sha)
+            if state is not None:
+                yield state
+
+    # ---- writes ----
+    def start(self, sha: str, name: str) -> DocState:
+        """Register an attempt on a document; returns its state before this attempt."""
+        now = time.time()
+        with self._lock:
+            self._con.execute("INSERT INTO docs(sha, name, updated) VALUES (?, ?, ?) "
+                              "ON CONFLICT(sha) DO UPDATE SET name = excluded.name", (sha, name, now))
+            self._con.execute("UPDATE docs SET attempts = attempts + 1, updated = ? WHERE sha = ?", (now, sha))
+        return self.get(sha)
+
+    def advance(self, sha: str, step: str, *, row: Optional[Dict[str, str]] = None,
+                elapsed: Optional[float] = None) -> None:
+        """Mark `step` ('convert' / 'extract' / 'resolve' / 'write') as completed."""
+        stage = STAGE_OF.get(step, step)
+        with self._lock:
+            timings = json.loads(self._con.execute("SELECT timings FROM docs WHERE sha = ?",
+                                                   (sha,)).fetchone()[0])
+            if elapsed is not None:
+                timings[stage] = round(elapsed, 4)
+            seq = "(SELECT COALESCE(MAX(seq), 0) + 1 FROM docs)" if stage == "written" else "seq"
+            self._con.execute(
+                f"UPDATE docs SET stage = ?, error = NULL, failed = NULL, row = COALESCE(?, row), "
+                f"timings = ?, seq = {seq}, updated = ? WHERE sha = ?",
+                (stage, json.dumps(row) if row is not None else None, json.dumps(timings), time.time(), sha))
+
+    def forget(self, sha: str) -> None:
+        """Remove a document's entry (e.g. a stand-in for a download that has since succeeded)."""
+        with self._lock:
+            self._con.execute("DELETE FROM docs WHERE sha = ?", (sha,))
+
+    def fail(self, sha: str, step: str, error: str) -> None:
+        with self._lock:
+            self._con.execute("UPDATE docs SET error = ?, failed = ?, updated = ? WHERE sha = ?",
+                              (error, step, time.time(), sha))
@@ -0,0 +1,80 @@
+# utils/text_layer.py  –  cheap per-page text-layer check (PyMuPDF only, no models)
+# -------------------------------------------------------------------------------------------------
+# Almost every journal PDF is born-digital: its text layer is complete and correct, and OCR only
+# re-reads what is already there. assess() looks at each page's extracted text and image placement
+# (about a millisecond per page) and flags the pages whose text cannot be trusted:
+#   "scan"    little or no text on a page that is largely covered by images
+#   "glyphs"  too many unusable characters (U+FFFD, private-use, control) – fonts without a usable
+#             ToUnicode map extract as garbage even though text "exists"
+# Everything else is "ok" (or "blank": no text and no images – nothing for OCR to find either).
+# utils.docling_pipeline uses the verdicts to run OCR only on the pages that need it.
+from __future__ import annotations
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Union
+
+from utils.pdf_ingest import IngestedPDF, PDFInput, ingest
+
+@dataclass(frozen=True)
+class TextLayerConfig:
+    min_chars: int = 40                   # fewer non-space characters → the page has no usable text
+    min_image_coverage: float = 0.3       # ...and this much of it under images → treat as a scan
+    max_invalid_ratio: float = 0.05       # share of unusable characters that marks broken glyphs
+
+DEFAULT_CONFIG = TextLayerConfig()
+
+_INVALID = re.compile("[\ufffd\ue000-\uf8ff\x00-\x08\x0b\x0c\x0e-\x1f]")      # replacement, private use, control
+
+@dataclass(frozen=True)
+class PageQuality:
+    page: int                 # 1-based
+    chars: int                # non-whitespace characters in the text layer
+    invalid: int              # of which unusable
+    image_coverage: float     # share of the page area under images (0–1)
+    verdict: str              # "ok" | "blank" | "scan" | "glyphs"
+
+    @property
+    def needs_ocr(self) -> bool:
+        return self.verdict in ("scan", "glyphs")
+
+    @property
+    def invalid_ratio(self) -> float:
+        return self.invalid / self.chars if self.chars else 0.0
+
+def _image_coverage(page) -> float:
+    area = abs(page.rect)
+    if not area:
+        return 0.0
+    covered = 0.0
+    for info in page.get_image_info():
+        covered += abs(page.rect & info["bbox"])          # clipped to the page; overlaps count twice
+    return min(1.0, covered / area)
+
+def check_page(page, text: Optional[str] = None, config: Optional[TextLayerConfig] = None) -> PageQuality:
+    """Verdict for one PyMuPDF page; pass `text` when the caller already extracted it."""
+    cfg = config or DEFAULT_CONFIG
+    if text is None:
+        text = page.get_text()
+    dense = "".join(text.split())
+    chars, invalid = len(dense), len(_INVALID.findall(dense))
+    coverage = _image_coverage(page)
+    if chars and invalid / chars > cfg.max_invalid_ratio:
+        verdict = "glyphs"
+    elif chars < cfg.min_chars:
+        verdict = "scan" if coverage >= cfg.min_image_coverage else ("blank" if not chars else "ok")
+    else:
+        verdict = "ok"
+    return PageQuality(page.number + 1, chars, invalid, round(coverage, 3), verdict)
+
+def assess(pdf: Union[PDFInput, IngestedPDF], config: Optional[TextLayerConfig] = None) -> List[PageQuality]:
+    """One PageQuality per page of `pdf`."""
+    doc = ingest(pdf)
+    try:
+        src = doc.fitz_open()
+        try:
+            return [check_page(page, config=config) for page in src]
+        finally:
+            src.close()
+    finally:
+        if doc is not pdf:
+            doc.close()